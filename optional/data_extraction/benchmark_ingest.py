@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+数据提取基准测试
+在几个规模的合成STRING数据上端到端运行StringDataExtractor（以及可选的PPIDataFilter），
+记录每个阶段的耗时和吞吐量，结果写为JSON，便于跨版本比较
+"""
+
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from string_data_extractor import StringDataExtractor
+from synthetic_string import SyntheticConfig, SyntheticStringGenerator
+
+logger = logging.getLogger(__name__)
+
+# 预设规模：(物种数, 每物种蛋白质数)，平均度数使用SyntheticConfig默认值
+SCALES = {
+    'tiny': (2, 1000),
+    'small': (4, 5000),
+    'medium': (4, 25000),
+    'large': (8, 50000),
+}
+
+
+def _git_revision() -> Optional[str]:
+    """当前代码版本（不在git仓库中时返回None）"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _import_ppi_filter():
+    """导入PPIDataFilter（data_preprocessing的依赖未安装时返回None）"""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    try:
+        from data_preprocessing import PPIDataFilter
+    except ImportError as e:
+        logger.warning("无法导入data_preprocessing（%s），跳过PPIDataFilter基准测试", e)
+        return None
+    return PPIDataFilter
+
+
+def _timed(timings: Dict[str, float], name: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    timings[name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def benchmark_ppi_filter(data_dir: Path, confidence: float) -> Optional[Dict]:
+    """逐步计时PPIDataFilter的完整过滤流程（不保存输出文件）"""
+    PPIDataFilter = _import_ppi_filter()
+    if PPIDataFilter is None:
+        return None
+
+    ppi_filter = PPIDataFilter(data_dir=str(data_dir), confidence_threshold=confidence)
+    timings: Dict[str, float] = {}
+    protein_df = _timed(timings, 'load_protein_quality_info', ppi_filter.load_protein_quality_info)
+    proteins = _timed(timings, 'filter_proteins_by_quality', ppi_filter.filter_proteins_by_quality, protein_df)
+    ppi_df = _timed(timings, 'load_and_filter_ppi_data', ppi_filter.load_and_filter_ppi_data,
+                    set(proteins['protein_id']))
+    connectivity = _timed(timings, 'analyze_graph_connectivity', ppi_filter.analyze_graph_connectivity, ppi_df)
+    final_ppi = _timed(timings, 'filter_to_largest_component', ppi_filter.filter_to_largest_component,
+                       ppi_df, connectivity['largest_component_proteins'])
+    return {
+        'timings': timings,
+        'total_seconds': round(sum(timings.values()), 3),
+        'proteins_after_quality_filter': len(proteins),
+        'interactions_after_filter': len(ppi_df),
+        'interactions_in_largest_component': len(final_ppi),
+    }
+
+
+def run_benchmark(scales: List[str], work_dir: Path, confidence: float = 0.7,
+                  extractor_options: Optional[Dict] = None, include_ppi_filter: bool = True,
+                  keep_data: bool = False, seed: int = 0) -> Dict:
+    """
+    在各规模上生成合成数据并运行提取流程
+
+    Args:
+        scales: SCALES中的规模名
+        work_dir: 合成数据和数据库的工作目录（每个规模一个子目录）
+        confidence: 置信度阈值
+        extractor_options: 传给StringDataExtractor的其他参数（如intern_ids、canonicalize_edges）
+        include_ppi_filter: 同时计时PPIDataFilter
+        keep_data: 保留生成的数据和数据库
+        seed: 合成数据随机种子
+
+    Returns:
+        基准测试结果（环境信息和每个规模的结果）
+    """
+    extractor_options = extractor_options or {}
+    results = []
+
+    for scale in scales:
+        num_species, proteins_per_species = SCALES[scale]
+        data_dir = Path(work_dir) / scale
+        if data_dir.exists():
+            shutil.rmtree(data_dir)
+
+        logger.info("基准测试规模 %s：%d 个物种 × %d 个蛋白质", scale, num_species, proteins_per_species)
+        config = SyntheticConfig(num_species=num_species, proteins_per_species=proteins_per_species,
+                                 seed=seed, compresslevel=1)
+        start = time.perf_counter()
+        generated = SyntheticStringGenerator(config).generate(str(data_dir))
+        generate_seconds = time.perf_counter() - start
+        input_bytes = sum(path.stat().st_size for path in generated['files'].values())
+
+        extractor = StringDataExtractor(
+            data_dir=str(data_dir), confidence_threshold=confidence, incremental=False,
+            report_path=str(data_dir / "ingest_report.json"), **extractor_options
+        )
+        start = time.perf_counter()
+        extractor.extract_all_data()
+        extract_seconds = time.perf_counter() - start
+        report = extractor.metrics.report()
+
+        result = {
+            'scale': scale,
+            'synthetic': {
+                'config': generated['config'],
+                'counts': generated['counts'],
+                'input_bytes': input_bytes,
+                'generate_seconds': round(generate_seconds, 3),
+            },
+            'extractor': {
+                'options': extractor_options,
+                'total_seconds': round(extract_seconds, 3),
+                'interactions_per_second': round(generated['counts']['interactions'] * 2 / extract_seconds, 1),
+                'peak_rss_mb': report['peak_rss_mb'],
+                'stages': report['stages'],
+            },
+        }
+        if include_ppi_filter:
+            result['ppi_filter'] = benchmark_ppi_filter(data_dir, confidence)
+        results.append(result)
+
+        logger.info("规模 %s 完成：提取 %.1f 秒", scale, extract_seconds)
+        if not keep_data:
+            shutil.rmtree(data_dir)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'confidence_threshold': confidence,
+        'results': results,
+    }
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='STRING数据提取基准测试（合成数据）')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['tiny', 'small'],
+                        help='运行的规模')
+    parser.add_argument('--work-dir', default='data/benchmark', help='合成数据工作目录')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果JSON路径')
+    parser.add_argument('--confidence', type=float, default=0.7, help='置信度阈值(0-1)')
+    parser.add_argument('--intern-ids', action='store_true', help='使用整数蛋白质ID存储')
+    parser.add_argument('--canonical-edges', action='store_true', help='每条无向相互作用只保存一行')
+    parser.add_argument('--backend', choices=['sqlite', 'parquet'], default='sqlite', help='存储后端')
+    parser.add_argument('--skip-ppi-filter', action='store_true', help='不计时PPIDataFilter')
+    parser.add_argument('--keep-data', action='store_true', help='保留生成的数据和数据库')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据随机种子')
+
+    args = parser.parse_args()
+
+    extractor_options = {'storage_backend': args.backend}
+    if args.intern_ids:
+        extractor_options['intern_ids'] = True
+    if args.canonical_edges:
+        extractor_options['canonicalize_edges'] = True
+
+    results = run_benchmark(
+        args.scales, Path(args.work_dir), confidence=args.confidence,
+        extractor_options=extractor_options, include_ppi_filter=not args.skip_ppi_filter,
+        keep_data=args.keep_data, seed=args.seed
+    )
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print(f"\n基准测试结果已写入 {args.output}")
+    for result in results['results']:
+        extractor = result['extractor']
+        print(f"  {result['scale']}: 提取 {extractor['total_seconds']:.1f} 秒 "
+              f"({extractor['interactions_per_second']:,.0f} 行相互作用/秒)")
+        ppi = result.get('ppi_filter')
+        if ppi:
+            print(f"    PPIDataFilter: {ppi['total_seconds']:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
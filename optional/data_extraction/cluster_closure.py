@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+聚类层次树闭包索引
+对clusters.tree做一次深度优先遍历，为每个聚类计算深度、根、欧拉序区间和祖先路径，
+祖先/后代判断和"某深度的祖先聚类"查询变为区间比较
+"""
+
+import logging
+import sqlite3
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def create_closure_table(cursor: sqlite3.Cursor):
+    """创建聚类闭包表"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cluster_closure (
+            cluster_id TEXT PRIMARY KEY,
+            node_idx INTEGER UNIQUE,
+            parent_idx INTEGER,
+            depth INTEGER,
+            root_idx INTEGER,
+            tin INTEGER,
+            tout INTEGER,
+            ancestors BLOB
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_closure_depth ON cluster_closure(depth, tin)')
+
+
+def compute_cluster_closure(edges: Iterable[Tuple[str, str]]) -> List[tuple]:
+    """
+    计算聚类树的闭包索引
+
+    节点编号node_idx即先序遍历序号tin；tout为子树中最大的tin，
+    因此 b 是 a 的后代当且仅当 tin[a] <= tin[b] <= tout[a]。
+    ancestors为从根到父节点的node_idx路径（int32数组），ancestors[d] 即深度d的祖先。
+
+    Args:
+        edges: (child_cluster_id, parent_cluster_id) 对
+
+    Returns:
+        [(cluster_id, node_idx, parent_idx, depth, root_idx, tin, tout, ancestors_blob), ...]
+    """
+    children: Dict[str, List[str]] = defaultdict(list)
+    parent_of: Dict[str, str] = {}
+    nodes = set()
+    for child, parent in edges:
+        nodes.add(child)
+        nodes.add(parent)
+        if child in parent_of:
+            # 聚类树中每个聚类只有一个父节点，多余的边忽略
+            if parent_of[child] != parent:
+                logger.warning("聚类 %s 有多个父节点，保留 %s", child, parent_of[child])
+            continue
+        parent_of[child] = parent
+        children[parent].append(child)
+
+    roots = sorted(node for node in nodes if node not in parent_of)
+    rows = []
+    tin = 0
+    for root in roots:
+        root_idx = tin
+        # 迭代式DFS：栈中保存 (聚类, 祖先路径)；子树结束时回填tout
+        stack = [(root, array('i'), -1, False)]
+        open_rows: Dict[str, int] = {}
+        while stack:
+            cluster_id, path, parent_idx, finished = stack.pop()
+            if finished:
+                rows[open_rows.pop(cluster_id)][6] = tin - 1
+                continue
+            node_idx = tin
+            tin += 1
+            open_rows[cluster_id] = len(rows)
+            rows.append([cluster_id, node_idx, parent_idx, len(path), root_idx, node_idx, node_idx, path])
+            stack.append((cluster_id, path, parent_idx, True))
+            child_path = array('i', path)
+            child_path.append(node_idx)
+            for child in sorted(children.get(cluster_id, ()), reverse=True):
+                stack.append((child, child_path, node_idx, False))
+
+    unreachable = len(nodes) - len(rows)
+    if unreachable:
+        logger.warning("%d 个聚类位于环中、无法从根到达，未写入闭包索引", unreachable)
+
+    return [tuple(row[:7]) + (row[7].tobytes(),) for row in rows]
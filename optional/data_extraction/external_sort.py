@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+外部归并排序去重
+按内存预算把行按主键排序后溢写为有序段文件，再多路归并输出主键有序、无重复的行，
+相同主键保留最后写入的一行（与 INSERT OR REPLACE 语义一致）。去重变为顺序读写，
+下游可以用普通 INSERT 按主键顺序追加写入，不再逐行查找和改写B树
+"""
+
+import heapq
+import logging
+import pickle
+import sys
+import tempfile
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 有序段文件中每次序列化的行数
+SPILL_BLOCK_ROWS = 10000
+# 估算单行内存占用时采样的行数
+SIZE_SAMPLE_ROWS = 1000
+
+
+def _row_bytes(row: tuple) -> int:
+    """估算一行在内存中的大小（元组本身加各字段对象）"""
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def _dedup_sorted(rows: Iterable[tuple], key: Callable) -> Iterator[tuple]:
+    """对按主键有序的行去重，相同主键保留最后一行"""
+    previous = None
+    previous_key = None
+    for row in rows:
+        row_key = key(row)
+        if previous is not None and row_key != previous_key:
+            yield previous
+        previous, previous_key = row, row_key
+    if previous is not None:
+        yield previous
+
+
+class ExternalSortDeduplicator:
+    """
+    外部排序去重器
+
+    Example:
+        dedup = ExternalSortDeduplicator(key_positions=[0, 1], memory_mb=512)
+        dedup.add_all(parsed_rows)
+        for row in dedup.iter_sorted():   # 主键有序，无重复
+            ...
+    """
+
+    def __init__(self, key_positions: Sequence[int], memory_mb: float = 512,
+                 tmp_dir: Optional[str] = None):
+        """
+        Args:
+            key_positions: 主键列在行元组中的位置
+            memory_mb: 内存中缓存的行的预算，超过时排序并溢写为一个有序段
+            tmp_dir: 有序段文件目录（默认为系统临时目录）
+        """
+        self.key = itemgetter(*key_positions) if len(key_positions) > 1 else itemgetter(key_positions[0])
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        self._tmp = tempfile.TemporaryDirectory(prefix='string_sort_', dir=tmp_dir)
+        self._buffer: List[tuple] = []
+        self._max_rows: Optional[int] = None
+        self._runs: List[Path] = []
+
+        self.rows_in = 0
+        self.rows_out = 0
+        self.spill_bytes = 0
+
+    @property
+    def num_runs(self) -> int:
+        return len(self._runs)
+
+    def add(self, row: tuple):
+        """加入一行（缓存达到内存预算时溢写）"""
+        self._buffer.append(row)
+        self.rows_in += 1
+        if self._max_rows is None:
+            if len(self._buffer) >= SIZE_SAMPLE_ROWS:
+                # 按采样行的平均大小换算内存预算对应的行数
+                average = sum(_row_bytes(r) for r in self._buffer) / len(self._buffer)
+                self._max_rows = max(int(self.memory_bytes / average), SIZE_SAMPLE_ROWS)
+        elif len(self._buffer) >= self._max_rows:
+            self._spill()
+
+    def add_all(self, rows: Iterable[tuple]):
+        for row in rows:
+            self.add(row)
+
+    def _sorted_buffer(self) -> Iterator[tuple]:
+        # 稳定排序：相同主键保持写入顺序，去重时保留最后一行
+        self._buffer.sort(key=self.key)
+        return _dedup_sorted(self._buffer, self.key)
+
+    def _spill(self):
+        """将缓存排序去重后写为一个有序段"""
+        path = Path(self._tmp.name) / f"run-{len(self._runs):05d}.pkl"
+        with open(path, 'wb') as f:
+            block = []
+            for row in self._sorted_buffer():
+                block.append(row)
+                if len(block) >= SPILL_BLOCK_ROWS:
+                    pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    block = []
+            if block:
+                pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spill_bytes += path.stat().st_size
+        self._runs.append(path)
+        self._buffer = []
+
+    @staticmethod
+    def _read_run(path: Path) -> Iterator[tuple]:
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+    def _tagged_run(self, index: int, path: Path) -> Iterator[tuple]:
+        """有序段中的行附加 (主键, 段号)，作为归并的排序键"""
+        key = self.key
+        for row in self._read_run(path):
+            yield key(row), index, row
+
+    def iter_sorted(self) -> Iterator[tuple]:
+        """
+        按主键顺序输出去重后的行（只能调用一次，结束后删除有序段文件）
+
+        段按写入顺序编号，归并时相同主键按段号排列，取最后一个即为最后写入的行。
+        """
+        try:
+            if not self._runs:
+                for row in self._sorted_buffer():
+                    self.rows_out += 1
+                    yield row
+                return
+
+            if self._buffer:
+                self._spill()
+            logger.info("外部排序：%d 行分为 %d 个有序段（%.1f MB），开始归并",
+                        self.rows_in, len(self._runs), self.spill_bytes / (1024 * 1024))
+
+            streams = [self._tagged_run(index, path) for index, path in enumerate(self._runs)]
+            merged = (row for _, _, row in heapq.merge(*streams, key=itemgetter(0, 1)))
+            for row in _dedup_sorted(merged, self.key):
+                self.rows_out += 1
+                yield row
+        finally:
+            self._buffer = []
+            self._tmp.cleanup()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+STRING相互作用图导出
+将protein_interactions_detailed流式导出为CSR数组（indptr/indices + 与边对齐的float16七通道证据矩阵），
+以.npy文件保存，可内存映射加载并转换为torch-geometric的edge_index/edge_attr
+"""
+
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from storage_backends import TABLE_COLUMNS, ParquetStore
+
+logger = logging.getLogger(__name__)
+
+# 七个证据通道（与protein_interactions_detailed列顺序一致）
+CHANNELS = TABLE_COLUMNS['protein_interactions_detailed'][2:9]
+
+
+class GraphExporter:
+    """
+    相互作用图CSR导出器
+
+    两遍流式读取：第一遍统计节点和出度得到indptr，第二遍把每批边按源节点写入
+    预先分配的内存映射数组，内存占用与节点数成正比，与边数无关。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, parquet_dir: Optional[str] = None,
+                 batch_size: int = 1000000):
+        """
+        Args:
+            db_path: SQLite数据库路径（string_data.db）
+            parquet_dir: Parquet数据集目录（与db_path二选一）
+            batch_size: 每批读取的边数
+        """
+        if (db_path is None) == (parquet_dir is None):
+            raise ValueError("db_path 和 parquet_dir 需要且只能指定一个")
+        self.db_path = Path(db_path) if db_path else None
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else None
+        self.batch_size = batch_size
+
+        # 存储模式（SQLite的db_meta表；Parquet为数据集目录中的dataset_meta.json，固定为文本ID、0-1分数）
+        if self.parquet_dir is not None:
+            meta = ParquetStore(self.parquet_dir).read_meta()
+        else:
+            meta = {}
+            conn = sqlite3.connect(self.db_path)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            if 'db_meta' in tables:
+                meta = dict(conn.execute('SELECT key, value FROM db_meta'))
+            conn.close()
+        self.interned = meta.get('id_mode') == 'interned'
+        self.canonical = meta.get('edge_mode') == 'canonical'
+        self.score_scale = 1000.0 if meta.get('detailed_score_scale') == '1000' else 1.0
+
+    def _iter_batches(self, species_ids: Optional[List[int]],
+                      min_score: Optional[float]) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """按批读取 (protein1, protein2, 七通道分数, combined_score)，分数统一为0-1范围"""
+        columns = ['protein1', 'protein2'] + CHANNELS + ['combined_score']
+
+        if self.parquet_dir is not None:
+            table = ParquetStore(self.parquet_dir).scan(
+                'protein_interactions_detailed', columns=columns,
+                species_ids=species_ids, min_score=min_score
+            )
+            for batch in table.to_batches(max_chunksize=self.batch_size):
+                data = batch.to_pydict()
+                yield (np.asarray(data['protein1'], dtype=object), np.asarray(data['protein2'], dtype=object),
+                       np.column_stack([data[name] for name in CHANNELS]).astype(np.float32),
+                       np.asarray(data['combined_score'], dtype=np.float32))
+            return
+
+        conditions, params = [], []
+        if species_ids is not None:
+            if self.interned:
+                placeholders = ', '.join('?' * len(species_ids))
+                conditions.append(f'protein1 IN (SELECT protein_idx FROM protein_id_map WHERE species_id IN ({placeholders}))')
+                params.extend(species_ids)
+            else:
+                # 文本ID按 "taxid." 前缀做主键范围扫描（'/' 是 '.' 的下一个字符）
+                conditions.append('(' + ' OR '.join(['(protein1 >= ? AND protein1 < ?)'] * len(species_ids)) + ')')
+                for species_id in species_ids:
+                    params.extend([f'{species_id}.', f'{species_id}/'])
+        if min_score is not None:
+            conditions.append('combined_score >= ?')
+            params.append(min_score * self.score_scale)
+        where = (' WHERE ' + ' AND '.join(conditions)) if conditions else ''
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM protein_interactions_detailed{where}", params)
+        try:
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    break
+                protein1, protein2, *scores = zip(*rows)
+                scores = np.asarray(scores, dtype=np.float32).T / self.score_scale
+                yield (np.asarray(protein1, dtype=object), np.asarray(protein2, dtype=object),
+                       scores[:, :7], scores[:, 7])
+        finally:
+            conn.close()
+
+    def _node_ids(self, keys: List) -> List[str]:
+        """把节点键解码为STRING蛋白质ID（整数ID模式查询protein_id_map）"""
+        if not self.interned:
+            return list(keys)
+        conn = sqlite3.connect(self.db_path)
+        mapping = dict(conn.execute('SELECT protein_idx, protein_id FROM protein_id_map'))
+        conn.close()
+        return [mapping[key] for key in keys]
+
+    def export(self, output_dir: str, species_ids: Optional[Iterable[int]] = None,
+               min_score: Optional[float] = None, symmetric: bool = True) -> Dict:
+        """
+        导出一张图
+
+        Args:
+            output_dir: 输出目录
+            species_ids: 只导出这些物种（None表示全部物种，跨物种合并为一张图）
+            min_score: 置信度阈值(0-1)
+            symmetric: 规范化存储（每条边一行）时补全反向边，使CSR包含双向邻接
+
+        Returns:
+            图的元信息（同时写入meta.json）
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        species_ids = sorted(species_ids) if species_ids is not None else None
+        mirror = symmetric and self.canonical
+
+        # 第一遍：节点编号（按首次出现顺序）和出度
+        node_index: Dict = {}
+
+        def encode(keys) -> np.ndarray:
+            encoded = np.empty(len(keys), dtype=np.int64)
+            for i, key in enumerate(keys):
+                index = node_index.get(key)
+                if index is None:
+                    index = node_index[key] = len(node_index)
+                encoded[i] = index
+            return encoded
+
+        degree = np.zeros(0, dtype=np.int64)
+        num_edges = 0
+        for protein1, protein2, _, _ in self._iter_batches(species_ids, min_score):
+            src, dst = encode(protein1), encode(protein2)
+            counts = np.bincount(np.concatenate([src, dst]) if mirror else src, minlength=len(node_index))
+            counts[:len(degree)] += degree
+            degree = counts
+            num_edges += len(src) * (2 if mirror else 1)
+        degree = np.pad(degree, (0, len(node_index) - len(degree)))
+
+        num_nodes = len(degree)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+        index_dtype = np.int32 if num_nodes < 2 ** 31 else np.int64
+        logger.info("图规模: %d 个节点, %d 条有向边", num_nodes, num_edges)
+
+        # 第二遍：按源节点写入预分配的内存映射数组
+        indices = open_memmap(output_dir / 'indices.npy', mode='w+', dtype=index_dtype, shape=(num_edges,))
+        edge_attr = open_memmap(output_dir / 'edge_attr.npy', mode='w+', dtype=np.float16,
+                                shape=(num_edges, len(CHANNELS)))
+        edge_score = open_memmap(output_dir / 'edge_score.npy', mode='w+', dtype=np.float16, shape=(num_edges,))
+        fill = indptr[:-1].copy()
+
+        def place(src, dst, attr, score):
+            order = np.argsort(src, kind='stable')
+            src, dst, attr, score = src[order], dst[order], attr[order], score[order]
+            nodes, starts, counts = np.unique(src, return_index=True, return_counts=True)
+            positions = fill[src] + (np.arange(len(src)) - np.repeat(starts, counts))
+            indices[positions] = dst
+            edge_attr[positions] = attr
+            edge_score[positions] = score
+            fill[nodes] += counts
+
+        lookup = node_index.__getitem__
+        for protein1, protein2, attr, score in self._iter_batches(species_ids, min_score):
+            src = np.fromiter(map(lookup, protein1), dtype=np.int64, count=len(protein1))
+            dst = np.fromiter(map(lookup, protein2), dtype=np.int64, count=len(protein2))
+            place(src, dst, attr, score)
+            if mirror:
+                place(dst, src, attr, score)
+
+        for array in (indices, edge_attr, edge_score):
+            array.flush()
+        np.save(output_dir / 'indptr.npy', indptr)
+
+        node_ids = self._node_ids(list(node_index))
+        with open(output_dir / 'node_ids.txt', 'w') as f:
+            f.write('\n'.join(node_ids) + ('\n' if node_ids else ''))
+
+        meta = {
+            'num_nodes': num_nodes,
+            'num_edges': num_edges,
+            'channels': CHANNELS,
+            'species_ids': species_ids,
+            'min_score': min_score,
+            'symmetric': symmetric or not self.canonical,
+            'source': str(self.db_path or self.parquet_dir),
+        }
+        with open(output_dir / 'meta.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        logger.info("CSR图已导出到 %s", output_dir)
+        return meta
+
+    def export_per_species(self, output_dir: str, species_ids: Iterable[int],
+                           min_score: Optional[float] = None, symmetric: bool = True) -> Dict[int, Dict]:
+        """每个物种导出一张图（output_dir/species_<taxid>/）"""
+        return {
+            species_id: self.export(Path(output_dir) / f'species_{species_id}', [species_id],
+                                    min_score=min_score, symmetric=symmetric)
+            for species_id in species_ids
+        }
+
+
+def load_csr(graph_dir: str, mmap: bool = True) -> Dict:
+    """加载导出的CSR图（默认内存映射，不读入全部数据）"""
+    graph_dir = Path(graph_dir)
+    mmap_mode = 'r' if mmap else None
+    with open(graph_dir / 'meta.json') as f:
+        meta = json.load(f)
+    with open(graph_dir / 'node_ids.txt') as f:
+        node_ids = f.read().split()
+    return {
+        'meta': meta,
+        'node_ids': node_ids,
+        'indptr': np.load(graph_dir / 'indptr.npy'),
+        'indices': np.load(graph_dir / 'indices.npy', mmap_mode=mmap_mode),
+        'edge_attr': np.load(graph_dir / 'edge_attr.npy', mmap_mode=mmap_mode),
+        'edge_score': np.load(graph_dir / 'edge_score.npy', mmap_mode=mmap_mode),
+    }
+
+
+def csr_to_edge_index(indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """CSR转为 [2, E] 的edge_index（源节点由indptr展开）"""
+    sources = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    return np.vstack([sources, np.asarray(indices, dtype=np.int64)])
+
+
+def load_torch_geometric(graph_dir: str):
+    """加载为torch_geometric.data.Data（edge_index/edge_attr/edge_score）"""
+    try:
+        import torch
+        from torch_geometric.data import Data
+    except ImportError as exc:
+        raise ImportError("加载为torch-geometric图需要安装torch和torch-geometric") from exc
+
+    graph = load_csr(graph_dir)
+    edge_index = torch.from_numpy(csr_to_edge_index(graph['indptr'], graph['indices']))
+    return Data(
+        edge_index=edge_index,
+        edge_attr=torch.from_numpy(np.ascontiguousarray(graph['edge_attr'])),
+        edge_score=torch.from_numpy(np.ascontiguousarray(graph['edge_score'])),
+        num_nodes=graph['meta']['num_nodes'],
+    )
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='STRING相互作用图CSR导出')
+    parser.add_argument('--db-path', help='SQLite数据库路径（string_data.db）')
+    parser.add_argument('--parquet-dir', help='Parquet数据集目录')
+    parser.add_argument('--output-dir', required=True, help='输出目录')
+    parser.add_argument('--species', type=int, nargs='+', help='只导出这些物种（taxon ID）')
+    parser.add_argument('--per-species', action='store_true', help='每个物种导出一张图')
+    parser.add_argument('--min-score', type=float, help='置信度阈值(0-1)')
+    parser.add_argument('--directed', action='store_true', help='规范化存储时不补全反向边')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    exporter = GraphExporter(db_path=args.db_path, parquet_dir=args.parquet_dir)
+    if args.per_species:
+        if not args.species:
+            parser.error('--per-species 需要同时指定 --species')
+        exporter.export_per_species(args.output_dir, args.species, args.min_score, not args.directed)
+    else:
+        exporter.export(args.output_dir, args.species, args.min_score, not args.directed)
+
+
+if __name__ == "__main__":
+    main()
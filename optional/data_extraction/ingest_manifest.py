@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+数据提取阶段清单
+记录每个提取阶段的源文件指纹、参数、行数、完成状态和检查点，
+使重复运行可以跳过未变化的阶段，并从中断处恢复
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def fingerprint_files(paths: List[Path]) -> str:
+    """源文件指纹：文件名、大小和修改时间（无需读取文件内容）"""
+    parts = []
+    for path in paths:
+        stat = Path(path).stat()
+        parts.append(f"{Path(path).name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ';'.join(parts)
+
+
+class StageManifest:
+    """阶段清单（保存在SQLite表ingest_manifest中）"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_manifest (
+                stage TEXT PRIMARY KEY,
+                source_fingerprint TEXT,
+                params TEXT,
+                status TEXT,
+                row_count INTEGER,
+                lines_consumed INTEGER,
+                started_at TEXT,
+                finished_at TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _execute(self, sql: str, params: tuple):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def get(self, stage: str) -> Optional[Dict]:
+        """读取阶段记录"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute('SELECT * FROM ingest_manifest WHERE stage = ?', (stage,)).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def start(self, stage: str, fingerprint: str, params: Dict):
+        """标记阶段开始（清空之前的检查点）"""
+        self._execute(
+            'INSERT OR REPLACE INTO ingest_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (stage, fingerprint, json.dumps(params, sort_keys=True), 'running', 0, 0,
+             datetime.now().isoformat(timespec='seconds'), None)
+        )
+
+    def checkpoint(self, stage: str, lines_consumed: int, row_count: int):
+        """记录已提交的进度"""
+        self._execute(
+            'UPDATE ingest_manifest SET lines_consumed = ?, row_count = ? WHERE stage = ?',
+            (lines_consumed, row_count, stage)
+        )
+
+    def complete(self, stage: str, row_count: int, fingerprint: Optional[str] = None):
+        """标记阶段完成（fingerprint用于源文件在阶段运行中才下载完成的情况）"""
+        self._execute(
+            'UPDATE ingest_manifest SET status = ?, row_count = ?, finished_at = ?, '
+            'source_fingerprint = COALESCE(?, source_fingerprint) WHERE stage = ?',
+            ('completed', row_count, datetime.now().isoformat(timespec='seconds'), fingerprint, stage)
+        )
+
+    def matches(self, record: Optional[Dict], fingerprint: str, params: Dict) -> bool:
+        """记录的源文件指纹和参数是否与本次运行一致"""
+        return (
+            record is not None
+            and record['source_fingerprint'] == fingerprint
+            and record['params'] == json.dumps(params, sort_keys=True)
+        )
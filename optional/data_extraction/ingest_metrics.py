@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+数据提取运行指标
+记录每个阶段读取的字节数（压缩/解压后）、解析行数、写入行数、磁盘读取/解压/写入/提交耗时
+和峰值内存，输出JSON运行报告，并可按固定间隔输出进度日志，用于判断瓶颈在I/O、解析还是SQLite写入
+"""
+
+import io
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程峰值常驻内存（MB），不支持resource模块的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+class CountingReader(io.RawIOBase):
+    """统计经过的字节数和读取耗时的二进制读取包装（每次读取一个缓冲块，开销可忽略）"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+        self.seconds = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        start = time.perf_counter()
+        data = self.raw.read(len(buffer))
+        self.seconds += time.perf_counter() - start
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        return size
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+class StageMetrics:
+    """单个阶段的计数器（由SourceReader和写入循环更新）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = 'running'
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self.commit_seconds = 0.0
+        self.checkpoint_seconds = 0.0
+        self.peak_rss_mb: Optional[float] = None
+        # 源文件读取器（提供行数、字节数和读取耗时），没有源文件的阶段为None
+        self.source = None
+        # 外部排序去重器（提供有序段数和溢写字节数），未启用外部排序时为None
+        self.sort = None
+
+    def snapshot(self) -> Dict:
+        """当前计数和速率"""
+        elapsed = self.elapsed if self.status != 'running' else time.perf_counter() - self.started
+        source = self.source
+        lines = source.lines_read if source is not None else 0
+        bytes_read = source.bytes_read if source is not None else 0
+        bytes_decompressed = source.bytes_decompressed if source is not None else 0
+        read_seconds = source.read_seconds if source is not None else 0.0
+        # 解压耗时包含其中的磁盘读取，拆开后三者与写入耗时之和约等于阶段总耗时
+        decompress_seconds = max((source.decode_seconds if source is not None else 0.0) - read_seconds, 0.0)
+        parse_seconds = max(elapsed - read_seconds - decompress_seconds - self.write_seconds, 0.0)
+
+        def rate(value):
+            return value / elapsed if elapsed > 0 else 0.0
+
+        return {
+            'stage': self.name,
+            'status': self.status,
+            'elapsed_seconds': round(elapsed, 3),
+            'lines_read': lines,
+            'rows_written': self.rows_written,
+            'bytes_read': bytes_read,
+            'bytes_decompressed': bytes_decompressed,
+            'read_seconds': round(read_seconds, 3),
+            'decompress_seconds': round(decompress_seconds, 3),
+            'parse_seconds': round(parse_seconds, 3),
+            'write_seconds': round(self.write_seconds, 3),
+            'commit_seconds': round(self.commit_seconds, 3),
+            'checkpoint_seconds': round(self.checkpoint_seconds, 3),
+            'lines_per_second': round(rate(lines), 1),
+            'rows_per_second': round(rate(self.rows_written), 1),
+            'read_mb_per_second': round(rate(bytes_read) / (1024 * 1024), 2),
+            'peak_rss_mb': self.peak_rss_mb if self.peak_rss_mb is not None else peak_rss_mb(),
+            'external_sort': {
+                'runs': self.sort.num_runs,
+                'spill_bytes': self.sort.spill_bytes,
+                'duplicates_removed': self.sort.rows_in - self.sort.rows_out,
+            } if self.sort is not None else None,
+        }
+
+
+class IngestMetrics:
+    """
+    一次提取运行的指标收集器
+
+    Example:
+        metrics = IngestMetrics(log_interval=30)
+        with metrics.stage('protein_info') as stage:
+            ...
+        metrics.write_report("data/ingest_report.json")
+    """
+
+    def __init__(self, log_interval: Optional[float] = None):
+        """
+        Args:
+            log_interval: 进度日志间隔（秒），None表示不输出周期日志
+        """
+        self.log_interval = log_interval
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self._started = time.perf_counter()
+        self.stages: List[StageMetrics] = []
+        self._last_log = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """记录一个阶段（异常退出时状态为failed）"""
+        stage = StageMetrics(name)
+        self.stages.append(stage)
+        self._last_log = time.perf_counter()
+        try:
+            yield stage
+        except BaseException:
+            stage.status = 'failed'
+            raise
+        finally:
+            stage.elapsed = time.perf_counter() - stage.started
+            stage.peak_rss_mb = peak_rss_mb()
+            if stage.status == 'running':
+                stage.status = 'completed'
+            if stage.status != 'skipped':
+                self._log(stage, final=True)
+
+    def tick(self, stage: StageMetrics):
+        """距上次日志超过间隔时输出一行进度"""
+        if self.log_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            self._log(stage)
+
+    def _log(self, stage: StageMetrics, final: bool = False):
+        if self.log_interval is None and not final:
+            return
+        snap = stage.snapshot()
+        logger.info(
+            "%s %s: %.1f 秒, 读取 %d 行 (%.0f 行/秒), 写入 %d 行 (%.0f 行/秒), "
+            "压缩 %.1f MB / 解压 %.1f MB, 写入 %.1f 秒 (提交 %.1f 秒), 峰值内存 %s MB",
+            "阶段完成" if final else "进度", snap['stage'], snap['elapsed_seconds'],
+            snap['lines_read'], snap['lines_per_second'], snap['rows_written'], snap['rows_per_second'],
+            snap['bytes_read'] / (1024 * 1024), snap['bytes_decompressed'] / (1024 * 1024),
+            snap['write_seconds'], snap['commit_seconds'],
+            f"{snap['peak_rss_mb']:.0f}" if snap['peak_rss_mb'] is not None else '?'
+        )
+
+    def report(self, config: Optional[Dict] = None) -> Dict:
+        """运行报告（各阶段快照和汇总）"""
+        stages = [stage.snapshot() for stage in self.stages]
+        return {
+            'started_at': self.started_at,
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.perf_counter() - self._started, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'config': config or {},
+            'totals': {
+                key: round(sum(stage[key] for stage in stages), 3)
+                for key in ('lines_read', 'rows_written', 'bytes_read', 'bytes_decompressed',
+                            'write_seconds', 'commit_seconds')
+            },
+            'stages': stages,
+        }
+
+    def write_report(self, path: Path, config: Optional[Dict] = None) -> Dict:
+        """将运行报告写为JSON文件"""
+        report = self.report(config)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info("运行报告已写入 %s", path)
+        return report
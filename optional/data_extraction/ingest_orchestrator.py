@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+流水线式数据提取调度器
+下载、解压、解析和写入重叠进行：尚未下载的源文件边下载边解压解析（同时落盘为与顺序流程相同的
+.gz和解压文件），相互独立的源文件并发处理；所有数据库写入由单一写入线程串行执行，
+各环节之间使用有界队列，内存占用与文件大小无关
+"""
+
+import asyncio
+import collections
+import gzip
+import io
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from ingest_manifest import fingerprint_files
+from ingest_metrics import CountingReader
+from ingest_stats import StatsAccumulator
+from source_reader import READ_BUFFER_SIZE, SourceReader
+
+logger = logging.getLogger(__name__)
+
+# 下载线程每次放入队列的字节数，以及队列中最多缓存的块数
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+DOWNLOAD_QUEUE_CHUNKS = 16
+
+
+class DownloadStream(io.RawIOBase):
+    """
+    边下载边读取的二进制流
+
+    后台线程把响应内容写入 .part 文件并放入有界队列，读取端从队列取数据，
+    下载速度和解析速度中较慢的一方决定吞吐量，内存最多缓存 DOWNLOAD_QUEUE_CHUNKS 个块。
+    """
+
+    def __init__(self, url: str, part_path: Path):
+        self.url = url
+        self.part_path = part_path
+        self.finished = False
+        self._chunks: 'queue.Queue' = queue.Queue(maxsize=DOWNLOAD_QUEUE_CHUNKS)
+        self._pending = b''
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._download, name=f"download-{part_path.name}", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._cancelled.is_set():
+            try:
+                self._chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _download(self):
+        try:
+            with requests.get(self.url, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                with open(self.part_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        if not self._put(chunk):
+                            return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            if self.finished:
+                return 0
+            item = self._chunks.get()
+            if item is None:
+                self.finished = True
+                return 0
+            if isinstance(item, Exception):
+                raise item
+            self._pending = item
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.finished:
+            # 解析提前结束：通知下载线程停止
+            self._cancelled.set()
+        self._thread.join()
+        super().close()
+
+
+class TeeReader(io.RawIOBase):
+    """读取的同时把内容写入另一个文件（流式解压时同时生成解压后的源文件）"""
+
+    def __init__(self, raw, output_path: Path):
+        self.raw = raw
+        self.output = open(output_path, 'wb')
+        self.finished = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.raw.readinto(buffer)
+        if size:
+            self.output.write(buffer[:size])
+        else:
+            self.finished = True
+        return size
+
+    def close(self):
+        self.output.close()
+        self.raw.close()
+        super().close()
+
+
+class StreamingSourceReader(SourceReader):
+    """
+    支持边下载边解析的源文件读取器
+
+    sources中的每一项为 (下载URL, .gz路径, 解析路径)。解析路径已存在时与SourceReader相同；
+    否则读取已下载的.gz，或直接读取下载流，并把下载内容和解压内容分别写入 .part 文件，
+    读完后重命名为.gz路径和解析路径，结果与顺序流程先下载再解压完全一致。
+    """
+
+    def __init__(self, sources: List[tuple], **kwargs):
+        super().__init__([path for _, _, path in sources], **kwargs)
+        self._sources = {Path(path): (url, Path(gz_path)) for url, gz_path, path in sources}
+        self._renames: List[tuple] = []
+        self._streams: List[io.RawIOBase] = []
+
+    def _open(self, path: Path) -> io.TextIOWrapper:
+        if path.exists():
+            return super()._open(path)
+
+        url, gz_path = self._sources[path]
+        self._renames, self._streams = [], []
+        if gz_path.exists():
+            raw = open(gz_path, 'rb')
+        else:
+            part = gz_path.with_name(gz_path.name + '.part')
+            logger.info("边下载边解析: %s", gz_path.name)
+            raw = DownloadStream(url, part)
+            self._renames.append((part, gz_path))
+            self._streams.append(raw)
+
+        self._disk = CountingReader(raw)
+        self._decoded = CountingReader(gzip.GzipFile(fileobj=self._disk, mode='rb'))
+        decoded = self._decoded
+        if path != gz_path:
+            part = path.with_name(path.name + '.part')
+            decoded = TeeReader(self._decoded, part)
+            self._renames.append((part, path))
+            self._streams.append(decoded)
+        return io.TextIOWrapper(io.BufferedReader(decoded, READ_BUFFER_SIZE), encoding='utf-8')
+
+    def _close(self, f: io.TextIOWrapper):
+        super()._close(f)
+        # 只有完整读到末尾的下载/解压结果才落盘为正式文件，中断时下次重新下载
+        if self._streams and all(stream.finished for stream in self._streams):
+            for part, final in self._renames:
+                part.replace(final)
+        self._renames, self._streams = [], []
+
+
+class IngestOrchestrator:
+    """
+    流水线式提取调度器
+
+    asyncio负责调度：每类源文件是一条任务链，最多max_parallel_files条同时运行，
+    下载、解压和解析在工作线程中进行（zlib解压、网络读取和SQLite执行期间会释放GIL，
+    因此能与解析重叠）。所有写入（建表后的清空、阶段清单、批次写入、统计）提交给单线程的
+    写入执行器，SQLite始终只有一个写入者；待写入批次数受信号量限制，解析快于写入时自动等待。
+
+    Example:
+        extractor = StringDataExtractor("data", confidence_threshold=0.9)
+        IngestOrchestrator(extractor, max_parallel_files=4).run()
+    """
+
+    def __init__(self, extractor, max_parallel_files: int = 4, max_pending_batches: int = 8):
+        """
+        Args:
+            extractor: StringDataExtractor（提供解析器、阶段参数和写入器）
+            max_parallel_files: 同时处理的源文件类型数
+            max_pending_batches: 等待写入的批次上限（所有文件共享）
+        """
+        self.extractor = extractor
+        self.max_parallel_files = max_parallel_files
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+        self._workers = ThreadPoolExecutor(max_workers=max_parallel_files, thread_name_prefix='ingest')
+        self._pending = threading.BoundedSemaphore(max_pending_batches)
+
+    def _write(self, func: Callable, *args) -> Future:
+        """提交写入任务（在写入线程中按提交顺序执行）"""
+        return self._writer.submit(func, *args)
+
+    def _submit_batch(self, func: Callable, inflight: 'collections.deque'):
+        """提交一个批次写入：超过待写入上限时阻塞，并检查已完成批次的错误"""
+        self._pending.acquire()
+        future = self._write(func)
+        future.add_done_callback(lambda _: self._pending.release())
+        inflight.append(future)
+        while inflight and inflight[0].done():
+            inflight.popleft().result()
+
+    def _stage_jobs(self) -> List[List[Callable]]:
+        """任务链：同一链内按顺序执行，不同链并发（大文件在前，尽早开始）"""
+        ex = self.extractor
+        links_detailed = ex._source_specs('protein_links_detailed', 'protein.links.detailed.v12.0.txt.gz')
+
+        chains = []
+        if ex.score_floor is not None:
+            # 阈值无关存储完成后，两张相互作用表由它物化（写入线程中执行）
+            chains.append([
+                lambda: self._run_stage('protein_interactions_scored', links_detailed,
+                                        ex._parse_scored_interactions),
+                lambda: self._write(ex._materialize_from_scored, 'protein_interactions').result(),
+                lambda: self._write(ex._materialize_from_scored, 'protein_interactions_detailed').result(),
+            ])
+        else:
+            counters = {'total': 0, 'kept': 0}
+            chains.append([lambda: self._run_stage('protein_interactions_detailed', links_detailed,
+                                                   ex._parse_detailed_interactions)])
+            chains.append([lambda: self._run_stage(
+                'protein_interactions', ex._source_specs('protein_links', 'protein.links.v12.0.txt.gz'),
+                ex._parse_interactions, counters)])
+
+        chains.append([lambda: self._run_stage(
+            'protein_sequences',
+            ex._source_specs('protein_sequences', 'protein.sequences.v12.0.fa.gz', extract=False),
+            ex._parse_sequences, header=False, lookahead=1, chunk_size=1000)])
+        chains.append([lambda: self._run_stage(
+            'protein_info', ex._source_specs('protein_info', 'protein.info.v12.0.txt.gz'), ex._parse_protein_info)])
+        chains.append([lambda: self._run_stage(
+            'protein_clusters', ex._source_specs('clusters_proteins', 'clusters.proteins.v12.0.txt.gz'),
+            ex._parse_protein_clusters)])
+        chains.append([lambda: self._run_stage(
+            'cluster_info', ex._source_specs('clusters_info', 'clusters.info.v12.0.txt.gz'), ex._parse_cluster_info)])
+        chains.append([
+            lambda: self._run_stage('cluster_tree', ex._source_specs('clusters_tree', 'clusters.tree.v12.0.txt.gz'),
+                                    ex._parse_cluster_tree),
+            lambda: self._write(ex.build_cluster_closure).result(),
+        ])
+        return chains
+
+    def _run_stage(self, table: str, sources: List[tuple], parser: Callable, *args,
+                   header: bool = True, lookahead: int = 0, chunk_size: int = 10000) -> int:
+        """
+        在工作线程中运行一个阶段（跳过/恢复规则与StringDataExtractor._run_stage相同）
+
+        源文件尚未下载时无法预先计算指纹，阶段以空指纹开始，完成后写入下载文件的指纹；
+        中断后指纹不匹配，下次从头运行。
+        """
+        ex = self.extractor
+        manifest = ex._get_manifest()
+        paths = [Path(path) for _, _, path in sources]
+        params = ex._stage_params(table)
+        record = manifest.get(table)
+        local = all(path.exists() for path in paths)
+        fingerprint = fingerprint_files(paths) if local else ''
+        unchanged = local and ex.incremental and manifest.matches(record, fingerprint, params)
+
+        with ex.metrics.stage(table) as stage:
+            if unchanged and record['status'] == 'completed':
+                logger.info("阶段 %s 的源文件和参数未变化，跳过（%d 行）", table, record['row_count'])
+                stage.status = 'skipped'
+                return record['row_count']
+
+            sort_rows = ex._uses_external_sort(table)
+            resume = (unchanged and record['status'] == 'running' and ex.storage_backend == 'sqlite'
+                      and not sort_rows)
+            if resume:
+                skip_lines, base_rows = record['lines_consumed'], record['row_count']
+                logger.info("阶段 %s 从检查点恢复：跳过 %d 行源数据", table, skip_lines)
+                stage.status = 'resumed'
+            else:
+                skip_lines, base_rows = 0, 0
+
+                def restart():
+                    ex._clear_table(table)
+                    ex._get_stats().discard(table)
+                    manifest.start(table, fingerprint, params)
+                self._write(restart).result()
+
+            reader = StreamingSourceReader(sources, header=header, skip_lines=skip_lines,
+                                           on_progress=lambda: ex.metrics.tick(stage))
+            stage.source = reader
+            accumulator = StatsAccumulator(table)
+            sink = self._write(ex._open_sink, table).result()
+            inflight: 'collections.deque[Future]' = collections.deque()
+
+            def write_batch(rows: List[tuple], lines_consumed: Optional[int] = None, total_rows: int = 0):
+                start = time.perf_counter()
+                sink.write(rows)
+                stage.write_seconds += time.perf_counter() - start
+                stage.rows_written += len(rows)
+                # 最后一个批次不记录检查点（阶段随后标记完成）
+                if lines_consumed is not None:
+                    start = time.perf_counter()
+                    manifest.checkpoint(table, lines_consumed, total_rows)
+                    stage.checkpoint_seconds += time.perf_counter() - start
+
+            row_count = base_rows
+            batch: List[tuple] = []
+            try:
+                for row in ex._dedup_rows(table, parser(reader, *args), stage):
+                    batch.append(row)
+                    if len(batch) >= chunk_size:
+                        accumulator.observe(batch)
+                        row_count += len(batch)
+                        # 检查点行号在解析线程中取得，与该批次对应（外部排序的批次不对应源文件行号）
+                        lines_consumed = None if sort_rows else reader.lines_read - lookahead
+                        self._submit_batch(
+                            lambda rows=batch, lines=lines_consumed, total=row_count: write_batch(rows, lines, total),
+                            inflight
+                        )
+                        batch = []
+                        ex.metrics.tick(stage)
+                if batch:
+                    accumulator.observe(batch)
+                    row_count += len(batch)
+                    self._submit_batch(lambda rows=batch: write_batch(rows), inflight)
+            finally:
+                # 写入线程按提交顺序执行，关闭任务完成时之前的批次都已提交
+                self._write(sink.close).result()
+                for future in inflight:
+                    future.result()
+                stage.commit_seconds += getattr(sink, 'commit_seconds', 0.0)
+
+            def finish():
+                final = accumulator
+                if resume:
+                    final = ex._compute_table_stats(table)
+                ex._get_stats().save_accumulator(final)
+                manifest.complete(table, row_count, fingerprint_files(paths))
+            self._write(finish).result()
+
+        logger.info("阶段 %s 完成，共 %d 行", table, row_count)
+        return row_count
+
+    async def _run_chains(self):
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self.max_parallel_files)
+
+        async def run_chain(chain: List[Callable]):
+            for step in chain:
+                async with limit:
+                    await loop.run_in_executor(self._workers, step)
+
+        await asyncio.gather(*(run_chain(chain) for chain in self._stage_jobs()))
+
+    def run(self) -> Dict:
+        """运行全部阶段并返回统计信息"""
+        ex = self.extractor
+        ex.setup_storage()
+        logger.info("流水线提取：最多 %d 类源文件并发，单线程写入", self.max_parallel_files)
+
+        try:
+            asyncio.run(self._run_chains())
+        finally:
+            self._workers.shutdown(wait=True)
+            self._writer.shutdown(wait=True)
+
+        if ex.score_floor is not None:
+            logger.info("分数直方图: %d 个分数取值", len(ex.get_score_histogram()))
+        return ex._finish_extraction()
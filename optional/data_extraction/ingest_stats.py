@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+数据提取统计
+在写入数据时逐批累计行数、各物种蛋白质数、分数直方图和最大聚类，
+阶段完成后保存到ingest_stats表，get_statistics无需扫描大表即可返回
+"""
+
+import heapq
+import json
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from storage_backends import TABLE_COLUMNS
+
+# 需要额外统计的列
+SPECIES_COLUMNS = {'protein_info': 'species_id'}
+SCORE_COLUMNS = {
+    'protein_interactions': 'combined_score',
+    'protein_interactions_scored': 'combined_score',
+}
+TOP_COLUMNS = {'cluster_info': ('cluster_id', 'cluster_size')}
+TOP_K = 10
+
+# get_statistics中的计数项及其对应的表
+COUNT_KEYS = {
+    'total_proteins': 'protein_info',
+    'high_confidence_interactions': 'protein_interactions',
+    'detailed_interactions': 'protein_interactions_detailed',
+    'scored_interactions': 'protein_interactions_scored',
+    'proteins_with_sequences': 'protein_sequences',
+    'total_clusters': 'cluster_info',
+    'protein_cluster_mappings': 'protein_clusters',
+    'cluster_tree_edges': 'cluster_tree',
+}
+
+# 只在特定模式下写入的表，缺少统计时按0计
+OPTIONAL_TABLES = {'protein_interactions_scored'}
+
+
+class StatsAccumulator:
+    """单张表的增量统计（行需为TABLE_COLUMNS顺序、整数化之前的原始值）"""
+
+    def __init__(self, table: str):
+        self.table = table
+        columns = TABLE_COLUMNS[table]
+        self.row_count = 0
+        self.species_counts: Counter = Counter()
+        self.score_histogram: Counter = Counter()
+        self.top_items: List[tuple] = []
+
+        self._species_index = columns.index(SPECIES_COLUMNS[table]) if table in SPECIES_COLUMNS else None
+        self._score_index = columns.index(SCORE_COLUMNS[table]) if table in SCORE_COLUMNS else None
+        if table in TOP_COLUMNS:
+            key_column, value_column = TOP_COLUMNS[table]
+            self._top_indices = (columns.index(key_column), columns.index(value_column))
+        else:
+            self._top_indices = None
+
+    def observe(self, rows: Sequence[tuple]):
+        """累计一个批次"""
+        self.row_count += len(rows)
+        if self._species_index is not None:
+            self.species_counts.update(row[self._species_index] for row in rows)
+        if self._score_index is not None:
+            self.score_histogram.update(row[self._score_index] for row in rows)
+        if self._top_indices is not None:
+            key_index, value_index = self._top_indices
+            self.top_items = heapq.nlargest(
+                TOP_K, self.top_items + [(row[key_index], row[value_index]) for row in rows],
+                key=lambda item: item[1]
+            )
+
+
+class IngestStats:
+    """统计存储（与阶段清单保存在同一个SQLite文件中）"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_stats (
+                table_name TEXT PRIMARY KEY,
+                row_count INTEGER,
+                species_counts TEXT,
+                score_histogram TEXT,
+                top_items TEXT,
+                updated_at TEXT
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def save(self, table: str, row_count: int, species_counts: Optional[Dict] = None,
+             score_histogram: Optional[Dict] = None, top_items: Optional[Iterable[tuple]] = None):
+        """保存一张表的统计（覆盖之前的记录）"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            'INSERT OR REPLACE INTO ingest_stats VALUES (?, ?, ?, ?, ?, ?)',
+            (table, row_count,
+             json.dumps(dict(species_counts)) if species_counts else None,
+             json.dumps(dict(score_histogram)) if score_histogram else None,
+             json.dumps([list(item) for item in top_items]) if top_items else None,
+             datetime.now().isoformat(timespec='seconds'))
+        )
+        conn.commit()
+        conn.close()
+
+    def discard(self, table: str):
+        """删除一张表的统计（阶段重新运行期间统计视为缺失）"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('DELETE FROM ingest_stats WHERE table_name = ?', (table,))
+        conn.commit()
+        conn.close()
+
+    def save_accumulator(self, accumulator: StatsAccumulator):
+        self.save(accumulator.table, accumulator.row_count, accumulator.species_counts,
+                  accumulator.score_histogram, accumulator.top_items)
+
+    def load(self) -> Dict[str, Dict]:
+        """读取全部表的统计"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            'SELECT table_name, row_count, species_counts, score_histogram, top_items FROM ingest_stats'
+        ).fetchall()
+        conn.close()
+
+        records = {}
+        for table, row_count, species_counts, score_histogram, top_items in rows:
+            records[table] = {
+                'row_count': row_count,
+                # JSON对象的键是字符串，还原为整数
+                'species_counts': {int(k): v for k, v in json.loads(species_counts).items()} if species_counts else {},
+                'score_histogram': {int(k): v for k, v in json.loads(score_histogram).items()} if score_histogram else {},
+                'top_items': [tuple(item) for item in json.loads(top_items)] if top_items else [],
+            }
+        return records
+
+    def get_score_histogram(self, table: str) -> Optional[List[tuple]]:
+        """读取某张表的分数直方图 [(score, count), ...]，没有统计时返回None"""
+        record = self.load().get(table)
+        if record is None:
+            return None
+        return sorted(record['score_histogram'].items())
+
+    def get_statistics(self) -> Optional[Dict]:
+        """由统计表组装与精确统计相同结构的结果，有表缺少统计时返回None"""
+        records = self.load()
+        if any(table not in records for table in COUNT_KEYS.values() if table not in OPTIONAL_TABLES):
+            return None
+
+        def count(table):
+            return records[table]['row_count'] if table in records else 0
+
+        species_counts = records['protein_info']['species_counts']
+        stats = {key: count(table) for key, table in COUNT_KEYS.items()}
+        stats['total_species'] = len(species_counts)
+        stats['top_species'] = sorted(species_counts.items(), key=lambda item: item[1], reverse=True)[:TOP_K]
+        stats['top_clusters'] = records['cluster_info']['top_items']
+
+        # 与精确统计的键顺序保持一致
+        order = ['total_proteins', 'total_species', 'high_confidence_interactions', 'detailed_interactions',
+                 'scored_interactions', 'proteins_with_sequences', 'total_clusters',
+                 'protein_cluster_mappings', 'cluster_tree_edges', 'top_species', 'top_clusters']
+        return {key: stats[key] for key in order}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+蛋白质ID整数化
+为STRING蛋白质ID（如 9606.ENSP00000000233）分配稠密整数ID，并持久化到protein_id_map表
+"""
+
+import sqlite3
+from typing import Dict, List, Sequence, Tuple
+
+
+def parse_species_id(protein_id: str) -> int:
+    """从 taxid.xxx 格式的蛋白质ID中提取物种ID"""
+    return int(protein_id.split('.', 1)[0])
+
+
+class ProteinIdInterner:
+    """
+    蛋白质ID整数化器
+
+    ID按首次出现的顺序分配。protein.info最先加载且按物种排序，
+    因此同一物种的蛋白质获得连续的整数ID。
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self._pending: List[Tuple[int, str, int]] = []
+
+    @classmethod
+    def from_database(cls, conn: sqlite3.Connection) -> 'ProteinIdInterner':
+        """从已有的protein_id_map表恢复映射"""
+        interner = cls()
+        for protein_idx, protein_id in conn.execute(
+            'SELECT protein_idx, protein_id FROM protein_id_map ORDER BY protein_idx'
+        ):
+            interner.ids[protein_id] = protein_idx
+        return interner
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intern(self, protein_id: str) -> int:
+        """返回蛋白质ID对应的整数ID，未见过的ID分配新编号"""
+        protein_idx = self.ids.get(protein_id)
+        if protein_idx is None:
+            protein_idx = len(self.ids)
+            self.ids[protein_id] = protein_idx
+            self._pending.append((protein_idx, protein_id, parse_species_id(protein_id)))
+        return protein_idx
+
+    def encode_rows(self, rows: Sequence[tuple], id_positions: Sequence[int]) -> List[tuple]:
+        """将行中指定位置的蛋白质ID替换为整数ID"""
+        encoded = []
+        for row in rows:
+            row = list(row)
+            for position in id_positions:
+                row[position] = self.intern(row[position])
+            encoded.append(tuple(row))
+        return encoded
+
+    def flush(self, conn: sqlite3.Connection):
+        """将新分配的ID写入protein_id_map（由调用方提交事务）"""
+        if self._pending:
+            conn.executemany('INSERT INTO protein_id_map VALUES (?, ?, ?)', self._pending)
+            self._pending = []
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+压缩蛋白质序列存储
+序列按写入批次打包为压缩块（sequence_blocks），sequence_index记录每条序列所在的块、
+偏移、长度和物种，可按长度/物种筛选并批量读取，只解压涉及的块
+"""
+
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from protein_ids import parse_species_id
+
+# 每条IN查询的参数个数（低于SQLite默认的变量上限999）
+IN_CHUNK_SIZE = 900
+
+
+def _zstd():
+    """可选的zstandard模块（未安装时返回None）"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress_block(data: bytes) -> Tuple[str, bytes]:
+    """压缩一个序列块，优先使用zstd，未安装zstandard时使用zlib"""
+    zstandard = _zstd()
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=9).compress(data)
+    return 'zlib', zlib.compress(data, 9)
+
+
+def decompress_block(codec: str, data: bytes) -> bytes:
+    """按块记录的编码解压"""
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        zstandard = _zstd()
+        if zstandard is None:
+            raise ImportError("该序列块使用zstd压缩，需要安装zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"未知的序列块编码: {codec}")
+
+
+def create_sequence_tables(cursor: sqlite3.Cursor, id_type: str = 'TEXT'):
+    """创建序列块表和序列索引表"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sequence_blocks (
+            block_id INTEGER PRIMARY KEY,
+            codec TEXT,
+            raw_size INTEGER,
+            data BLOB
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS sequence_index (
+            protein_id {id_type} PRIMARY KEY,
+            species_id INTEGER,
+            length INTEGER,
+            block_id INTEGER,
+            offset INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sequence_length ON sequence_index(length)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sequence_species ON sequence_index(species_id, length)')
+
+
+class SequenceBlockSink:
+    """
+    序列块写入器：每个写入批次打包为一个压缩块，与其索引行在同一事务中提交
+
+    残基按ASCII单字节编码后直接拼接，压缩由块编码完成。传入interner时索引中的蛋白质ID
+    替换为整数ID。replace=False时索引使用普通INSERT（行已按蛋白质ID去重）。
+    """
+
+    def __init__(self, db_path: Path, interner=None, replace: bool = True):
+        self.conn = sqlite3.connect(db_path)
+        self.interner = interner
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        self.index_sql = f'{verb} INTO sequence_index VALUES (?, ?, ?, ?, ?)'
+        self.commit_seconds = 0.0
+
+    def write(self, rows: Sequence[tuple]):
+        """写入一个批次 [(protein_id, sequence), ...]"""
+        if not rows:
+            return
+        offsets = []
+        parts = []
+        offset = 0
+        for protein_id, sequence in rows:
+            encoded = sequence.encode('ascii')
+            offsets.append((protein_id, parse_species_id(protein_id), len(encoded), offset))
+            parts.append(encoded)
+            offset += len(encoded)
+
+        raw = b''.join(parts)
+        codec, data = compress_block(raw)
+        block_id = self.conn.execute(
+            'INSERT INTO sequence_blocks (codec, raw_size, data) VALUES (?, ?, ?)',
+            (codec, len(raw), data)
+        ).lastrowid
+
+        if self.interner is not None:
+            offsets = self.interner.encode_rows(offsets, [0])
+            self.interner.flush(self.conn)
+        self.conn.executemany(
+            self.index_sql,
+            [(protein_id, species_id, length, block_id, start)
+             for protein_id, species_id, length, start in offsets]
+        )
+        start = time.perf_counter()
+        self.conn.commit()
+        self.commit_seconds += time.perf_counter() - start
+
+    def close(self):
+        self.conn.close()
+
+
+class SequenceStore:
+    """
+    压缩序列读取器
+
+    Example:
+        store = SequenceStore("data/string_data.db")
+        ids = store.select_ids(min_length=50, max_length=1000, species_ids=[9606])
+        sequences = store.get_sequences(ids[:1024])
+    """
+
+    def __init__(self, db_path: Optional[Path] = None, cache_blocks: int = 64,
+                 conn: Optional[sqlite3.Connection] = None):
+        """
+        Args:
+            db_path: 数据库路径
+            cache_blocks: 保留的已解压块数
+            conn: 使用已有连接（如查询层的只读连接池），此时close()不关闭连接
+        """
+        self._owns_connection = conn is None
+        self.conn = conn if conn is not None else sqlite3.connect(Path(db_path))
+        row = self.conn.execute("SELECT value FROM db_meta WHERE key = 'id_mode'").fetchone()
+        self.interned = row is not None and row[0] == 'interned'
+        self.cache_blocks = cache_blocks
+        self._cache: 'OrderedDict[int, bytes]' = OrderedDict()
+
+    def close(self):
+        if self._owns_connection:
+            self.conn.close()
+
+    def location_select(self) -> str:
+        """返回STRING原始蛋白质ID的查询片段（整数ID模式通过protein_id_map解码）"""
+        if self.interned:
+            return ('SELECT m.protein_id, i.block_id, i.offset, i.length '
+                    'FROM sequence_index i JOIN protein_id_map m ON m.protein_idx = i.protein_id')
+        return 'SELECT i.protein_id, i.block_id, i.offset, i.length FROM sequence_index i'
+
+    def _block(self, block_id: int) -> bytes:
+        """读取并解压一个块（保留最近使用的若干块）"""
+        raw = self._cache.get(block_id)
+        if raw is not None:
+            self._cache.move_to_end(block_id)
+            return raw
+        codec, data = self.conn.execute(
+            'SELECT codec, data FROM sequence_blocks WHERE block_id = ?', (block_id,)
+        ).fetchone()
+        raw = decompress_block(codec, data)
+        self._cache[block_id] = raw
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return raw
+
+    def decode(self, locations: List[tuple]) -> Iterator[Tuple[str, str]]:
+        """按块顺序解码 (protein_id, block_id, offset, length) 列表，每个块只解压一次"""
+        for protein_id, block_id, offset, length in sorted(locations, key=lambda loc: (loc[1], loc[2])):
+            raw = self._block(block_id)
+            yield protein_id, raw[offset:offset + length].decode('ascii')
+
+    def get_sequences(self, protein_ids: Iterable[str]) -> Dict[str, str]:
+        """批量读取序列，返回 {protein_id: sequence}（不存在的ID不出现在结果中）"""
+        protein_ids = list(dict.fromkeys(protein_ids))
+        id_column = 'm.protein_id' if self.interned else 'i.protein_id'
+
+        locations = []
+        for start in range(0, len(protein_ids), IN_CHUNK_SIZE):
+            chunk = protein_ids[start:start + IN_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            locations.extend(self.conn.execute(
+                f'{self.location_select()} WHERE {id_column} IN ({placeholders})', chunk
+            ))
+        return dict(self.decode(locations))
+
+    def _where(self, min_length: Optional[int], max_length: Optional[int],
+               species_ids: Optional[Iterable[int]]) -> Tuple[str, list]:
+        conditions, params = [], []
+        if species_ids is not None:
+            species_ids = list(species_ids)
+            conditions.append(f"i.species_id IN ({', '.join('?' * len(species_ids))})")
+            params.extend(species_ids)
+        if min_length is not None:
+            conditions.append('i.length >= ?')
+            params.append(min_length)
+        if max_length is not None:
+            conditions.append('i.length <= ?')
+            params.append(max_length)
+        return (' WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+    def select_ids(self, min_length: Optional[int] = None, max_length: Optional[int] = None,
+                   species_ids: Optional[Iterable[int]] = None) -> List[str]:
+        """按长度和物种筛选蛋白质ID（只查询索引，不解压序列）"""
+        where, params = self._where(min_length, max_length, species_ids)
+        return [row[0] for row in self.conn.execute(f'{self.location_select()}{where}', params)]
+
+    def iter_sequences(self, min_length: Optional[int] = None, max_length: Optional[int] = None,
+                       species_ids: Optional[Iterable[int]] = None,
+                       batch_size: int = 100000) -> Iterator[Tuple[str, str]]:
+        """按块顺序流式读取满足条件的序列（用于导出FASTA给ESM/MMseqs2等下游工具）"""
+        where, params = self._where(min_length, max_length, species_ids)
+        cursor = self.conn.execute(f'{self.location_select()}{where} ORDER BY i.block_id, i.offset', params)
+        while True:
+            locations = cursor.fetchmany(batch_size)
+            if not locations:
+                break
+            yield from self.decode(locations)
+
+    def write_fasta(self, path: Path, **filters) -> int:
+        """将满足条件的序列写为FASTA文件，返回序列数"""
+        count = 0
+        with open(path, 'w') as f:
+            for protein_id, sequence in self.iter_sequences(**filters):
+                f.write(f'>{protein_id}\n{sequence}\n')
+                count += 1
+        return count
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM sequence_index').fetchone()[0]
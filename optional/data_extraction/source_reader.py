@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+源文件读取器
+按行读取一个或多个STRING源文件，跳过表头并记录已读取的数据行数（用于断点续传）
+"""
+
+import gzip
+import io
+import itertools
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from ingest_metrics import CountingReader
+
+# 文本层的读取缓冲大小
+READ_BUFFER_SIZE = 1 << 20
+
+
+class SourceReader:
+    """
+    多文件按行读取器，.gz文件直接流式解压
+
+    同时统计磁盘读取字节数（压缩）、解压后字节数以及读取/解压耗时，供运行指标使用。
+    """
+
+    def __init__(self, paths: List[Path], header: bool = True, skip_lines: int = 0,
+                 on_progress: Optional[Callable[[], None]] = None, progress_every: int = 1 << 18):
+        """
+        Args:
+            paths: 源文件列表（按顺序读取）
+            header: 每个文件的第一行是否为表头
+            skip_lines: 跳过的数据行数（不含表头），用于从检查点恢复
+            on_progress: 每读取progress_every行调用一次（用于输出进度日志）
+            progress_every: 进度回调间隔行数
+        """
+        self.paths = [Path(path) for path in paths]
+        self.header = header
+        self.skip_lines = skip_lines
+        self.on_progress = on_progress
+        self.progress_every = progress_every
+        self.lines_read = 0
+
+        # 已读完文件的累计值，加上当前文件的计数即为总量
+        self._done = [0, 0, 0.0, 0.0]
+        self._disk: Optional[CountingReader] = None
+        self._decoded: Optional[CountingReader] = None
+
+    def _current(self, index: int) -> float:
+        disk, decoded = self._disk, self._decoded
+        if disk is None:
+            return 0
+        return (disk.bytes_read, decoded.bytes_read, disk.seconds, decoded.seconds)[index]
+
+    @property
+    def bytes_read(self) -> int:
+        """从磁盘读取的字节数（.gz文件为压缩字节）"""
+        return self._done[0] + self._current(0)
+
+    @property
+    def bytes_decompressed(self) -> int:
+        """解压后的字节数（未压缩文件与bytes_read相同）"""
+        return self._done[1] + self._current(1)
+
+    @property
+    def read_seconds(self) -> float:
+        """磁盘读取耗时"""
+        return self._done[2] + self._current(2)
+
+    @property
+    def decode_seconds(self) -> float:
+        """磁盘读取与解压的总耗时"""
+        return self._done[3] + self._current(3)
+
+    def _open(self, path: Path) -> io.TextIOWrapper:
+        self._disk = CountingReader(open(path, 'rb'))
+        if path.suffix == '.gz':
+            self._decoded = CountingReader(gzip.GzipFile(fileobj=self._disk, mode='rb'))
+        else:
+            self._decoded = self._disk
+        return io.TextIOWrapper(io.BufferedReader(self._decoded, READ_BUFFER_SIZE), encoding='utf-8')
+
+    def _close(self, f: io.TextIOWrapper):
+        f.close()
+        disk, decoded = self._disk, self._decoded
+        if decoded is not disk:
+            disk.close()
+        for i, value in enumerate((disk.bytes_read, decoded.bytes_read, disk.seconds, decoded.seconds)):
+            self._done[i] += value
+        self._disk = self._decoded = None
+
+    def __iter__(self) -> Iterator[str]:
+        remaining_skip = self.skip_lines
+
+        for path in self.paths:
+            f = self._open(path)
+            try:
+                if self.header:
+                    next(f, None)
+
+                if remaining_skip:
+                    skipped = sum(1 for _ in itertools.islice(f, remaining_skip))
+                    remaining_skip -= skipped
+                    self.lines_read += skipped
+
+                for line in f:
+                    self.lines_read += 1
+                    if self.on_progress is not None and self.lines_read % self.progress_every == 0:
+                        self.on_progress()
+                    yield line
+            finally:
+                self._close(f)
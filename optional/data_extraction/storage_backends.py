@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+STRING数据存储后端
+提供SQLite行存储与Parquet列式存储的统一写入接口，以及Parquet数据的按列/按分区读取
+"""
+
+import json
+import logging
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from protein_ids import parse_species_id
+
+logger = logging.getLogger(__name__)
+
+# 各表的列定义（顺序与setup_database中的表结构一致）
+TABLE_COLUMNS: Dict[str, List[str]] = {
+    'protein_info': ['protein_id', 'protein_name', 'species_id', 'species_name', 'annotation'],
+    'protein_interactions': ['protein1', 'protein2', 'combined_score'],
+    'protein_interactions_detailed': [
+        'protein1', 'protein2', 'neighborhood', 'fusion', 'cooccurence',
+        'coexpression', 'experimental', 'database', 'textmining', 'combined_score'
+    ],
+    # 阈值无关的相互作用存储：按分数聚簇，保留STRING原始的0-1000整数分数
+    'protein_interactions_scored': [
+        'combined_score', 'protein1', 'protein2', 'neighborhood', 'fusion', 'cooccurence',
+        'coexpression', 'experimental', 'database', 'textmining'
+    ],
+    'protein_sequences': ['protein_id', 'sequence'],
+    'cluster_info': ['cluster_id', 'cluster_name', 'cluster_description', 'cluster_size'],
+    'protein_clusters': ['protein_id', 'cluster_id'],
+    'cluster_tree': ['child_cluster_id', 'parent_cluster_id', 'distance'],
+}
+
+# 各表的主键列（与setup_database中的PRIMARY KEY一致，外部排序去重按这些列）
+PRIMARY_KEYS: Dict[str, List[str]] = {
+    'protein_info': ['protein_id'],
+    'protein_interactions': ['protein1', 'protein2'],
+    'protein_interactions_detailed': ['protein1', 'protein2'],
+    'protein_interactions_scored': ['combined_score', 'protein1', 'protein2'],
+    'protein_sequences': ['protein_id'],
+    'cluster_info': ['cluster_id'],
+    'protein_clusters': ['protein_id', 'cluster_id'],
+    'cluster_tree': ['child_cluster_id', 'parent_cluster_id'],
+}
+
+# 按物种分区的表：用于提取物种ID的蛋白质ID列（STRING的ID格式为 taxid.xxx）
+PARTITION_COLUMNS: Dict[str, str] = {
+    'protein_info': 'protein_id',
+    'protein_interactions': 'protein1',
+    'protein_interactions_detailed': 'protein1',
+    'protein_interactions_scored': 'protein1',
+    'protein_sequences': 'protein_id',
+    'protein_clusters': 'protein_id',
+}
+
+# 需要字典编码的蛋白质ID列
+DICTIONARY_COLUMNS = {'protein_id', 'protein1', 'protein2'}
+
+# Parquet分区目录中的分区键
+PARTITION_KEY = 'species_id'
+
+# Parquet数据集的存储模式元信息文件（与SQLite的db_meta表内容相同）
+DATASET_META_FILE = 'dataset_meta.json'
+
+
+def _require_pyarrow():
+    """按需导入pyarrow（可选依赖）"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("Parquet存储后端需要安装pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _arrow_schema(table: str):
+    """构建各表的Arrow schema（分区键不写入文件，由目录名恢复）"""
+    pa = _require_pyarrow()
+    protein_id = pa.dictionary(pa.int32(), pa.string())
+    schemas = {
+        'protein_info': [
+            ('protein_id', protein_id), ('protein_name', pa.string()),
+            ('species_name', pa.string()), ('annotation', pa.string()),
+        ],
+        'protein_interactions': [
+            ('protein1', protein_id), ('protein2', protein_id), ('combined_score', pa.int16()),
+        ],
+        'protein_interactions_detailed': [
+            ('protein1', protein_id), ('protein2', protein_id),
+        ] + [(name, pa.float64()) for name in TABLE_COLUMNS['protein_interactions_detailed'][2:]],
+        'protein_interactions_scored': [
+            ('combined_score', pa.int16()), ('protein1', protein_id), ('protein2', protein_id),
+        ] + [(name, pa.int16()) for name in TABLE_COLUMNS['protein_interactions_scored'][3:]],
+        'protein_sequences': [('protein_id', protein_id), ('sequence', pa.string())],
+        'cluster_info': [
+            ('cluster_id', pa.string()), ('cluster_name', pa.string()),
+            ('cluster_description', pa.string()), ('cluster_size', pa.int64()),
+        ],
+        'protein_clusters': [('protein_id', protein_id), ('cluster_id', pa.string())],
+        'cluster_tree': [
+            ('child_cluster_id', pa.string()), ('parent_cluster_id', pa.string()),
+            ('distance', pa.float64()),
+        ],
+    }
+    return pa.schema(schemas[table])
+
+
+def write_dataset_meta(root: Path, meta: Dict[str, str]):
+    """写出Parquet数据集的存储模式元信息（id_mode、edge_mode等）"""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / DATASET_META_FILE, 'w') as f:
+        json.dump(meta, f, indent=2, sort_keys=True)
+
+
+class SQLiteTableSink:
+    """
+    SQLite表写入器：按批次 INSERT OR REPLACE 并提交
+
+    replace=False时使用普通INSERT（调用方保证行已按主键去重，如外部排序去重后的输出）。
+    传入interner时，蛋白质ID列在写入前替换为整数ID，新分配的ID与该批次在同一事务中
+    写入protein_id_map。commit_seconds累计事务提交耗时（运行指标使用）。
+    """
+
+    def __init__(self, db_path: Path, table: str, interner=None, replace: bool = True):
+        self.table = table
+        self.conn = sqlite3.connect(db_path)
+        self.interner = interner
+        self.commit_seconds = 0.0
+        self.id_positions = [
+            i for i, name in enumerate(TABLE_COLUMNS[table]) if name in DICTIONARY_COLUMNS
+        ]
+        placeholders = ', '.join('?' * len(TABLE_COLUMNS[table]))
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        self.insert_sql = f'{verb} INTO {table} VALUES ({placeholders})'
+
+    def write(self, rows: Sequence[tuple]):
+        """写入一个批次"""
+        if self.interner is not None and self.id_positions:
+            rows = self.interner.encode_rows(rows, self.id_positions)
+            self.interner.flush(self.conn)
+        self.conn.executemany(self.insert_sql, rows)
+        start = time.perf_counter()
+        self.conn.commit()
+        self.commit_seconds += time.perf_counter() - start
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetTableSink:
+    """
+    Parquet表写入器
+
+    按物种ID分区（hive风格目录 species_id=X/），蛋白质ID列字典编码。
+    STRING文件按蛋白质ID排序，同一物种的行是连续的，因此每个分区只需保持一个
+    打开的写入器，物种切换时滚动到下一个分区文件。
+
+    指定sort_by时，每个分区文件在写入前整体排序（内存占用为最大的单个分区），
+    使row group的min/max统计信息可以按排序列裁剪。
+    """
+
+    def __init__(self, root: Path, table: str, row_group_size: int = 131072,
+                 sort_by: Optional[List[tuple]] = None):
+        self.pa = _require_pyarrow()
+        import pyarrow.parquet as pq
+        self.pq = pq
+
+        self.table = table
+        self.table_dir = Path(root) / table
+        self.row_group_size = row_group_size
+        self.columns = TABLE_COLUMNS[table]
+        self.schema = _arrow_schema(table)
+        self.partition_column = PARTITION_COLUMNS.get(table)
+        self.sort_by = sort_by
+
+        # 每次写入整张表时重建目录，避免重复运行产生重复数据
+        if self.table_dir.exists():
+            shutil.rmtree(self.table_dir)
+        self.table_dir.mkdir(parents=True)
+
+        self._writer = None
+        self._current_partition = None
+        self._buffer: List[tuple] = []
+        self._file_counts: Dict[Optional[int], int] = {}
+
+    def _partition_of(self, row: tuple) -> Optional[int]:
+        if self.partition_column is None:
+            return None
+        if self.table == 'protein_info':
+            return row[2]
+        return parse_species_id(row[self.columns.index(self.partition_column)])
+
+    def _open_writer(self, partition: Optional[int]):
+        part_index = self._file_counts.get(partition, 0)
+        self._file_counts[partition] = part_index + 1
+
+        if partition is None:
+            out_dir = self.table_dir
+        else:
+            out_dir = self.table_dir / f"{PARTITION_KEY}={partition}"
+        out_dir.mkdir(exist_ok=True)
+
+        dictionary_columns = [name for name in self.schema.names if name in DICTIONARY_COLUMNS]
+        self._writer = self.pq.ParquetWriter(
+            out_dir / f"part-{part_index}.parquet",
+            self.schema,
+            compression='zstd',
+            use_dictionary=dictionary_columns or True,
+            # 蛋白质ID基数很高，放宽字典页大小上限，避免回退为PLAIN编码
+            dictionary_pagesize_limit=64 * 1024 * 1024,
+        )
+        self._current_partition = partition
+
+    def _flush_buffer(self):
+        if not self._buffer:
+            return
+        if self._writer is None:
+            self._open_writer(self._current_partition)
+
+        arrays = []
+        for field in self.schema:
+            index = self.columns.index(field.name)
+            values = [row[index] for row in self._buffer]
+            if field.name in DICTIONARY_COLUMNS:
+                arrays.append(self.pa.array(values, type=self.pa.string()).dictionary_encode())
+            else:
+                arrays.append(self.pa.array(values, type=field.type))
+
+        table = self.pa.Table.from_arrays(arrays, schema=self.schema)
+        if self.sort_by:
+            table = table.sort_by(self.sort_by)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self._buffer = []
+
+    def _close_writer(self):
+        self._flush_buffer()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def write(self, rows: Sequence[tuple]):
+        """写入一个批次（在内部缓冲到一个row group大小后落盘）"""
+        for row in rows:
+            partition = self._partition_of(row)
+            if partition != self._current_partition:
+                # 物种切换：关闭当前分区文件，后续行写入新分区
+                self._close_writer()
+                self._current_partition = partition
+            self._buffer.append(row)
+            if not self.sort_by and len(self._buffer) >= self.row_group_size:
+                self._flush_buffer()
+
+    def close(self):
+        self._close_writer()
+
+
+class ParquetStore:
+    """Parquet数据读取器：按分区裁剪物种、按列投影，并利用row group统计信息过滤分数"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def read_meta(self) -> Dict[str, str]:
+        """存储模式元信息（没有元信息文件的旧数据集返回空字典）"""
+        meta_path = self.root / DATASET_META_FILE
+        if not meta_path.exists():
+            return {}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _dataset(self, table: str):
+        _require_pyarrow()
+        import pyarrow.dataset as ds
+
+        table_dir = self.root / table
+        if not table_dir.exists():
+            raise FileNotFoundError(f"Parquet表不存在: {table_dir}")
+
+        partitioning = 'hive' if table in PARTITION_COLUMNS else None
+        return ds.dataset(table_dir, format='parquet', partitioning=partitioning)
+
+    def scan(self, table: str, columns: Optional[List[str]] = None,
+             species_ids: Optional[Iterable[int]] = None,
+             min_score: Optional[float] = None,
+             score_column: str = 'combined_score'):
+        """
+        扫描一张表
+
+        Args:
+            table: 表名
+            columns: 需要读取的列（None表示全部列）
+            species_ids: 只读取这些物种的分区
+            min_score: 只返回 score_column >= min_score 的行
+            score_column: 分数过滤所用的列
+
+        Returns:
+            pyarrow.Table
+        """
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset(table)
+        expression = None
+        if species_ids is not None:
+            expression = ds.field(PARTITION_KEY).isin(list(species_ids))
+        if min_score is not None:
+            score_filter = ds.field(score_column) >= min_score
+            expression = score_filter if expression is None else expression & score_filter
+
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def count_rows(self, table: str, species_ids: Optional[Iterable[int]] = None) -> int:
+        """统计行数（仅读取Parquet元数据）"""
+        import pyarrow.dataset as ds
+
+        table_dir = self.root / table
+        if not table_dir.exists():
+            return 0
+        dataset = self._dataset(table)
+        if species_ids is None:
+            return dataset.count_rows()
+        return dataset.count_rows(filter=ds.field(PARTITION_KEY).isin(list(species_ids)))
+
+    def score_histogram(self, table: str = 'protein_interactions_scored') -> List[tuple]:
+        """统计各分数的行数（只读取分数列）"""
+        if not (self.root / table).exists():
+            return []
+        counts = self.scan(table, columns=['combined_score']).group_by('combined_score').aggregate(
+            [('combined_score', 'count')]
+        )
+        return sorted(zip(
+            counts.column('combined_score').to_pylist(),
+            counts.column('combined_score_count').to_pylist()
+        ))
+
+    def list_species(self, table: str = 'protein_info') -> List[int]:
+        """列出表中已有的物种分区"""
+        table_dir = self.root / table
+        if not table_dir.exists():
+            return []
+        prefix = f"{PARTITION_KEY}="
+        return sorted(
+            int(path.name[len(prefix):])
+            for path in table_dir.iterdir()
+            if path.is_dir() and path.name.startswith(prefix)
+        )
+
+    def get_statistics(self) -> Dict:
+        """计算与SQLite后端相同格式的统计信息"""
+        stats = {
+            'total_proteins': self.count_rows('protein_info'),
+            'total_species': len(self.list_species('protein_info')),
+            'high_confidence_interactions': self.count_rows('protein_interactions'),
+            'detailed_interactions': self.count_rows('protein_interactions_detailed'),
+            'scored_interactions': self.count_rows('protein_interactions_scored'),
+            'proteins_with_sequences': self.count_rows('protein_sequences'),
+            'total_clusters': self.count_rows('cluster_info'),
+            'protein_cluster_mappings': self.count_rows('protein_clusters'),
+            'cluster_tree_edges': self.count_rows('cluster_tree'),
+        }
+
+        species_counts = [
+            (species_id, self.count_rows('protein_info', [species_id]))
+            for species_id in self.list_species('protein_info')
+        ]
+        species_counts.sort(key=lambda item: item[1], reverse=True)
+        stats['top_species'] = species_counts[:10]
+
+        stats['top_clusters'] = []
+        if (self.root / 'cluster_info').exists():
+            clusters = self.scan('cluster_info', columns=['cluster_id', 'cluster_size'])
+            clusters = clusters.sort_by([('cluster_size', 'descending')]).slice(0, 10)
+            stats['top_clusters'] = list(zip(
+                clusters.column('cluster_id').to_pylist(),
+                clusters.column('cluster_size').to_pylist()
+            ))
+
+        return stats
@@ -6,30 +6,112 @@ STRING数据库提取器
 
 import requests
 import gzip
+import hashlib
+import math
 from pathlib import Path
 import logging
-from typing import Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from tqdm import tqdm
 import sqlite3
+import time
+
+from storage_backends import (
+    PARTITION_COLUMNS, PRIMARY_KEYS, TABLE_COLUMNS, SQLiteTableSink, ParquetTableSink, ParquetStore,
+    write_dataset_meta
+)
+from protein_ids import ProteinIdInterner
+from source_reader import SourceReader
+from ingest_manifest import StageManifest, fingerprint_files
+from ingest_stats import IngestStats, StatsAccumulator
+from sequence_store import SequenceBlockSink, SequenceStore, create_sequence_tables
+from string_query import StringQuery
+from cluster_closure import compute_cluster_closure, create_closure_table
+from ingest_metrics import IngestMetrics, StageMetrics
+from external_sort import ExternalSortDeduplicator
+from ingest_orchestrator import IngestOrchestrator
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# PRING基准测试的4个物种在STRING中的taxon ID
+PRING_SPECIES_IDS = {
+    'human': 9606,     # Homo sapiens
+    'arath': 3702,     # Arabidopsis thaliana
+    'yeast': 4932,     # Saccharomyces cerevisiae
+    'ecoli': 511145,   # Escherichia coli K-12 MG1655
+}
+
 class StringDataExtractor:
     """STRING数据提取器"""
     
-    def __init__(self, data_dir: str = "data", confidence_threshold: float = 0.95):
+    def __init__(self, data_dir: str = "data", confidence_threshold: float = 0.95,
+                 storage_backend: str = "sqlite", parquet_dir: Optional[str] = None,
+                 intern_ids: bool = False, species_ids: Optional[Iterable[int]] = None,
+                 protein_ids: Optional[Iterable[str]] = None, use_species_files: bool = True,
+                 incremental: bool = True, score_floor: Optional[float] = None,
+                 canonicalize_edges: bool = False, compress_sequences: bool = False,
+                 progress_interval: Optional[float] = None, report_path: Optional[str] = None,
+                 external_sort: bool = False, sort_memory_mb: float = 512):
         """
         初始化提取器
         
         Args:
             data_dir: 数据存储目录
             confidence_threshold: 置信度阈值
+            storage_backend: 存储后端，"sqlite"（默认）或 "parquet"（按物种分区的列式存储）
+            parquet_dir: Parquet输出目录，默认为 data_dir/string_parquet
+            intern_ids: 使用整数蛋白质ID（protein_id_map表）和整数分数存储，仅支持SQLite后端
+            species_ids: 只提取这些物种（taxon ID）的数据，None表示全部物种
+            protein_ids: 只提取这些蛋白质（相互作用要求两端都在集合内），None表示不限制
+            use_species_files: 指定物种时下载STRING的分物种文件，否则扫描完整文件并按ID前缀过滤
+            incremental: 根据阶段清单跳过源文件和参数均未变化的已完成阶段，并从中断处恢复
+            score_floor: 设置后，将分数不低于该下限的全部相互作用按分数聚簇存入
+                protein_interactions_scored，两张相互作用表由该表按置信度阈值物化，
+                调整阈值（不低于下限）时无需重新解析原始文件
+            canonicalize_edges: 相互作用只保存 protein1 < protein2 的一条（STRING每条相互作用列出
+                A-B和B-A两次且分数相同），存储和扫描量减半，需要双向边时用 symmetrize_edges 恢复
+            compress_sequences: 序列按批次打包为压缩块（sequence_blocks/sequence_index表），
+                支持按长度/物种筛选和批量读取，仅支持SQLite后端
+            progress_interval: 每隔多少秒输出一行阶段进度（读取/写入速率、字节数、提交耗时、峰值内存），
+                None表示只在阶段结束时输出
+            report_path: JSON运行报告路径，默认为 data_dir/ingest_report.json
+            external_sort: 写入前按主键外部排序去重（相同主键保留最后一行），用普通INSERT按主键顺序
+                追加写入，代替逐行 INSERT OR REPLACE；阶段不再记录检查点，中断后从头运行
+            sort_memory_mb: 外部排序的内存预算（MB），超出后溢写有序段到 data_dir 下的临时目录
         """
+        if storage_backend not in ('sqlite', 'parquet'):
+            raise ValueError(f"不支持的存储后端: {storage_backend}")
+        if intern_ids and storage_backend != 'sqlite':
+            raise ValueError("整数蛋白质ID模式仅支持SQLite后端（Parquet后端已对蛋白质ID做字典编码）")
+        if score_floor is not None and confidence_threshold < score_floor:
+            raise ValueError(f"置信度阈值 {confidence_threshold} 低于分数下限 {score_floor}")
+        if compress_sequences and storage_backend != 'sqlite':
+            raise ValueError("压缩序列存储仅支持SQLite后端（Parquet后端的序列列已按zstd压缩）")
+        
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         self.confidence_threshold = confidence_threshold
+        self.storage_backend = storage_backend
+        self.intern_ids = intern_ids
+        self.score_floor = score_floor
+        self.canonicalize_edges = canonicalize_edges
+        self.compress_sequences = compress_sequences
+        self.external_sort = external_sort
+        self.sort_memory_mb = sort_memory_mb
+        
+        # 物种/蛋白质限制：蛋白质ID格式为 taxid.xxx，按 "taxid." 前缀快速跳过无关行
+        self.species_ids = set(species_ids) if species_ids is not None else None
+        self.protein_ids = set(protein_ids) if protein_ids is not None else None
+        self.use_species_files = use_species_files
+        self.incremental = incremental
+        
+        prefix_species = self.species_ids
+        if prefix_species is None and self.protein_ids is not None:
+            prefix_species = {protein_id.split('.', 1)[0] for protein_id in self.protein_ids}
+        self._species_prefixes = (
+            tuple(sorted(f"{taxid}." for taxid in prefix_species)) if prefix_species is not None else None
+        )
         
         # STRING v12.0 下载URLs - 为层次化特征建模扩展
         self.urls = {
@@ -50,6 +132,20 @@ class StringDataExtractor:
         # 数据库文件路径
         self.db_path = self.data_dir / "string_data.db"
         
+        # Parquet数据集目录（每张表一个子目录）
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else self.data_dir / "string_parquet"
+        
+        # 整数蛋白质ID映射（首次写入时从数据库加载）
+        self._interner: Optional[ProteinIdInterner] = None
+        
+        # 阶段清单和统计（SQLite后端保存在数据库中，Parquet后端保存在数据集目录中）
+        self._manifest: Optional[StageManifest] = None
+        self._stats: Optional[IngestStats] = None
+        
+        # 运行指标（每个阶段的字节数、速率、写入/提交耗时和峰值内存）
+        self.metrics = IngestMetrics(log_interval=progress_interval)
+        self.report_path = Path(report_path) if report_path else self.data_dir / "ingest_report.json"
+        
     def download_file(self, url: str, filename: str) -> Path:
         """下载并解压文件"""
         file_path = self.data_dir / filename
@@ -74,6 +170,44 @@ class StringDataExtractor:
         logger.info("下载完成: %s", filename)
         return file_path
     
+    def _species_url(self, url: str, taxid: int) -> str:
+        """由完整文件URL推导分物种文件URL（如 protein.links.v12.0/9606.protein.links.v12.0.txt.gz）"""
+        base, filename = url.rsplit('/', 1)
+        directory = filename.rsplit('.', 2)[0]  # 去掉 .txt.gz / .fa.gz
+        return f"{base}/{directory}/{taxid}.{filename}"
+    
+    def _source_specs(self, url_key: str, filename: str, extract: bool = True) -> List[tuple]:
+        """
+        某类数据的源文件 [(下载URL, .gz路径, 解析时读取的路径), ...]（不下载）
+        
+        限定物种时使用STRING的分物种文件；extract为True时解析解压后的文件。
+        """
+        url = self.urls[url_key]
+        if self.species_ids is not None and self.use_species_files:
+            sources = [(self._species_url(url, taxid), f"{taxid}.{filename}") for taxid in sorted(self.species_ids)]
+        else:
+            sources = [(url, filename)]
+        
+        specs = []
+        for source_url, source_name in sources:
+            gz_path = self.data_dir / source_name
+            specs.append((source_url, gz_path, gz_path.with_suffix('') if extract else gz_path))
+        return specs
+    
+    def _prepare_sources(self, url_key: str, filename: str, extract: bool = True) -> List[Path]:
+        """下载（并解压）某类数据的源文件；限定物种时使用STRING的分物种文件"""
+        paths = []
+        for source_url, gz_path, path in self._source_specs(url_key, filename, extract):
+            gz_path = self.download_file(source_url, gz_path.name)
+            paths.append(self.extract_gz_file(gz_path) if extract else gz_path)
+        return paths
+    
+    def _keep_protein(self, protein_id: str) -> bool:
+        """判断蛋白质是否在物种/蛋白质限制范围内"""
+        if self._species_prefixes is not None and not protein_id.startswith(self._species_prefixes):
+            return False
+        return self.protein_ids is None or protein_id in self.protein_ids
+    
     def extract_gz_file(self, gz_path: Path) -> Path:
         """解压.gz文件"""
         output_path = gz_path.with_suffix('')
@@ -90,15 +224,67 @@ class StringDataExtractor:
         logger.info("解压完成: %s", output_path.name)
         return output_path
     
+    def storage_meta(self) -> Dict[str, str]:
+        """存储模式元信息（SQLite写入db_meta表，Parquet写入数据集目录的dataset_meta.json）"""
+        return {
+            'id_mode': 'interned' if self.intern_ids else 'text',
+            'detailed_score_scale': '1000' if self.intern_ids else '1',
+            # canonical: 每条无向相互作用只存一行（protein1 < protein2，按原始ID比较）；symmetric: 双向各一行
+            'edge_mode': 'canonical' if self.canonicalize_edges else 'symmetric',
+            # blocks: 序列保存在压缩块中（SequenceStore读取）；text: protein_sequences表
+            'sequence_store': 'blocks' if self.compress_sequences else 'text',
+        }
+    
+    def setup_storage(self):
+        """准备存储后端：SQLite建库建表，Parquet写出数据集元信息"""
+        if self.storage_backend == 'sqlite':
+            self.setup_database()
+        else:
+            write_dataset_meta(self.parquet_dir, self.storage_meta())
+    
     def setup_database(self):
         """创建SQLite数据库和表结构"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # 创建蛋白质信息表
+        # 数据库元信息（记录ID模式，防止两种表结构混用）
         cursor.execute('''
+            CREATE TABLE IF NOT EXISTS db_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        id_mode = 'interned' if self.intern_ids else 'text'
+        existing_tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        row = cursor.execute("SELECT value FROM db_meta WHERE key = 'id_mode'").fetchone()
+        existing_mode = row[0] if row else ('text' if 'protein_info' in existing_tables else None)
+        if existing_mode is not None and existing_mode != id_mode:
+            conn.close()
+            raise ValueError(f"数据库 {self.db_path} 已按 {existing_mode} ID模式创建，无法以 {id_mode} 模式写入")
+        
+        # 整数ID模式：蛋白质ID列为INTEGER，详细相互作用保留STRING原始的0-1000整数分数，
+        # 以整数对为主键的表使用WITHOUT ROWID聚簇存储
+        id_type = 'INTEGER' if self.intern_ids else 'TEXT'
+        channel_type = 'INTEGER' if self.intern_ids else 'REAL'
+        without_rowid = ' WITHOUT ROWID' if self.intern_ids else ''
+        
+        cursor.executemany('INSERT OR REPLACE INTO db_meta VALUES (?, ?)', self.storage_meta().items())
+        
+        if self.intern_ids:
+            # 创建蛋白质ID映射表
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS protein_id_map (
+                    protein_idx INTEGER PRIMARY KEY,
+                    protein_id TEXT NOT NULL UNIQUE,
+                    species_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_map_species ON protein_id_map(species_id)')
+        
+        # 创建蛋白质信息表
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS protein_info (
-                protein_id TEXT PRIMARY KEY,
+                protein_id {id_type} PRIMARY KEY,
                 protein_name TEXT,
                 species_id INTEGER,
                 species_name TEXT,
@@ -107,40 +293,61 @@ class StringDataExtractor:
         ''')
         
         # 创建蛋白质相互作用表
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS protein_interactions (
-                protein1 TEXT,
-                protein2 TEXT,
+                protein1 {id_type},
+                protein2 {id_type},
                 combined_score INTEGER,
                 PRIMARY KEY (protein1, protein2)
-            )
+            ){without_rowid}
         ''')
         
         # 创建详细相互作用表（多通道证据评分）
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS protein_interactions_detailed (
-                protein1 TEXT,
-                protein2 TEXT,
-                neighborhood REAL,
-                fusion REAL,
-                cooccurence REAL,
-                coexpression REAL,
-                experimental REAL,
-                database REAL,
-                textmining REAL,
-                combined_score REAL,
+                protein1 {id_type},
+                protein2 {id_type},
+                neighborhood {channel_type},
+                fusion {channel_type},
+                cooccurence {channel_type},
+                coexpression {channel_type},
+                experimental {channel_type},
+                database {channel_type},
+                textmining {channel_type},
+                combined_score {channel_type},
                 PRIMARY KEY (protein1, protein2)
-            )
+            ){without_rowid}
+        ''')
+        
+        # 创建阈值无关的相互作用表（分数下限模式）：以分数为主键前缀聚簇存储，
+        # 任意阈值的查询都是一次主键范围扫描；分数保留STRING原始的0-1000整数
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS protein_interactions_scored (
+                combined_score INTEGER,
+                protein1 {id_type},
+                protein2 {id_type},
+                neighborhood INTEGER,
+                fusion INTEGER,
+                cooccurence INTEGER,
+                coexpression INTEGER,
+                experimental INTEGER,
+                database INTEGER,
+                textmining INTEGER,
+                PRIMARY KEY (combined_score, protein1, protein2)
+            ) WITHOUT ROWID
         ''')
         
         # 创建蛋白质序列表
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS protein_sequences (
-                protein_id TEXT PRIMARY KEY,
+                protein_id {id_type} PRIMARY KEY,
                 sequence TEXT
             )
         ''')
         
+        # 创建压缩序列块表和序列索引（压缩序列模式）
+        create_sequence_tables(cursor, id_type)
+        
         # 创建聚类信息表（用于MoE专家模型的家族分类）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS cluster_info (
@@ -152,12 +359,12 @@ class StringDataExtractor:
         ''')
         
         # 创建蛋白质聚类映射表
-        cursor.execute('''
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS protein_clusters (
-                protein_id TEXT,
+                protein_id {id_type},
                 cluster_id TEXT,
                 PRIMARY KEY (protein_id, cluster_id)
-            )
+            ){without_rowid}
         ''')
         
         # 创建聚类层次树表
@@ -170,358 +377,721 @@ class StringDataExtractor:
             )
         ''')
         
+        # 创建聚类树闭包索引表（深度、根、欧拉序区间、祖先路径）
+        create_closure_table(cursor)
+        
         # 创建索引
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_species ON protein_info(species_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_score ON protein_interactions(combined_score)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_detailed_score ON protein_interactions_detailed(combined_score)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_cluster ON protein_clusters(cluster_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_protein_cluster ON protein_clusters(protein_id)')
+        if self.canonicalize_edges:
+            # 规范化存储中每条边只有一行，按protein2查找邻居需要单独的索引
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_interactions_protein2 ON protein_interactions(protein2)')
         
         conn.commit()
         conn.close()
-        logger.info("数据库表结构创建完成")
+        logger.info("数据库表结构创建完成（%s ID模式）", id_mode)
     
-    def load_protein_info(self):
-        """加载蛋白质信息到数据库"""
-        # 下载并解压蛋白质信息文件
-        gz_path = self.download_file(self.urls['protein_info'], 'protein.info.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
-        
-        logger.info("开始加载蛋白质信息...")
-        conn = sqlite3.connect(self.db_path)
+    def _get_interner(self) -> ProteinIdInterner:
+        """获取整数ID映射（首次调用时从protein_id_map加载已有映射）"""
+        if self._interner is None:
+            conn = sqlite3.connect(self.db_path)
+            self._interner = ProteinIdInterner.from_database(conn)
+            conn.close()
+            logger.info("已加载 %d 个蛋白质整数ID", len(self._interner))
+        return self._interner
+    
+    def _open_sink(self, table: str):
+        """打开表写入器（SQLite或Parquet后端，外部排序去重的阶段使用普通INSERT）"""
+        if self.storage_backend == 'parquet':
+            # 阈值无关存储在每个物种分区内按分数降序排列，使row group统计信息可按阈值裁剪
+            sort_by = [('combined_score', 'descending')] if table == 'protein_interactions_scored' else None
+            return ParquetTableSink(self.parquet_dir, table, sort_by=sort_by)
+        interner = self._get_interner() if self.intern_ids else None
+        replace = not self._uses_external_sort(table)
+        if table == 'protein_sequences' and self.compress_sequences:
+            return SequenceBlockSink(self.db_path, interner=interner, replace=replace)
+        return SQLiteTableSink(self.db_path, table, interner=interner, replace=replace)
+    
+    def _uses_external_sort(self, table: str) -> bool:
+        """该阶段是否在写入前外部排序去重"""
+        return self.external_sort and table in PRIMARY_KEYS
+    
+    def _sort_key_positions(self, table: str) -> List[int]:
+        """外部排序的键列位置（主键列；Parquet后端把分区列放在最前，使同一物种的行保持连续）"""
+        columns = TABLE_COLUMNS[table]
+        keys = list(PRIMARY_KEYS[table])
+        partition_column = PARTITION_COLUMNS.get(table)
+        if self.storage_backend == 'parquet' and partition_column in keys:
+            keys.remove(partition_column)
+            keys.insert(0, partition_column)
+        return [columns.index(name) for name in keys]
+    
+    def _dedup_rows(self, table: str, rows: Iterable[tuple],
+                    stage: Optional[StageMetrics] = None) -> Iterable[tuple]:
+        """未启用外部排序时原样返回，否则返回按主键排序去重后的行（读完全部输入后才开始产出）"""
+        if not self._uses_external_sort(table):
+            return rows
+        dedup = ExternalSortDeduplicator(self._sort_key_positions(table), memory_mb=self.sort_memory_mb,
+                                         tmp_dir=str(self.data_dir))
+        if stage is not None:
+            stage.sort = dedup
+        
+        def sorted_rows():
+            dedup.add_all(rows)
+            yield from dedup.iter_sorted()
+            if dedup.rows_in != dedup.rows_out:
+                logger.info("阶段 %s 外部排序去除 %d 行重复主键", table, dedup.rows_in - dedup.rows_out)
+        return sorted_rows()
+    
+    def _ingest_rows(self, table: str, rows: Iterable[tuple], chunk_size: int = 10000,
+                     on_batch: Optional[Callable[[int], None]] = None,
+                     accumulator: Optional[StatsAccumulator] = None,
+                     stage: Optional[StageMetrics] = None) -> int:
+        """
+        分批写入行数据，返回写入的行数（on_batch在每个批次提交后以累计行数调用）
         
-        # 批量插入数据
-        chunk_size = 10000
-        chunks_processed = 0
+        传入stage时记录写入行数、写入/提交/检查点耗时，并按间隔输出进度日志。
+        """
+        sink = self._open_sink(table)
+        row_count = 0
+        batch_data = []
         
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
-            
-            batch_data = []
-            for line in tqdm(f, desc="处理蛋白质信息"):
-                parts = line.strip().split('\t')
-                if len(parts) >= 3:
-                    protein_id = parts[0]
-                    protein_name = parts[1]
-                    species_id = int(protein_id.split('.')[0])
-                    annotation = parts[2] if len(parts) > 2 else ""
-                    
-                    batch_data.append((protein_id, protein_name, species_id, "", annotation))
-                    
-                    if len(batch_data) >= chunk_size:
-                        conn.executemany(
-                            'INSERT OR REPLACE INTO protein_info VALUES (?, ?, ?, ?, ?)',
-                            batch_data
-                        )
-                        conn.commit()
-                        batch_data = []
-                        chunks_processed += 1
+        def write_batch():
+            if accumulator is not None:
+                accumulator.observe(batch_data)
+            start = time.perf_counter()
+            sink.write(batch_data)
+            if stage is not None:
+                stage.write_seconds += time.perf_counter() - start
+                stage.rows_written += len(batch_data)
+        
+        try:
+            for row in rows:
+                batch_data.append(row)
+                
+                if len(batch_data) >= chunk_size:
+                    write_batch()
+                    row_count += len(batch_data)
+                    batch_data = []
+                    if on_batch is not None:
+                        start = time.perf_counter()
+                        on_batch(row_count)
+                        if stage is not None:
+                            stage.checkpoint_seconds += time.perf_counter() - start
+                    if stage is not None:
+                        self.metrics.tick(stage)
             
-            # 插入剩余数据
+            # 写入剩余数据
             if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO protein_info VALUES (?, ?, ?, ?, ?)',
-                    batch_data
-                )
-                conn.commit()
+                write_batch()
+                row_count += len(batch_data)
+        finally:
+            start = time.perf_counter()
+            sink.close()
+            if stage is not None:
+                # Parquet写入器在关闭时落盘剩余缓冲
+                stage.write_seconds += time.perf_counter() - start
+                stage.commit_seconds += getattr(sink, 'commit_seconds', 0.0)
+        
+        return row_count
+    
+    def _state_db_path(self) -> Path:
+        """阶段清单和统计所在的SQLite文件"""
+        if self.storage_backend == 'parquet':
+            return self.parquet_dir / "ingest_manifest.db"
+        return self.db_path
+    
+    def _get_manifest(self) -> StageManifest:
+        """获取阶段清单"""
+        if self._manifest is None:
+            self._manifest = StageManifest(self._state_db_path())
+        return self._manifest
+    
+    def _get_stats(self) -> IngestStats:
+        """获取统计存储"""
+        if self._stats is None:
+            self._stats = IngestStats(self._state_db_path())
+        return self._stats
+    
+    def _stage_params(self, stage: str) -> Dict:
+        """影响阶段输出的参数（参数变化时该阶段需要重新运行）"""
+        protein_digest = None
+        if self.protein_ids is not None:
+            protein_digest = hashlib.sha1('\n'.join(sorted(self.protein_ids)).encode()).hexdigest()
+        
+        params = {
+            'storage_backend': self.storage_backend,
+            'intern_ids': self.intern_ids,
+            'species_ids': sorted(self.species_ids) if self.species_ids is not None else None,
+            'protein_ids': protein_digest,
+        }
+        # 只有相互作用阶段依赖置信度阈值（分数下限模式下的存储阶段只依赖下限）
+        if stage in ('protein_interactions', 'protein_interactions_detailed'):
+            params['confidence_threshold'] = self.confidence_threshold
+        if self.score_floor is not None and stage in (
+                'protein_interactions', 'protein_interactions_detailed', 'protein_interactions_scored'):
+            params['score_floor'] = self.score_floor
+        if self.canonicalize_edges and stage in (
+                'protein_interactions', 'protein_interactions_detailed', 'protein_interactions_scored'):
+            params['canonicalize_edges'] = True
+        if self.compress_sequences and stage == 'protein_sequences':
+            params['compress_sequences'] = True
+        return params
+    
+    def _clear_table(self, table: str):
+        """清空表，使阶段重新运行后的结果只反映本次参数（Parquet写入器打开时自行重建目录）"""
+        if self.storage_backend == 'sqlite':
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f'DELETE FROM {table}')
+            if table == 'protein_sequences':
+                # 两种序列存储同时清空，切换模式后不会残留旧数据
+                conn.execute('DELETE FROM sequence_index')
+                conn.execute('DELETE FROM sequence_blocks')
+            conn.commit()
+            conn.close()
+    
+    def _run_stage(self, table: str, paths: List[Path], parser: Callable, *args,
+                   header: bool = True, lookahead: int = 0, chunk_size: int = 10000) -> int:
+        """
+        运行一个提取阶段：根据阶段清单跳过、恢复或重新运行
         
+        Args:
+            table: 目标表（同时作为阶段名）
+            paths: 源文件列表
+            parser: 解析函数，接收行迭代器返回行元组迭代器
+            header: 源文件是否带表头
+            lookahead: 解析器产出一行时已预读的行数（FASTA解析需要读到下一个序列头才能产出）
+            chunk_size: 批次大小
+        
+        Returns:
+            表中的行数
+        """
+        manifest = self._get_manifest()
+        fingerprint = fingerprint_files(paths)
+        params = self._stage_params(table)
+        record = manifest.get(table)
+        unchanged = self.incremental and manifest.matches(record, fingerprint, params)
+        
+        with self.metrics.stage(table) as stage:
+            if unchanged and record['status'] == 'completed':
+                logger.info("阶段 %s 的源文件和参数未变化，跳过（%d 行）", table, record['row_count'])
+                stage.status = 'skipped'
+                return record['row_count']
+            
+            # 中断的阶段从最后一个已提交批次之后继续（依赖主键的 INSERT OR REPLACE 保证重复写入幂等）；
+            # 外部排序读完全部输入后才开始写入，批次与源文件行号不对应，不记录检查点，中断后从头运行
+            sort_rows = self._uses_external_sort(table)
+            resume = (unchanged and record['status'] == 'running' and self.storage_backend == 'sqlite'
+                      and not sort_rows)
+            if resume:
+                skip_lines, base_rows = record['lines_consumed'], record['row_count']
+                logger.info("阶段 %s 从检查点恢复：跳过 %d 行源数据", table, skip_lines)
+                stage.status = 'resumed'
+            else:
+                skip_lines, base_rows = 0, 0
+                self._clear_table(table)
+                self._get_stats().discard(table)
+                manifest.start(table, fingerprint, params)
+            
+            reader = SourceReader(paths, header=header, skip_lines=skip_lines,
+                                  on_progress=lambda: self.metrics.tick(stage))
+            stage.source = reader
+            accumulator = StatsAccumulator(table)
+            on_batch = None
+            if not sort_rows:
+                def on_batch(rows):
+                    manifest.checkpoint(table, reader.lines_read - lookahead, base_rows + rows)
+            row_count = base_rows + self._ingest_rows(
+                table, self._dedup_rows(table, parser(reader, *args), stage), chunk_size=chunk_size,
+                on_batch=on_batch, accumulator=accumulator, stage=stage
+            )
+            
+            # 恢复的阶段只观察到检查点之后的行，统计需要从表中重新计算
+            if resume:
+                accumulator = self._compute_table_stats(table)
+            self._get_stats().save_accumulator(accumulator)
+            manifest.complete(table, row_count)
+            return row_count
+    
+    def _compute_table_stats(self, table: str) -> StatsAccumulator:
+        """扫描SQLite表计算统计（用于恢复的阶段，统计所需的列不受整数ID影响）"""
+        accumulator = StatsAccumulator(table)
+        if table == 'protein_sequences' and self.compress_sequences:
+            table = 'sequence_index'  # 序列表只统计行数
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(f'SELECT * FROM {table}')
+        while True:
+            rows = cursor.fetchmany(100000)
+            if not rows:
+                break
+            accumulator.observe(rows)
         conn.close()
-        logger.info("蛋白质信息加载完成，处理了 %d 个批次", chunks_processed)
+        return accumulator
+    
+    def _score_cutoff(self, threshold: float) -> int:
+        """置信度阈值对应的最小整数分数（STRING分数是0-1000，避免0.7*1000=700.0000000000001这类浮点误差）"""
+        return math.ceil(round(threshold * 1000, 6))
+    
+    def _parse_protein_info(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析protein.info文件: protein_id, preferred_name, protein_size, annotation"""
+        prefixes = self._species_prefixes
+        
+        for line in tqdm(f, desc="处理蛋白质信息"):
+            # 按物种前缀跳过无关行（无需分割字段）
+            if prefixes is not None and not line.startswith(prefixes):
+                continue
+            parts = line.strip().split('\t')
+            if len(parts) >= 3:
+                protein_id = parts[0]
+                if self.protein_ids is not None and protein_id not in self.protein_ids:
+                    continue
+                protein_name = parts[1]
+                species_id = int(protein_id.split('.')[0])
+                annotation = parts[3] if len(parts) > 3 else ""
+                
+                yield (protein_id, protein_name, species_id, "", annotation)
+    
+    def _parse_interactions(self, f: Iterable[str], counters: Dict[str, int]) -> Iterator[tuple]:
+        """解析protein.links文件，只保留达到置信度阈值的相互作用"""
+        threshold_score = self._score_cutoff(self.confidence_threshold)
+        prefixes = self._species_prefixes
+        canonical = self.canonicalize_edges
+        
+        for line in tqdm(f, desc="筛选高置信度相互作用"):
+            # STRING相互作用都在同一物种内，检查protein1的前缀即可
+            if prefixes is not None and not line.startswith(prefixes):
+                continue
+            parts = line.strip().split()
+            if len(parts) >= 3:
+                protein1 = parts[0]
+                protein2 = parts[1]
+                # 规范化模式下跳过镜像副本
+                if canonical and protein1 > protein2:
+                    continue
+                if self.protein_ids is not None and (
+                        protein1 not in self.protein_ids or protein2 not in self.protein_ids):
+                    continue
+                combined_score = int(parts[2])
+                
+                counters['total'] += 1
+                
+                # 只保留高置信度的相互作用
+                if combined_score >= threshold_score:
+                    counters['kept'] += 1
+                    yield (protein1, protein2, combined_score)
+    
+    def _parse_sequences(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析FASTA格式的蛋白质序列"""
+        protein_id = None
+        sequence = []
+        
+        for line in tqdm(f, desc="处理蛋白质序列"):
+            line = line.strip()
+            if line.startswith('>'):
+                # 输出前一个蛋白质的序列
+                if protein_id and sequence:
+                    yield (protein_id, ''.join(sequence))
+                
+                # 解析新的蛋白质ID（不在限制范围内的序列直接跳过）
+                protein_id = line[1:].split()[0]
+                if not self._keep_protein(protein_id):
+                    protein_id = None
+                sequence = []
+            elif protein_id is not None:
+                sequence.append(line)
+        
+        # 处理最后一个蛋白质
+        if protein_id and sequence:
+            yield (protein_id, ''.join(sequence))
+    
+    def _iter_detailed_links(self, f: Iterable[str], threshold_score: int, desc: str) -> Iterator[tuple]:
+        """逐行解析protein.links.detailed，产出combined_score不低于threshold_score的 (protein1, protein2, scores)"""
+        prefixes = self._species_prefixes
+        canonical = self.canonicalize_edges
+        
+        for line in tqdm(f, desc=desc):
+            if prefixes is not None and not line.startswith(prefixes):
+                continue
+            parts = line.strip().split()
+            if len(parts) >= 10:
+                protein1 = parts[0]
+                protein2 = parts[1]
+                # 规范化模式下跳过镜像副本
+                if canonical and protein1 > protein2:
+                    continue
+                if self.protein_ids is not None and (
+                        protein1 not in self.protein_ids or protein2 not in self.protein_ids):
+                    continue
+                # neighborhood, fusion, cooccurence, coexpression,
+                # experimental, database, textmining, combined_score
+                scores = [int(value) for value in parts[2:10]]
+                
+                # 只保留高置信度的相互作用
+                if scores[7] >= threshold_score:
+                    yield protein1, protein2, scores
+    
+    def _parse_detailed_interactions(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析protein.links.detailed文件（分数转换为0-1范围，整数ID模式保留0-1000整数分数）"""
+        threshold_score = self._score_cutoff(self.confidence_threshold)
+        
+        for protein1, protein2, scores in self._iter_detailed_links(f, threshold_score, "处理详细相互作用数据"):
+            if not self.intern_ids:
+                scores = [score / 1000.0 for score in scores]  # 转换为0-1范围
+            yield (protein1, protein2, *scores)
+    
+    def _parse_scored_interactions(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析protein.links.detailed文件中不低于分数下限的全部相互作用（分数在前，保留0-1000整数）"""
+        floor_score = self._score_cutoff(self.score_floor)
+        
+        for protein1, protein2, scores in self._iter_detailed_links(f, floor_score, "存储分数下限以上的相互作用"):
+            yield (scores[7], protein1, protein2, *scores[:7])
+    
+    def _parse_cluster_info(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析聚类信息文件"""
+        for line in tqdm(f, desc="处理聚类信息"):
+            parts = line.strip().split('\t')
+            if len(parts) >= 3:
+                cluster_id = parts[0]
+                cluster_name = parts[1] if len(parts) > 1 else ""
+                cluster_description = parts[2] if len(parts) > 2 else ""
+                cluster_size = int(parts[3]) if len(parts) > 3 else 0
+                
+                yield (cluster_id, cluster_name, cluster_description, cluster_size)
+    
+    def _parse_protein_clusters(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析蛋白质-聚类映射文件"""
+        for line in tqdm(f, desc="处理蛋白质聚类映射"):
+            parts = line.strip().split('\t')
+            if len(parts) >= 2:
+                cluster_id = parts[0]
+                protein_id = parts[1]
+                
+                if self._keep_protein(protein_id):
+                    yield (protein_id, cluster_id)
+    
+    def _parse_cluster_tree(self, f: Iterable[str]) -> Iterator[tuple]:
+        """解析聚类层次树文件"""
+        for line in tqdm(f, desc="处理聚类层次树"):
+            parts = line.strip().split('\t')
+            if len(parts) >= 3:
+                child_cluster_id = parts[0]
+                parent_cluster_id = parts[1]
+                distance = float(parts[2])
+                
+                yield (child_cluster_id, parent_cluster_id, distance)
+    
+    def load_protein_info(self):
+        """加载蛋白质信息到数据库"""
+        # 下载并解压蛋白质信息文件
+        paths = self._prepare_sources('protein_info', 'protein.info.v12.0.txt.gz')
+        
+        logger.info("开始加载蛋白质信息...")
+        row_count = self._run_stage('protein_info', paths, self._parse_protein_info)
+        
+        logger.info("蛋白质信息加载完成，共 %d 条记录", row_count)
     
     def filter_high_confidence_interactions(self):
         """筛选高置信度的蛋白质相互作用"""
+        if self.score_floor is not None:
+            self._materialize_from_scored('protein_interactions')
+            return
+        
         # 下载并解压相互作用文件
-        gz_path = self.download_file(self.urls['protein_links'], 'protein.links.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
+        paths = self._prepare_sources('protein_links', 'protein.links.v12.0.txt.gz')
         
         logger.info("开始筛选置信度 > %.2f 的相互作用...", self.confidence_threshold)
-        conn = sqlite3.connect(self.db_path)
-        
-        chunk_size = 10000
-        high_confidence_count = 0
-        total_count = 0
+        counters = {'total': 0, 'kept': 0}
         
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
-            
-            batch_data = []
-            for line in tqdm(f, desc="筛选高置信度相互作用"):
-                parts = line.strip().split()
-                if len(parts) >= 3:
-                    protein1 = parts[0]
-                    protein2 = parts[1]
-                    combined_score = int(parts[2])
-                    
-                    total_count += 1
-                    
-                    # 只保留高置信度的相互作用
-                    if combined_score >= self.confidence_threshold * 1000:  # STRING分数是0-1000
-                        batch_data.append((protein1, protein2, combined_score))
-                        high_confidence_count += 1
-                        
-                        if len(batch_data) >= chunk_size:
-                            conn.executemany(
-                                'INSERT OR REPLACE INTO protein_interactions VALUES (?, ?, ?)',
-                                batch_data
-                            )
-                            conn.commit()
-                            batch_data = []
-            
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO protein_interactions VALUES (?, ?, ?)',
-                    batch_data
-                )
-                conn.commit()
+        row_count = self._run_stage('protein_interactions', paths, self._parse_interactions, counters)
         
-        conn.close()
-        logger.info("相互作用筛选完成：%d/%d (%.2f%%) 符合阈值", 
-                   high_confidence_count, total_count, high_confidence_count/total_count*100)
+        if counters['total']:
+            logger.info("相互作用筛选完成：%d/%d (%.2f%%) 符合阈值", 
+                       counters['kept'], counters['total'], counters['kept']/counters['total']*100)
+        else:
+            logger.info("相互作用筛选完成，共 %d 条记录", row_count)
     
     def load_protein_sequences(self):
         """加载蛋白质序列"""
-        # 下载并解压序列文件
-        gz_path = self.download_file(self.urls['protein_sequences'], 'protein.sequences.v12.0.fa.gz')
+        # 下载序列文件（直接流式读取压缩文件）
+        paths = self._prepare_sources('protein_sequences', 'protein.sequences.v12.0.fa.gz', extract=False)
         
         logger.info("开始加载蛋白质序列...")
-        conn = sqlite3.connect(self.db_path)
-        
-        chunk_size = 1000
-        batch_data = []
-        
-        with gzip.open(gz_path, 'rt') as f:
-            protein_id = None
-            sequence = []
-            
-            for line in tqdm(f, desc="处理蛋白质序列"):
-                line = line.strip()
-                if line.startswith('>'):
-                    # 保存前一个蛋白质的序列
-                    if protein_id and sequence:
-                        batch_data.append((protein_id, ''.join(sequence)))
-                        
-                        if len(batch_data) >= chunk_size:
-                            conn.executemany(
-                                'INSERT OR REPLACE INTO protein_sequences VALUES (?, ?)',
-                                batch_data
-                            )
-                            conn.commit()
-                            batch_data = []
-                    
-                    # 解析新的蛋白质ID
-                    protein_id = line[1:].split()[0]
-                    sequence = []
-                else:
-                    sequence.append(line)
-            
-            # 处理最后一个蛋白质
-            if protein_id and sequence:
-                batch_data.append((protein_id, ''.join(sequence)))
-            
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO protein_sequences VALUES (?, ?)',
-                    batch_data
-                )
-                conn.commit()
+        row_count = self._run_stage(
+            'protein_sequences', paths, self._parse_sequences,
+            header=False, lookahead=1, chunk_size=1000
+        )
         
-        conn.close()
-        logger.info("蛋白质序列加载完成")
+        logger.info("蛋白质序列加载完成，共 %d 条序列", row_count)
+    
+    def get_sequence_store(self) -> SequenceStore:
+        """打开压缩序列存储（compress_sequences模式下提取的数据库）"""
+        return SequenceStore(self.db_path)
+    
+    def open_query(self, pool_size: int = 4) -> StringQuery:
+        """打开只读批量查询层（SQLite后端）"""
+        return StringQuery(self.db_path, pool_size=pool_size)
     
     def load_detailed_interactions(self):
         """加载详细的蛋白质相互作用数据（多通道证据评分）"""
+        if self.score_floor is not None:
+            self._materialize_from_scored('protein_interactions_detailed')
+            return
+        
         # 下载并解压详细相互作用文件
-        gz_path = self.download_file(self.urls['protein_links_detailed'], 'protein.links.detailed.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
+        paths = self._prepare_sources('protein_links_detailed', 'protein.links.detailed.v12.0.txt.gz')
         
         logger.info("开始加载详细相互作用数据...")
-        conn = sqlite3.connect(self.db_path)
+        row_count = self._run_stage('protein_interactions_detailed', paths, self._parse_detailed_interactions)
         
-        chunk_size = 10000
-        batch_data = []
+        logger.info("详细相互作用数据加载完成，共 %d 条记录", row_count)
+    
+    def load_scored_interactions(self):
+        """加载分数下限以上的全部相互作用（阈值无关存储）并计算分数直方图"""
+        paths = self._prepare_sources('protein_links_detailed', 'protein.links.detailed.v12.0.txt.gz')
+        
+        logger.info("开始存储分数 >= %.3f 的相互作用...", self.score_floor)
+        row_count = self._run_stage('protein_interactions_scored', paths, self._parse_scored_interactions)
+        
+        logger.info("阈值无关相互作用存储完成，共 %d 条记录", row_count)
+    
+    def _materialize_from_scored(self, table: str):
+        """
+        由protein_interactions_scored按当前置信度阈值物化相互作用表（一次分数范围扫描，不读取原始文件）
         
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
+        阶段指纹取自存储阶段的完成记录，存储重建后物化结果随之失效。
+        """
+        manifest = self._get_manifest()
+        scored = manifest.get('protein_interactions_scored')
+        if scored is None or scored['status'] != 'completed':
+            self.load_scored_interactions()
+            scored = manifest.get('protein_interactions_scored')
+        
+        fingerprint = f"protein_interactions_scored@{scored['finished_at']}:{scored['source_fingerprint']}"
+        with self.metrics.stage(table) as stage:
+            params = self._stage_params(table)
+            record = manifest.get(table)
+            if (self.incremental and manifest.matches(record, fingerprint, params)
+                    and record['status'] == 'completed'):
+                logger.info("阶段 %s 的存储和参数未变化，跳过（%d 行）", table, record['row_count'])
+                stage.status = 'skipped'
+                return
             
-            for line in tqdm(f, desc="处理详细相互作用数据"):
-                parts = line.strip().split()
-                if len(parts) >= 9:
-                    protein1 = parts[0]
-                    protein2 = parts[1]
-                    neighborhood = float(parts[2]) / 1000.0  # 转换为0-1范围
-                    fusion = float(parts[3]) / 1000.0
-                    cooccurence = float(parts[4]) / 1000.0
-                    coexpression = float(parts[5]) / 1000.0
-                    experimental = float(parts[6]) / 1000.0
-                    database = float(parts[7]) / 1000.0
-                    textmining = float(parts[8]) / 1000.0
-                    combined_score = float(parts[9]) / 1000.0
-                    
-                    # 只保留高置信度的相互作用
-                    if combined_score >= self.confidence_threshold:
-                        batch_data.append((
-                            protein1, protein2, neighborhood, fusion, cooccurence,
-                            coexpression, experimental, database, textmining, combined_score
-                        ))
-                        
-                        if len(batch_data) >= chunk_size:
-                            conn.executemany('''
-                                INSERT OR REPLACE INTO protein_interactions_detailed 
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                            ''', batch_data)
-                            conn.commit()
-                            batch_data = []
+            threshold_score = self._score_cutoff(self.confidence_threshold)
+            logger.info("由阈值无关存储物化 %s（combined_score >= %d）...", table, threshold_score)
+            self._clear_table(table)
+            self._get_stats().discard(table)
+            manifest.start(table, fingerprint, params)
             
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany('''
-                    INSERT OR REPLACE INTO protein_interactions_detailed 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', batch_data)
+            if self.storage_backend == 'sqlite':
+                if table == 'protein_interactions':
+                    select = 'protein1, protein2, combined_score'
+                else:
+                    columns = TABLE_COLUMNS['protein_interactions_detailed'][2:]
+                    scale = '' if self.intern_ids else ' / 1000.0'  # 与直接解析一致：文本模式为0-1范围
+                    select = 'protein1, protein2, ' + ', '.join(f'{column}{scale}' for column in columns)
+                conn = sqlite3.connect(self.db_path)
+                start = time.perf_counter()
+                row_count = conn.execute(f'''
+                    INSERT INTO {table}
+                    SELECT {select} FROM protein_interactions_scored WHERE combined_score >= ?
+                ''', (threshold_score,)).rowcount
+                commit_start = time.perf_counter()
                 conn.commit()
-        
+                stage.commit_seconds += time.perf_counter() - commit_start
+                stage.write_seconds += time.perf_counter() - start
+                stage.rows_written = row_count
+                conn.close()
+            else:
+                row_count = self._ingest_rows(table, self._iter_scored_rows(table, threshold_score), stage=stage)
+            
+            # 物化表的统计由存储的分数直方图截取，无需扫描
+            histogram = {score: count for score, count in self.get_score_histogram() if score >= threshold_score}
+            self._get_stats().save(
+                table, row_count, score_histogram=histogram if table == 'protein_interactions' else None
+            )
+            manifest.complete(table, row_count)
+            logger.info("%s 物化完成，共 %d 条记录", table, row_count)
+    
+    def _iter_scored_rows(self, table: str, threshold_score: int) -> Iterator[tuple]:
+        """从Parquet阈值无关存储中读取目标表的行"""
+        scored = ParquetStore(self.parquet_dir).scan(
+            'protein_interactions_scored', min_score=threshold_score
+        )
+        channels = TABLE_COLUMNS['protein_interactions_detailed'][2:]
+        for batch in scored.to_batches():
+            columns = batch.to_pydict()
+            if table == 'protein_interactions':
+                yield from zip(columns['protein1'], columns['protein2'], columns['combined_score'])
+            else:
+                scores = zip(*[[score / 1000.0 for score in columns[name]] for name in channels])
+                for protein1, protein2, row_scores in zip(columns['protein1'], columns['protein2'], scores):
+                    yield (protein1, protein2, *row_scores)
+    
+    def _check_score_floor(self, min_score: float) -> int:
+        """检查查询阈值是否被阈值无关存储覆盖，返回对应的整数分数"""
+        if self.score_floor is None:
+            raise ValueError("未启用分数下限模式（score_floor），没有阈值无关存储")
+        if min_score < self.score_floor:
+            raise ValueError(f"查询阈值 {min_score} 低于存储的分数下限 {self.score_floor}")
+        return self._score_cutoff(min_score)
+    
+    def get_score_histogram(self, exact: bool = False) -> List[tuple]:
+        """返回阈值无关存储的分数直方图 [(score, count), ...]，分数为0-1000整数"""
+        if not exact:
+            histogram = self._get_stats().get_score_histogram('protein_interactions_scored')
+            if histogram is not None:
+                return histogram
+        
+        if self.storage_backend == 'parquet':
+            return ParquetStore(self.parquet_dir).score_histogram()
+        conn = sqlite3.connect(self.db_path)
+        histogram = conn.execute('''
+            SELECT combined_score, COUNT(*) FROM protein_interactions_scored
+            GROUP BY combined_score ORDER BY combined_score
+        ''').fetchall()
         conn.close()
-        logger.info("详细相互作用数据加载完成")
+        return histogram
+    
+    def count_interactions_above(self, min_score: float) -> int:
+        """由分数直方图统计置信度不低于min_score（0-1）的相互作用数量，不扫描相互作用数据"""
+        threshold_score = self._check_score_floor(min_score)
+        return sum(count for score, count in self.get_score_histogram() if score >= threshold_score)
+    
+    def get_interactions_above(self, min_score: float, detailed: bool = False) -> Iterator[tuple]:
+        """
+        返回置信度不低于min_score（0-1）的相互作用（分数主键范围扫描，按分数从高到低）
+        
+        Args:
+            min_score: 置信度阈值，不能低于score_floor
+            detailed: 是否附带7个证据通道分数
+        
+        Yields:
+            (protein1, protein2, combined_score[, 7个通道分数])，分数为0-1000整数，蛋白质ID为STRING原始ID
+        """
+        threshold_score = self._check_score_floor(min_score)
+        channels = TABLE_COLUMNS['protein_interactions_scored'][3:] if detailed else []
+        
+        if self.storage_backend == 'parquet':
+            scored = ParquetStore(self.parquet_dir).scan(
+                'protein_interactions_scored',
+                columns=['protein1', 'protein2', 'combined_score'] + channels,
+                min_score=threshold_score
+            ).sort_by([('combined_score', 'descending')])
+            for batch in scored.to_batches():
+                columns = batch.to_pydict()
+                yield from zip(*columns.values())
+            return
+        
+        channel_sql = ''.join(f', s.{name}' for name in channels)
+        if self.intern_ids:
+            sql = f'''
+                SELECT m1.protein_id, m2.protein_id, s.combined_score{channel_sql}
+                FROM protein_interactions_scored s
+                JOIN protein_id_map m1 ON m1.protein_idx = s.protein1
+                JOIN protein_id_map m2 ON m2.protein_idx = s.protein2
+                WHERE s.combined_score >= ? ORDER BY s.combined_score DESC
+            '''
+        else:
+            sql = f'''
+                SELECT s.protein1, s.protein2, s.combined_score{channel_sql}
+                FROM protein_interactions_scored s
+                WHERE s.combined_score >= ? ORDER BY s.combined_score DESC
+            '''
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield from conn.execute(sql, (threshold_score,))
+        finally:
+            conn.close()
     
     def load_cluster_info(self):
         """加载聚类信息数据"""
         # 下载并解压聚类信息文件
-        gz_path = self.download_file(self.urls['clusters_info'], 'clusters.info.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
+        paths = self._prepare_sources('clusters_info', 'clusters.info.v12.0.txt.gz')
         
         logger.info("开始加载聚类信息...")
-        conn = sqlite3.connect(self.db_path)
-        
-        chunk_size = 10000
-        batch_data = []
-        
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
-            
-            for line in tqdm(f, desc="处理聚类信息"):
-                parts = line.strip().split('\t')
-                if len(parts) >= 3:
-                    cluster_id = parts[0]
-                    cluster_name = parts[1] if len(parts) > 1 else ""
-                    cluster_description = parts[2] if len(parts) > 2 else ""
-                    cluster_size = int(parts[3]) if len(parts) > 3 else 0
-                    
-                    batch_data.append((cluster_id, cluster_name, cluster_description, cluster_size))
-                    
-                    if len(batch_data) >= chunk_size:
-                        conn.executemany(
-                            'INSERT OR REPLACE INTO cluster_info VALUES (?, ?, ?, ?)',
-                            batch_data
-                        )
-                        conn.commit()
-                        batch_data = []
-            
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO cluster_info VALUES (?, ?, ?, ?)',
-                    batch_data
-                )
-                conn.commit()
+        row_count = self._run_stage('cluster_info', paths, self._parse_cluster_info)
         
-        conn.close()
-        logger.info("聚类信息加载完成")
+        logger.info("聚类信息加载完成，共 %d 个聚类", row_count)
     
     def load_protein_clusters(self):
         """加载蛋白质聚类映射数据"""
         # 下载并解压蛋白质聚类文件
-        gz_path = self.download_file(self.urls['clusters_proteins'], 'clusters.proteins.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
+        paths = self._prepare_sources('clusters_proteins', 'clusters.proteins.v12.0.txt.gz')
         
         logger.info("开始加载蛋白质聚类映射...")
-        conn = sqlite3.connect(self.db_path)
-        
-        chunk_size = 10000
-        batch_data = []
-        
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
-            
-            for line in tqdm(f, desc="处理蛋白质聚类映射"):
-                parts = line.strip().split('\t')
-                if len(parts) >= 2:
-                    cluster_id = parts[0]
-                    protein_id = parts[1]
-                    
-                    batch_data.append((protein_id, cluster_id))
-                    
-                    if len(batch_data) >= chunk_size:
-                        conn.executemany(
-                            'INSERT OR REPLACE INTO protein_clusters VALUES (?, ?)',
-                            batch_data
-                        )
-                        conn.commit()
-                        batch_data = []
-            
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO protein_clusters VALUES (?, ?)',
-                    batch_data
-                )
-                conn.commit()
+        row_count = self._run_stage('protein_clusters', paths, self._parse_protein_clusters)
         
-        conn.close()
-        logger.info("蛋白质聚类映射加载完成")
+        logger.info("蛋白质聚类映射加载完成，共 %d 条映射", row_count)
     
     def load_cluster_tree(self):
         """加载聚类层次树数据"""
         # 下载并解压聚类树文件
-        gz_path = self.download_file(self.urls['clusters_tree'], 'clusters.tree.v12.0.txt.gz')
-        txt_path = self.extract_gz_file(gz_path)
+        paths = self._prepare_sources('clusters_tree', 'clusters.tree.v12.0.txt.gz')
         
         logger.info("开始加载聚类层次树...")
-        conn = sqlite3.connect(self.db_path)
+        row_count = self._run_stage('cluster_tree', paths, self._parse_cluster_tree)
         
-        chunk_size = 10000
-        batch_data = []
-        
-        with open(txt_path, 'r', encoding='utf-8') as f:
-            # 跳过头部
-            next(f)
+        logger.info("聚类层次树加载完成，共 %d 条边", row_count)
+    
+    def build_cluster_closure(self):
+        """由cluster_tree计算聚类闭包索引（cluster_tree未变化时跳过）"""
+        if self.storage_backend != 'sqlite':
+            logger.info("聚类闭包索引仅支持SQLite后端，跳过")
+            return
+        
+        manifest = self._get_manifest()
+        tree = manifest.get('cluster_tree')
+        if tree is None or tree['status'] != 'completed':
+            logger.warning("聚类层次树未加载，跳过闭包索引")
+            return
+        fingerprint = f"cluster_tree@{tree['finished_at']}:{tree['source_fingerprint']}"
+        with self.metrics.stage('cluster_closure') as stage:
+            params = self._stage_params('cluster_closure')
+            record = manifest.get('cluster_closure')
+            if (self.incremental and manifest.matches(record, fingerprint, params)
+                    and record['status'] == 'completed'):
+                logger.info("聚类树未变化，跳过闭包索引（%d 个聚类）", record['row_count'])
+                stage.status = 'skipped'
+                return
             
-            for line in tqdm(f, desc="处理聚类层次树"):
-                parts = line.strip().split('\t')
-                if len(parts) >= 3:
-                    child_cluster_id = parts[0]
-                    parent_cluster_id = parts[1]
-                    distance = float(parts[2])
-                    
-                    batch_data.append((child_cluster_id, parent_cluster_id, distance))
-                    
-                    if len(batch_data) >= chunk_size:
-                        conn.executemany(
-                            'INSERT OR REPLACE INTO cluster_tree VALUES (?, ?, ?)',
-                            batch_data
-                        )
-                        conn.commit()
-                        batch_data = []
+            logger.info("开始计算聚类闭包索引...")
+            manifest.start('cluster_closure', fingerprint, params)
+            conn = sqlite3.connect(self.db_path)
+            rows = compute_cluster_closure(
+                conn.execute('SELECT child_cluster_id, parent_cluster_id FROM cluster_tree')
+            )
+            start = time.perf_counter()
+            conn.execute('DELETE FROM cluster_closure')
+            conn.executemany('INSERT INTO cluster_closure VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            commit_start = time.perf_counter()
+            conn.commit()
+            stage.commit_seconds += time.perf_counter() - commit_start
+            stage.write_seconds += time.perf_counter() - start
+            stage.rows_written = len(rows)
+            conn.close()
             
-            # 插入剩余数据
-            if batch_data:
-                conn.executemany(
-                    'INSERT OR REPLACE INTO cluster_tree VALUES (?, ?, ?)',
-                    batch_data
-                )
-                conn.commit()
-        
-        conn.close()
-        logger.info("聚类层次树加载完成")
+            manifest.complete('cluster_closure', len(rows))
+            logger.info("聚类闭包索引完成，共 %d 个聚类", len(rows))
     
-    def get_statistics(self) -> Dict:
-        """获取数据统计信息"""
+    def get_statistics(self, exact: bool = False) -> Dict:
+        """
+        获取数据统计信息
+        
+        Args:
+            exact: 为True时扫描各表精确计算；默认读取提取时累计的统计表，缺少统计时回退到精确计算
+        """
+        if not exact:
+            stats = self._get_stats().get_statistics()
+            if stats is not None:
+                return stats
+            logger.info("统计表不完整，扫描各表计算统计信息...")
+        
+        if self.storage_backend == 'parquet':
+            return ParquetStore(self.parquet_dir).get_statistics()
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -544,8 +1114,12 @@ class StringDataExtractor:
         cursor.execute('SELECT COUNT(*) FROM protein_interactions_detailed')
         stats['detailed_interactions'] = cursor.fetchone()[0]
         
+        # 阈值无关存储的相互作用数量（未启用分数下限模式时为0）
+        cursor.execute('SELECT COUNT(*) FROM protein_interactions_scored')
+        stats['scored_interactions'] = cursor.fetchone()[0]
+        
         # 有序列的蛋白质数量
-        cursor.execute('SELECT COUNT(*) FROM protein_sequences')
+        cursor.execute('SELECT (SELECT COUNT(*) FROM protein_sequences) + (SELECT COUNT(*) FROM sequence_index)')
         stats['proteins_with_sequences'] = cursor.fetchone()[0]
         
         # 聚类相关统计
@@ -580,12 +1154,38 @@ class StringDataExtractor:
         conn.close()
         return stats
     
+    def write_run_report(self) -> Dict:
+        """将本次运行各阶段的指标写入JSON运行报告"""
+        config = {
+            'storage_backend': self.storage_backend,
+            'confidence_threshold': self.confidence_threshold,
+            'intern_ids': self.intern_ids,
+            'species_ids': sorted(self.species_ids) if self.species_ids is not None else None,
+            'score_floor': self.score_floor,
+            'canonicalize_edges': self.canonicalize_edges,
+            'compress_sequences': self.compress_sequences,
+            'external_sort': self.external_sort,
+        }
+        return self.metrics.write_report(self.report_path, config)
+    
     def extract_all_data(self):
         """执行完整的数据提取流程 - 为层次化特征建模准备数据"""
         logger.info("开始STRING数据提取流程（层次化特征建模版本）...")
-        
-        # 1. 设置数据库
-        self.setup_database()
+        if self.species_ids is not None:
+            logger.info("仅提取物种: %s（%s）", sorted(self.species_ids),
+                        "分物种文件" if self.use_species_files else "完整文件前缀过滤")
+            if not self.use_species_files:
+                logger.info("聚类信息和聚类树不含蛋白质ID，完整文件模式下不做物种过滤")
+        if self.protein_ids is not None:
+            logger.info("仅提取 %d 个指定蛋白质", len(self.protein_ids))
+        if self.canonicalize_edges:
+            logger.info("相互作用规范化：每条无向相互作用只保存 protein1 < protein2 的一行")
+        if self.score_floor is not None:
+            logger.info("分数下限模式：存储分数 >= %.3f 的全部相互作用，按阈值 %.3f 物化",
+                        self.score_floor, self.confidence_threshold)
+        
+        # 1. 设置数据库（Parquet后端无需建表，只写出数据集元信息）
+        self.setup_storage()
         
         # 2. 加载基础蛋白质信息
         self.load_protein_info()
@@ -599,6 +1199,10 @@ class StringDataExtractor:
         # 5. 加载详细相互作用数据（多通道证据评分，用于HGCN）
         self.load_detailed_interactions()
         
+        # 分数直方图（阈值扫描时可直接估计各阈值下的边数）
+        if self.score_floor is not None:
+            logger.info("分数直方图: %d 个分数取值", len(self.get_score_histogram()))
+        
         # 6. 加载聚类信息（用于MoE专家模型的家族分类）
         self.load_cluster_info()
         
@@ -608,18 +1212,106 @@ class StringDataExtractor:
         # 8. 加载聚类层次树（用于层次化建模）
         self.load_cluster_tree()
         
+        # 聚类树闭包索引（祖先/后代和指定深度的聚类查询）
+        self.build_cluster_closure()
+        
+        return self._finish_extraction()
+    
+    def extract_all_data_pipelined(self, max_parallel_files: int = 4) -> Dict:
+        """
+        流水线方式执行完整提取：边下载边解析，独立的源文件并发处理，单线程写入数据库
+        
+        结果（数据库、阶段清单、下载和解压后的文件）与extract_all_data相同，两种方式可以交替使用。
+        """
+        logger.info("开始STRING数据提取流程（流水线模式）...")
+        return IngestOrchestrator(self, max_parallel_files=max_parallel_files).run()
+    
+    def _finish_extraction(self) -> Dict:
+        """输出统计信息并写出运行报告"""
         # 9. 输出统计信息
         stats = self.get_statistics()
         logger.info("层次化特征建模数据提取完成！统计信息:")
         for key, value in stats.items():
             logger.info("  %s: %s", key, value)
         
+        # 10. 写出运行报告（各阶段字节数、速率、写入/提交耗时、峰值内存）
+        self.write_run_report()
+        
         return stats
 
 def main():
     """主函数"""
-    extractor = StringDataExtractor(confidence_threshold=0.95)
-    stats = extractor.extract_all_data()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='STRING数据提取器')
+    parser.add_argument('--data-dir', default='data', help='数据目录路径')
+    parser.add_argument('--confidence', type=float, default=0.95, help='置信度阈值(0-1)')
+    parser.add_argument('--backend', choices=['sqlite', 'parquet'], default='sqlite',
+                        help='存储后端（parquet为按物种分区的列式存储）')
+    parser.add_argument('--intern-ids', action='store_true',
+                        help='使用整数蛋白质ID存储（SQLite后端）')
+    parser.add_argument('--species', type=int, nargs='+', help='只提取这些物种（taxon ID）')
+    parser.add_argument('--pring-species', action='store_true',
+                        help='只提取PRING的4个物种（human, arath, yeast, ecoli）')
+    parser.add_argument('--protein-list', help='只提取该文件中列出的蛋白质ID（每行一个）')
+    parser.add_argument('--full-files', action='store_true',
+                        help='限定物种时仍扫描完整文件（按ID前缀过滤），而不是下载分物种文件')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略阶段清单，重新运行所有阶段')
+    parser.add_argument('--exact-stats', action='store_true',
+                        help='扫描各表精确计算统计信息（默认读取提取时累计的统计表）')
+    parser.add_argument('--compress-sequences', action='store_true',
+                        help='序列按块压缩存储，附带长度/物种索引（SQLite后端）')
+    parser.add_argument('--canonical-edges', action='store_true',
+                        help='每条无向相互作用只保存一行（protein1 < protein2），存储减半')
+    parser.add_argument('--score-floor', type=float,
+                        help='存储分数不低于该下限(0-1)的全部相互作用，之后调整阈值无需重新解析原始文件')
+    parser.add_argument('--progress-interval', type=float,
+                        help='每隔多少秒输出一行阶段进度（读取/写入速率、字节数、提交耗时、峰值内存）')
+    parser.add_argument('--report', help='JSON运行报告路径（默认 <data-dir>/ingest_report.json）')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='流水线模式：边下载边解析，多个源文件并发处理，单线程写入数据库')
+    parser.add_argument('--parallel-files', type=int, default=4,
+                        help='流水线模式下同时处理的源文件类型数')
+    parser.add_argument('--external-sort', action='store_true',
+                        help='写入前按主键外部排序去重，用顺序INSERT代替 INSERT OR REPLACE')
+    parser.add_argument('--sort-memory-mb', type=float, default=512,
+                        help='外部排序的内存预算（MB）')
+    
+    args = parser.parse_args()
+    
+    species_ids = set(args.species) if args.species else None
+    if args.pring_species:
+        species_ids = (species_ids or set()) | set(PRING_SPECIES_IDS.values())
+    
+    protein_ids = None
+    if args.protein_list:
+        with open(args.protein_list, 'r', encoding='utf-8') as f:
+            protein_ids = {line.strip() for line in f if line.strip()}
+    
+    extractor = StringDataExtractor(
+        data_dir=args.data_dir,
+        confidence_threshold=args.confidence,
+        storage_backend=args.backend,
+        intern_ids=args.intern_ids,
+        species_ids=species_ids,
+        protein_ids=protein_ids,
+        use_species_files=not args.full_files,
+        incremental=not args.force,
+        score_floor=args.score_floor,
+        canonicalize_edges=args.canonical_edges,
+        compress_sequences=args.compress_sequences,
+        progress_interval=args.progress_interval,
+        report_path=args.report,
+        external_sort=args.external_sort,
+        sort_memory_mb=args.sort_memory_mb
+    )
+    if args.pipelined:
+        stats = extractor.extract_all_data_pipelined(max_parallel_files=args.parallel_files)
+    else:
+        stats = extractor.extract_all_data()
+    if args.exact_stats:
+        stats = extractor.get_statistics(exact=True)
     
     print("\n" + "="*60)
     print("STRING层次化特征建模数据提取完成！")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+STRING数据库查询层
+基于只读连接池的批量查询接口：一次调用查询一批蛋白质的序列、邻居和聚类，
+供训练数据加载进程按批次读取特征
+"""
+
+import math
+import queue
+import sqlite3
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sequence_store import SequenceStore
+
+# 小批量使用固定长度的 IN (...)，语句文本不变，可复用连接的预编译语句缓存
+IN_CHUNK_SIZE = 500
+# 超过该数量的ID写入临时表后做连接查询
+TEMP_TABLE_THRESHOLD = 5000
+
+
+class StringQuery:
+    """
+    STRING数据库批量查询
+
+    连接以只读URI（mode=ro）打开，启用共享缓存和内存映射读取；每个连接保留
+    预编译语句缓存，查询语句文本固定，重复调用不再重新解析SQL。连接池可在多个线程间共享。
+
+    Example:
+        query = StringQuery("data/string_data.db")
+        sequences = query.get_sequences(batch_ids)
+        neighbors = query.get_neighbors(batch_ids, min_score=0.9)
+        clusters = query.get_clusters(batch_ids)
+    """
+
+    def __init__(self, db_path: str, pool_size: int = 4, mmap_size: int = 1 << 30,
+                 cached_statements: int = 256):
+        """
+        初始化查询层
+
+        Args:
+            db_path: string_data.db路径
+            pool_size: 连接池大小（同时进行的查询数）
+            mmap_size: 每个连接的内存映射读取上限（字节）
+            cached_statements: 每个连接的预编译语句缓存大小
+        """
+        self.db_path = Path(db_path)
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"数据库不存在: {self.db_path}")
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self._uri = f"file:{self.db_path.resolve()}?mode=ro&cache=shared"
+
+        self._pool: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+
+        # 存储模式（db_meta由StringDataExtractor写入，旧数据库按默认模式处理）
+        with self.connection() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            meta = dict(conn.execute('SELECT key, value FROM db_meta')) if 'db_meta' in tables else {}
+        self.interned = meta.get('id_mode') == 'interned'
+        self.canonical = meta.get('edge_mode') == 'canonical'
+        self.sequence_blocks = meta.get('sequence_store') == 'blocks'
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        # 大批量查询使用的临时ID表（临时库属于各自连接，不写数据库文件）
+        conn.execute('CREATE TEMP TABLE query_ids (protein_id TEXT PRIMARY KEY)')
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """从连接池借出一个只读连接"""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """关闭连接池中的全部连接"""
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def _lookup(self, conn: sqlite3.Connection, sql: str, protein_ids: Sequence[str],
+                extra_params: tuple = ()) -> List[tuple]:
+        """
+        按ID批量执行查询
+
+        Args:
+            sql: 含 {ids} 占位的查询语句，{ids} 被替换为 IN (...) 条件
+            protein_ids: 蛋白质ID（STRING原始ID）
+            extra_params: 位于 {ids} 之后的其余参数
+        """
+        protein_ids = list(dict.fromkeys(protein_ids))
+        if not protein_ids:
+            return []
+
+        if len(protein_ids) > TEMP_TABLE_THRESHOLD:
+            conn.execute('DELETE FROM temp.query_ids')
+            conn.executemany('INSERT INTO temp.query_ids VALUES (?)', ((pid,) for pid in protein_ids))
+            return conn.execute(
+                sql.format(ids='IN (SELECT protein_id FROM temp.query_ids)'), extra_params
+            ).fetchall()
+
+        statement = sql.format(ids=f"IN ({', '.join('?' * IN_CHUNK_SIZE)})")
+        rows = []
+        for start in range(0, len(protein_ids), IN_CHUNK_SIZE):
+            chunk = protein_ids[start:start + IN_CHUNK_SIZE]
+            # 用最后一个ID补足固定长度，保持语句文本不变
+            chunk = chunk + [chunk[-1]] * (IN_CHUNK_SIZE - len(chunk))
+            rows.extend(conn.execute(statement, (*chunk, *extra_params)))
+        return rows
+
+    def get_sequences(self, protein_ids: Sequence[str]) -> Dict[str, str]:
+        """批量读取序列，返回 {protein_id: sequence}（没有序列的ID不出现在结果中）"""
+        with self.connection() as conn:
+            if self.sequence_blocks:
+                store = SequenceStore(conn=conn)
+                select = store.location_select()
+                id_column = 'm.protein_id' if self.interned else 'i.protein_id'
+                locations = self._lookup(conn, f'{select} WHERE {id_column} {{ids}}', protein_ids)
+                return dict(store.decode(locations))
+
+            if self.interned:
+                sql = ('SELECT m.protein_id, s.sequence FROM protein_sequences s '
+                       'JOIN protein_id_map m ON m.protein_idx = s.protein_id WHERE m.protein_id {ids}')
+            else:
+                sql = 'SELECT protein_id, sequence FROM protein_sequences WHERE protein_id {ids}'
+            return dict(self._lookup(conn, sql, protein_ids))
+
+    def _neighbor_sql(self, key_column: str, other_column: str) -> str:
+        """以 key_column 为查询端的邻居查询语句"""
+        if self.interned:
+            return (f'SELECT mk.protein_id, mo.protein_id, i.combined_score FROM protein_interactions i '
+                    f'JOIN protein_id_map mk ON mk.protein_idx = i.{key_column} '
+                    f'JOIN protein_id_map mo ON mo.protein_idx = i.{other_column} '
+                    f'WHERE mk.protein_id {{ids}} AND i.combined_score >= ?')
+        return (f'SELECT i.{key_column}, i.{other_column}, i.combined_score FROM protein_interactions i '
+                f'WHERE i.{key_column} {{ids}} AND i.combined_score >= ?')
+
+    def get_neighbors(self, protein_ids: Sequence[str],
+                      min_score: Optional[float] = None) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        批量查询相互作用邻居
+
+        Args:
+            protein_ids: 蛋白质ID
+            min_score: 置信度阈值(0-1)，None表示返回protein_interactions中的全部邻居
+
+        Returns:
+            {protein_id: [(neighbor_id, combined_score), ...]}，分数为0-1000整数
+        """
+        threshold_score = math.ceil(round(min_score * 1000, 6)) if min_score is not None else 0
+        neighbors: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+
+        with self.connection() as conn:
+            for protein_id, neighbor_id, score in self._lookup(
+                    conn, self._neighbor_sql('protein1', 'protein2'), protein_ids, (threshold_score,)):
+                neighbors[protein_id].append((neighbor_id, score))
+            # 规范化存储中每条边只有一行，还需要从protein2端查询
+            if self.canonical:
+                for protein_id, neighbor_id, score in self._lookup(
+                        conn, self._neighbor_sql('protein2', 'protein1'), protein_ids, (threshold_score,)):
+                    neighbors[protein_id].append((neighbor_id, score))
+
+        return dict(neighbors)
+
+    def get_clusters(self, protein_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """批量查询蛋白质所属的聚类，返回 {protein_id: [cluster_id, ...]}"""
+        if self.interned:
+            sql = ('SELECT m.protein_id, c.cluster_id FROM protein_clusters c '
+                   'JOIN protein_id_map m ON m.protein_idx = c.protein_id WHERE m.protein_id {ids}')
+        else:
+            sql = 'SELECT protein_id, cluster_id FROM protein_clusters WHERE protein_id {ids}'
+
+        clusters: Dict[str, List[str]] = defaultdict(list)
+        with self.connection() as conn:
+            for protein_id, cluster_id in self._lookup(conn, sql, protein_ids):
+                clusters[protein_id].append(cluster_id)
+        return dict(clusters)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+合成STRING数据生成器
+按可配置的规模（物种数、每物种蛋白质数、度分布、分数分布）生成与STRING v12.0下载文件
+同名同格式的.gz文件，用于在不下载完整数据的情况下测试和基准测试提取/预处理流程
+"""
+
+import gzip
+import logging
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 证据通道（顺序与protein.links.detailed一致）
+CHANNELS = ['neighborhood', 'fusion', 'cooccurence', 'coexpression', 'experimental', 'database', 'textmining']
+
+# 各证据通道为0的概率（真实数据中textmining和coexpression最常见，fusion最稀少）
+CHANNEL_ZERO_PROB = [0.85, 0.97, 0.8, 0.5, 0.7, 0.85, 0.3]
+
+# 注释模板：包含ProteinQualityFilter关注的低质量关键词，使过滤比例接近真实数据
+ANNOTATIONS = [
+    ('DNA-directed RNA polymerase subunit; catalyzes the transcription of DNA into RNA', 0.35),
+    ('Serine/threonine-protein kinase; involved in signal transduction', 0.2),
+    ('Uncharacterized protein', 0.15),
+    ('Putative transcription factor', 0.1),
+    ('Hypothetical protein', 0.08),
+    ('Protein fragment; Fragment', 0.04),
+    ('Annotation not available', 0.08),
+]
+
+AMINO_ACIDS = np.frombuffer(b'ACDEFGHIKLMNPQRSTVWY', dtype=np.uint8)
+
+# 最先使用PRING的4个物种，超出部分使用合成taxon ID
+DEFAULT_SPECIES = [9606, 3702, 4932, 511145]
+
+FILE_NAMES = {
+    'protein_info': 'protein.info.v12.0.txt.gz',
+    'protein_links': 'protein.links.v12.0.txt.gz',
+    'protein_links_detailed': 'protein.links.detailed.v12.0.txt.gz',
+    'protein_sequences': 'protein.sequences.v12.0.fa.gz',
+    'clusters_info': 'clusters.info.v12.0.txt.gz',
+    'clusters_proteins': 'clusters.proteins.v12.0.txt.gz',
+    'clusters_tree': 'clusters.tree.v12.0.txt.gz',
+}
+
+
+@dataclass
+class SyntheticConfig:
+    """合成数据规模和分布参数"""
+    num_species: int = 4
+    proteins_per_species: int = 5000
+    # 平均度数（每个蛋白质的相互作用数，每条相互作用在文件中列出两次）
+    mean_degree: float = 20.0
+    # 度分布的幂律指数（Chung-Lu模型，越小越集中于少数枢纽蛋白质）
+    degree_exponent: float = 2.5
+    # combined_score = 150 + 849 * Beta(a, b)，默认偏向低分，与STRING分数分布相近
+    score_beta: tuple = (1.2, 3.0)
+    # 蛋白质长度的对数正态分布参数（中位数约350个氨基酸）
+    length_log_mean: float = 5.86
+    length_log_sigma: float = 0.65
+    # 每个聚类的平均蛋白质数和聚类树的分支数
+    proteins_per_cluster: int = 50
+    cluster_branching: int = 4
+    # 每个蛋白质所属的聚类数（同一蛋白质出现在聚类树的多层）
+    clusters_per_protein: int = 2
+    seed: int = 0
+    # gzip压缩级别（基准测试时较低级别可加快生成）
+    compresslevel: int = 6
+    species_ids: Optional[List[int]] = field(default=None)
+
+    def resolved_species(self) -> List[int]:
+        if self.species_ids is not None:
+            return list(self.species_ids)[:self.num_species]
+        extra = [100000 + i for i in range(max(self.num_species - len(DEFAULT_SPECIES), 0))]
+        return (DEFAULT_SPECIES + extra)[:self.num_species]
+
+
+class SyntheticStringGenerator:
+    """
+    合成STRING数据生成器
+
+    Example:
+        generator = SyntheticStringGenerator(SyntheticConfig(num_species=2, proteins_per_species=1000))
+        paths = generator.generate("data/synthetic")
+        StringDataExtractor("data/synthetic", confidence_threshold=0.7).extract_all_data()
+    """
+
+    def __init__(self, config: Optional[SyntheticConfig] = None):
+        self.config = config or SyntheticConfig()
+        self.rng = np.random.default_rng(self.config.seed)
+        self.species = self.config.resolved_species()
+
+    def protein_ids(self, taxid: int) -> List[str]:
+        """物种的蛋白质ID（零填充，字符串顺序与编号顺序一致）"""
+        return [f"{taxid}.SYN{i:07d}" for i in range(self.config.proteins_per_species)]
+
+    def _open(self, output_dir: Path, key: str):
+        return gzip.open(output_dir / FILE_NAMES[key], 'wt', compresslevel=self.config.compresslevel)
+
+    def _sample_edges(self) -> np.ndarray:
+        """
+        按Chung-Lu模型采样一个物种的无向边，返回排序后的 (i, j) 数组（i < j，无重复）
+
+        端点按权重 w_k ∝ (k+1)^(-1/(γ-1)) 独立抽样，期望度数服从指数为γ的幂律。
+        """
+        n = self.config.proteins_per_species
+        num_edges = int(n * self.config.mean_degree / 2)
+        weights = np.arange(1, n + 1, dtype=np.float64) ** (-1.0 / (self.config.degree_exponent - 1))
+        weights /= weights.sum()
+        # 打乱权重与编号的对应关系，避免枢纽蛋白质集中在编号最小处
+        weights = weights[self.rng.permutation(n)]
+
+        # 多抽一部分以补偿自环和重复边
+        draws = int(num_edges * 1.3) + 16
+        a = self.rng.choice(n, size=draws, p=weights)
+        b = self.rng.choice(n, size=draws, p=weights)
+        keep = a != b
+        low = np.minimum(a, b)[keep].astype(np.int64)
+        high = np.maximum(a, b)[keep].astype(np.int64)
+        keys = np.unique(low * n + high)
+        # 随机保留num_edges条（直接截取排序后的前若干条会偏向编号小的蛋白质）
+        keys = np.sort(self.rng.permutation(keys)[:num_edges])
+        return np.stack([keys // n, keys % n], axis=1)
+
+    def _sample_scores(self, num_edges: int) -> np.ndarray:
+        """采样 (num_edges, 8) 的分数矩阵：7个证据通道和combined_score，均为0-999整数"""
+        alpha, beta = self.config.score_beta
+        combined = (150 + 849 * self.rng.beta(alpha, beta, size=num_edges)).astype(np.int64)
+        scores = np.zeros((num_edges, len(CHANNELS) + 1), dtype=np.int64)
+        for k, zero_prob in enumerate(CHANNEL_ZERO_PROB):
+            present = self.rng.random(num_edges) >= zero_prob
+            scores[:, k] = np.where(present, self.rng.integers(45, combined + 1), 0)
+        scores[:, -1] = combined
+        return scores
+
+    def _write_links(self, output_dir: Path) -> Dict[str, int]:
+        """写入protein.links和protein.links.detailed（每条相互作用A-B、B-A各一行，按protein1排序）"""
+        counts = {'interactions': 0}
+        with self._open(output_dir, 'protein_links') as links, \
+                self._open(output_dir, 'protein_links_detailed') as detailed:
+            links.write("protein1 protein2 combined_score\n")
+            detailed.write("protein1 protein2 " + " ".join(CHANNELS) + " combined_score\n")
+
+            # STRING文件按protein1的字符串顺序排列，物种按taxon ID字符串排序
+            for taxid in sorted(self.species, key=str):
+                ids = self.protein_ids(taxid)
+                edges = self._sample_edges()
+                scores = self._sample_scores(len(edges))
+
+                # 两个方向各一行，按 (protein1, protein2) 排序
+                source = np.concatenate([edges[:, 0], edges[:, 1]])
+                target = np.concatenate([edges[:, 1], edges[:, 0]])
+                order = np.lexsort((target, source))
+                row_scores = np.concatenate([scores, scores])[order]
+                source, target = source[order], target[order]
+
+                batch_links, batch_detailed = [], []
+                for k in range(len(source)):
+                    pair = f"{ids[source[k]]} {ids[target[k]]}"
+                    values = row_scores[k]
+                    batch_links.append(f"{pair} {values[-1]}\n")
+                    batch_detailed.append(f"{pair} {' '.join(map(str, values))}\n")
+                    if len(batch_links) >= 100000:
+                        links.write(''.join(batch_links))
+                        detailed.write(''.join(batch_detailed))
+                        batch_links, batch_detailed = [], []
+                links.write(''.join(batch_links))
+                detailed.write(''.join(batch_detailed))
+                counts['interactions'] += len(edges)
+        return counts
+
+    def _write_proteins(self, output_dir: Path) -> Dict[str, int]:
+        """写入protein.info和protein.sequences（序列长度与protein_size一致）"""
+        texts = [text for text, _ in ANNOTATIONS]
+        probs = np.array([prob for _, prob in ANNOTATIONS])
+        probs /= probs.sum()
+
+        total_residues = 0
+        with self._open(output_dir, 'protein_info') as info, \
+                self._open(output_dir, 'protein_sequences') as fasta:
+            info.write("#string_protein_id\tpreferred_name\tprotein_size\tannotation\n")
+            for taxid in sorted(self.species, key=str):
+                ids = self.protein_ids(taxid)
+                lengths = np.clip(
+                    self.rng.lognormal(self.config.length_log_mean, self.config.length_log_sigma, len(ids)),
+                    20, 8000
+                ).astype(np.int64)
+                annotations = self.rng.choice(len(texts), size=len(ids), p=probs)
+                residues = AMINO_ACIDS[self.rng.integers(0, len(AMINO_ACIDS), size=int(lengths.sum()))].tobytes()
+
+                offset = 0
+                info_lines, fasta_lines = [], []
+                for k, protein_id in enumerate(ids):
+                    length = int(lengths[k])
+                    sequence = residues[offset:offset + length].decode('ascii')
+                    offset += length
+                    info_lines.append(f"{protein_id}\tSYN{k}\t{length}\t{texts[annotations[k]]}\n")
+                    # FASTA每行60个残基
+                    fasta_lines.append(f">{protein_id}\n")
+                    fasta_lines.extend(f"{sequence[i:i + 60]}\n" for i in range(0, length, 60))
+                info.write(''.join(info_lines))
+                fasta.write(''.join(fasta_lines))
+                total_residues += offset
+        return {'proteins': len(self.species) * self.config.proteins_per_species, 'residues': total_residues}
+
+    def _write_clusters(self, output_dir: Path) -> Dict[str, int]:
+        """写入clusters.info/proteins/tree：聚类树为完全k叉树，蛋白质归入叶聚类及其祖先"""
+        all_ids = [protein_id for taxid in sorted(self.species, key=str) for protein_id in self.protein_ids(taxid)]
+        branching = self.config.cluster_branching
+        num_leaves = max(len(all_ids) // self.config.proteins_per_cluster, 1)
+
+        # 完全k叉树按层编号：节点c的父节点为 (c - 1) // k，叶子为最后num_leaves个节点
+        num_internal = 0
+        level = num_leaves
+        while level > 1:
+            level = -(-level // branching)
+            num_internal += level
+        num_clusters = num_internal + num_leaves
+        leaf_of = num_internal + self.rng.integers(0, num_leaves, size=len(all_ids))
+
+        members: Dict[int, List[str]] = {}
+        for protein_id, leaf in zip(all_ids, leaf_of):
+            cluster = int(leaf)
+            for _ in range(self.config.clusters_per_protein):
+                members.setdefault(cluster, []).append(protein_id)
+                if cluster == 0:
+                    break
+                cluster = (cluster - 1) // branching
+
+        with self._open(output_dir, 'clusters_info') as f:
+            f.write("#cluster_id\tcluster_name\tcluster_description\tcluster_size\n")
+            for cluster in range(num_clusters):
+                f.write(f"CL:{cluster}\tcluster {cluster}\tsynthetic cluster\t{len(members.get(cluster, []))}\n")
+        with self._open(output_dir, 'clusters_proteins') as f:
+            f.write("#cluster_id\tprotein_id\n")
+            for cluster in sorted(members):
+                f.write(''.join(f"CL:{cluster}\t{protein_id}\n" for protein_id in members[cluster]))
+        with self._open(output_dir, 'clusters_tree') as f:
+            f.write("#child_cluster_id\tparent_cluster_id\tdistance\n")
+            for cluster in range(1, num_clusters):
+                f.write(f"CL:{cluster}\tCL:{(cluster - 1) // branching}\t{self.rng.uniform(0.05, 1.0):.3f}\n")
+
+        return {'clusters': num_clusters, 'cluster_memberships': sum(len(v) for v in members.values())}
+
+    def generate(self, output_dir: str) -> Dict:
+        """
+        生成全部合成文件
+
+        Returns:
+            {'files': {类型: 路径}, 'counts': 生成的蛋白质/相互作用/聚类数, 'config': 参数}
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("生成合成STRING数据: %d 个物种 × %d 个蛋白质 -> %s",
+                    len(self.species), self.config.proteins_per_species, output_dir)
+
+        counts = {}
+        counts.update(self._write_proteins(output_dir))
+        counts.update(self._write_links(output_dir))
+        counts.update(self._write_clusters(output_dir))
+        logger.info("合成数据生成完成: %s", counts)
+
+        return {
+            'files': {key: output_dir / name for key, name in FILE_NAMES.items()},
+            'counts': counts,
+            'config': asdict(self.config),
+        }
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='合成STRING数据生成器')
+    parser.add_argument('--output-dir', default='data/synthetic', help='输出目录')
+    parser.add_argument('--species', type=int, default=4, help='物种数')
+    parser.add_argument('--proteins-per-species', type=int, default=5000, help='每个物种的蛋白质数')
+    parser.add_argument('--mean-degree', type=float, default=20.0, help='平均度数')
+    parser.add_argument('--degree-exponent', type=float, default=2.5, help='度分布幂律指数')
+    parser.add_argument('--score-beta', type=float, nargs=2, default=(1.2, 3.0),
+                        help='combined_score的Beta分布参数 a b')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config = SyntheticConfig(
+        num_species=args.species,
+        proteins_per_species=args.proteins_per_species,
+        mean_degree=args.mean_degree,
+        degree_exponent=args.degree_exponent,
+        score_beta=tuple(args.score_beta),
+        seed=args.seed,
+    )
+    result = SyntheticStringGenerator(config).generate(args.output_dir)
+    for key, value in result['counts'].items():
+        print(f"  {key}: {value:,}")
+
+
+if __name__ == "__main__":
+    main()
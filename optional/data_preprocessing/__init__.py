@@ -3,7 +3,7 @@
 用于层次化特征建模的数据过滤和准备
 """
 
-from .ppi_filter import PPIDataFilter
+from .ppi_filter import PPIDataFilter, canonicalize_edges, symmetrize_edges, load_filtered_data
 from .protein_filter import ProteinQualityFilter
 from .cluster_analyzer import ClusterAnalyzer
 from .data_statistics import DataStatistics
@@ -12,5 +12,8 @@ __all__ = [
     'PPIDataFilter',
     'ProteinQualityFilter', 
     'ClusterAnalyzer',
-    'DataStatistics'
+    'DataStatistics',
+    'canonicalize_edges',
+    'symmetrize_edges',
+    'load_filtered_data'
 ]
\ No newline at end of file
@@ -7,9 +7,10 @@
 import pandas as pd
 import numpy as np
 import gzip
+import sqlite3
 from pathlib import Path
 import logging
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Sequence, Set, Tuple
 import networkx as nx
 from collections import defaultdict, Counter
 
@@ -27,10 +28,15 @@ class ClusterAnalyzer:
         self.cluster_proteins_file = self.data_dir / "clusters.proteins.v12.0.txt.gz"
         self.cluster_tree_file = self.data_dir / "clusters.tree.v12.0.txt.gz"
         
+        # StringDataExtractor生成的数据库（包含聚类闭包索引时优先使用）
+        self.db_path = self.data_dir / "string_data.db"
+        
         # 缓存数据
         self.cluster_info = None
         self.protein_clusters = None
         self.cluster_tree = None
+        self.cluster_closure = None
+        self.cluster_intervals = None    # cluster_id -> (tin, tout)，由闭包索引构建
     
     def load_cluster_info(self) -> pd.DataFrame:
         """加载聚类信息"""
@@ -128,6 +134,99 @@ class ClusterAnalyzer:
         
         return self.cluster_tree
     
+    def load_cluster_closure(self) -> pd.DataFrame:
+        """
+        加载提取阶段预计算的聚类闭包索引（cluster_closure表）
+        
+        node_idx等于先序遍历序号tin，tout为子树中最大的tin，
+        b 是 a 的后代当且仅当 tin[a] <= tin[b] <= tout[a]。数据库中没有该表时返回空DataFrame。
+        """
+        if self.cluster_closure is not None:
+            return self.cluster_closure
+        
+        self.cluster_closure = pd.DataFrame()
+        self.cluster_intervals = {}
+        if not self.db_path.exists():
+            return self.cluster_closure
+        
+        conn = sqlite3.connect(self.db_path)
+        has_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='cluster_closure'"
+        ).fetchone()
+        if has_table:
+            self.cluster_closure = pd.read_sql_query(
+                'SELECT cluster_id, node_idx, parent_idx, depth, root_idx, tin, tout '
+                'FROM cluster_closure ORDER BY node_idx', conn
+            )
+            self.cluster_intervals = dict(zip(
+                self.cluster_closure['cluster_id'],
+                zip(self.cluster_closure['tin'].tolist(), self.cluster_closure['tout'].tolist())
+            ))
+            logger.info(f"加载了 {len(self.cluster_closure)} 个聚类的闭包索引")
+        conn.close()
+        return self.cluster_closure
+    
+    def is_ancestor(self, ancestor_cluster: str, cluster: str) -> bool:
+        """
+        判断ancestor_cluster是否为cluster的祖先（或自身），需要闭包索引
+        
+        两个聚类的区间在首次加载闭包索引时建成字典，每次判断为O(1)的区间比较；
+        任一聚类不在聚类树中时返回False。
+        """
+        self.load_cluster_closure()
+        a = self.cluster_intervals.get(ancestor_cluster)
+        b = self.cluster_intervals.get(cluster)
+        if a is None or b is None:
+            return False
+        return a[0] <= b[0] <= a[1]
+    
+    def get_ancestors_at_depth(self, cluster_ids: Sequence[str], depth: int) -> pd.Series:
+        """
+        向量化查询各聚类在指定深度的祖先（深度恰为depth时为自身）
+        
+        Returns:
+            与cluster_ids对齐的Series，深度不足或不在聚类树中的聚类为None
+        """
+        closure = self.load_cluster_closure()
+        cluster_ids = pd.Index(cluster_ids)
+        result = np.full(len(cluster_ids), None, dtype=object)
+        if closure.empty:
+            return pd.Series(result, index=cluster_ids, dtype=object)
+        
+        # 深度为depth的节点按tin排序，区间互不相交；查询节点的祖先是tin不超过它的最后一个区间
+        level = closure[closure['depth'] == depth]
+        level_tin = level['tin'].to_numpy()
+        level_tout = level['tout'].to_numpy()
+        level_ids = level['cluster_id'].to_numpy()
+        
+        positions = pd.Index(closure['cluster_id']).get_indexer(cluster_ids)
+        found = positions >= 0
+        tin = closure['tin'].to_numpy()[positions[found]]
+        slot = np.searchsorted(level_tin, tin, side='right') - 1
+        inside = slot >= 0
+        inside[inside] = tin[inside] <= level_tout[slot[inside]]
+        
+        values = np.full(len(tin), None, dtype=object)
+        values[inside] = level_ids[slot[inside]]
+        result[found] = values
+        return pd.Series(result, index=cluster_ids, dtype=object)
+    
+    def assign_protein_families(self, depth: int) -> pd.DataFrame:
+        """
+        将每个蛋白质-聚类映射归入深度为depth的祖先家族（用于按家族条件化的LoRA分组）
+        
+        Returns:
+            DataFrame(protein_id, cluster_id, family_cluster)，没有该深度祖先的映射被丢弃
+        """
+        protein_clusters = self.load_protein_clusters()
+        if protein_clusters.empty or self.load_cluster_closure().empty:
+            return pd.DataFrame(columns=['protein_id', 'cluster_id', 'family_cluster'])
+        
+        families = self.get_ancestors_at_depth(protein_clusters['cluster_id'].unique(), depth)
+        assigned = protein_clusters[['protein_id', 'cluster_id']].copy()
+        assigned['family_cluster'] = assigned['cluster_id'].map(families)
+        return assigned.dropna(subset=['family_cluster']).drop_duplicates(['protein_id', 'family_cluster'])
+    
     def analyze_cluster_statistics(self) -> Dict:
         """分析聚类统计信息"""
         logger.info("分析聚类统计信息...")
@@ -247,6 +346,19 @@ class ClusterAnalyzer:
         """分析聚类层次结构"""
         logger.info("分析聚类层次结构...")
         
+        closure = self.load_cluster_closure()
+        if not closure.empty:
+            # 由闭包索引直接统计：叶节点的子树只有自身（tout == tin）
+            hierarchy_stats = {
+                'total_nodes': len(closure),
+                'total_edges': int((closure['parent_idx'] >= 0).sum()),
+                'max_depth': int(closure['depth'].max()),
+                'num_roots': int((closure['depth'] == 0).sum()),
+                'num_leaves': int((closure['tout'] == closure['tin']).sum())
+            }
+            self._log_hierarchy_stats(hierarchy_stats)
+            return hierarchy_stats
+        
         cluster_tree = self.load_cluster_tree()
         
         if cluster_tree.empty:
@@ -287,22 +399,31 @@ class ClusterAnalyzer:
                     continue
             hierarchy_stats['max_depth'] = max_depth
         
+        self._log_hierarchy_stats(hierarchy_stats)
+        return hierarchy_stats
+    
+    def _log_hierarchy_stats(self, hierarchy_stats: Dict):
         logger.info("聚类层次结构分析结果:")
         logger.info(f"  节点数: {hierarchy_stats['total_nodes']:,}")
         logger.info(f"  边数: {hierarchy_stats['total_edges']:,}")
         logger.info(f"  根节点数: {hierarchy_stats['num_roots']:,}")
         logger.info(f"  叶节点数: {hierarchy_stats['num_leaves']:,}")
         logger.info(f"  最大深度: {hierarchy_stats['max_depth']}")
-        
-        return hierarchy_stats
     
     def get_hierarchical_expert_groups(self, target_depth: int = 2) -> Dict[str, List[str]]:
         """基于层次结构创建专家分组"""
         logger.info(f"基于层次结构创建专家分组，目标深度: {target_depth}")
         
-        cluster_tree = self.load_cluster_tree()
+        closure = self.load_cluster_closure()
         protein_clusters = self.load_protein_clusters()
         
+        if not closure.empty and not protein_clusters.empty:
+            # 闭包索引中深度为target_depth的聚类即为专家聚类
+            expert_clusters = set(closure.loc[closure['depth'] == target_depth, 'cluster_id'])
+            return self._collect_hierarchical_groups(expert_clusters, protein_clusters)
+        
+        cluster_tree = self.load_cluster_tree()
+        
         if cluster_tree.empty or protein_clusters.empty:
             logger.warning("缺少层次数据，使用平铺聚类方案")
             return self.get_moe_expert_groups()
@@ -327,15 +448,16 @@ class ClusterAnalyzer:
             except:
                 continue
         
-        # 为每个专家聚类获取蛋白质列表
-        expert_groups = {}
-        for cluster_id in expert_clusters:
-            proteins = protein_clusters[
-                protein_clusters['cluster_id'] == cluster_id
-            ]['protein_id'].tolist()
-            
-            if proteins:  # 只保留非空的专家组
-                expert_groups[f"expert_hierarchical_{cluster_id}"] = proteins
+        return self._collect_hierarchical_groups(expert_clusters, protein_clusters)
+    
+    def _collect_hierarchical_groups(self, expert_clusters: Set[str],
+                                     protein_clusters: pd.DataFrame) -> Dict[str, List[str]]:
+        """按专家聚类分组蛋白质（一次groupby，只保留非空的专家组）"""
+        members = protein_clusters[protein_clusters['cluster_id'].isin(expert_clusters)]
+        expert_groups = {
+            f"expert_hierarchical_{cluster_id}": proteins.tolist()
+            for cluster_id, proteins in members.groupby('cluster_id', sort=False)['protein_id']
+        }
         
         logger.info(f"基于层次结构创建了 {len(expert_groups)} 个专家组")
         
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+多关键词匹配器
+用所有关键词构建一个Aho–Corasick自动机，对一批文本按字符位置同时推进状态（NumPy向量化），
+每条文本只扫描一次，得到每条文本 × 每个关键词的命中矩阵；扫描代价与关键词数量无关
+"""
+
+from collections import deque
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 每批同时扫描的文本数和字符数上限（按长度排序后分批，减少补齐的字符）
+SCAN_BATCH_ROWS = 65536
+SCAN_BATCH_CHARS = 16 * 1024 * 1024
+
+
+class KeywordMatcher:
+    """
+    多关键词子串匹配器，结果与对每个关键词逐一做 `keyword.lower() in text.lower()` 相同
+
+    Example:
+        matcher = KeywordMatcher({'low': ['putative', 'fragment'], 'high': ['kinase']})
+        hits = matcher.match(protein_df['annotation'])    # (蛋白质数, 3) 的bool矩阵
+        low_counts = hits[:, matcher.columns('low')].sum(axis=1)
+    """
+
+    def __init__(self, keyword_classes: Dict[str, Sequence[str]], ignore_case: bool = True):
+        """
+        Args:
+            keyword_classes: 关键词类别 -> 关键词列表；命中矩阵的列按类别和列表顺序排列
+            ignore_case: 匹配前将文本和关键词转为小写（Python str.lower语义）
+        """
+        self.ignore_case = ignore_case
+        self.keywords: List[str] = []
+        self._class_columns: Dict[str, slice] = {}
+        for name, keywords in keyword_classes.items():
+            start = len(self.keywords)
+            self.keywords.extend(keyword.lower() if ignore_case else keyword for keyword in keywords)
+            self._class_columns[name] = slice(start, len(self.keywords))
+
+        # 字母表：关键词中出现的字符编号为 1..A，其他字符为0；按码位查表得到字符编号
+        alphabet = sorted({ord(char) for keyword in self.keywords for char in keyword})
+        self._symbols = {code_point: symbol for symbol, code_point in enumerate(alphabet, start=1)}
+        symbol_dtype = np.uint8 if len(alphabet) < 256 else np.int32
+        self._symbol_table = np.zeros((alphabet[-1] if alphabet else 0) + 2, dtype=symbol_dtype)
+        self._symbol_table[alphabet] = np.arange(1, len(alphabet) + 1)
+        self._build_automaton()
+
+    def _build_automaton(self):
+        """构建完整的状态转移表（已并入失败转移）和每个状态的输出位掩码"""
+        num_symbols = len(self._symbols) + 1
+        children: List[Dict[int, int]] = [{}]
+        terminal: List[List[int]] = [[]]
+        for column, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue
+            state = 0
+            for symbol in (self._symbols[ord(char)] for char in keyword):
+                if symbol not in children[state]:
+                    children.append({})
+                    terminal.append([])
+                    children[state][symbol] = len(children) - 1
+                state = children[state][symbol]
+            terminal[state].append(column)
+
+        num_states = len(children)
+        num_words = max(1, (len(self.keywords) + 63) // 64)
+        goto = np.zeros((num_states, num_symbols), dtype=np.int32)
+        output = np.zeros((num_states, num_words), dtype=np.uint64)
+        for state, columns in enumerate(terminal):
+            for column in columns:
+                output[state, column // 64] |= np.uint64(1) << np.uint64(column % 64)
+
+        # 按BFS顺序填充转移表：缺失的转移沿失败链取值，输出并入失败状态的输出
+        failure = np.zeros(num_states, dtype=np.int32)
+        queue = deque()
+        for symbol, child in children[0].items():
+            goto[0, symbol] = child
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            output[state] |= output[failure[state]]
+            goto[state] = goto[failure[state]]
+            for symbol, child in children[state].items():
+                goto[state, symbol] = child
+                failure[child] = goto[failure[state], symbol]
+                queue.append(child)
+
+        # 扫描时按 状态 * 符号数 + 符号 在展平的转移表中取下一状态
+        self._num_symbols = num_symbols
+        self._goto = goto.ravel()
+        self._output = output
+
+    def columns(self, name: str) -> slice:
+        """某个关键词类别在命中矩阵中的列"""
+        return self._class_columns[name]
+
+    def _scan(self, texts: List[str]) -> np.ndarray:
+        """扫描一批文本，返回每条文本的命中位掩码 (文本数, 字数)"""
+        codes = np.array(texts, dtype=str).view(np.uint32).reshape(len(texts), -1)
+        table = self._symbol_table
+        # 每行是一个字符位置上所有文本的符号（补齐的位置为0）
+        symbols = np.ascontiguousarray(table[np.minimum(codes, len(table) - 1)].T)
+
+        state = np.zeros(len(texts), dtype=np.int32)
+        found = np.zeros((len(texts), self._output.shape[1]), dtype=np.uint64)
+        for position_symbols in symbols:
+            state = self._goto.take(state * self._num_symbols + position_symbols)
+            found |= self._output[state]
+        return found
+
+    def match(self, texts: pd.Series) -> np.ndarray:
+        """
+        返回命中矩阵：hits[i, j] 表示第i条文本包含第j个关键词（缺失值不命中任何关键词）
+
+        文本按长度排序后分批，每批在自动机上逐字符位置同时推进所有文本的状态。
+        """
+        texts = pd.Series(texts, dtype=object)
+        # 非字符串的值长度为NaN
+        lengths = texts.str.len().to_numpy(dtype=np.float64)
+        valid = ~np.isnan(lengths)
+        text_values = texts[valid]
+        if self.ignore_case:
+            text_values = text_values.str.lower()
+
+        found = np.zeros((len(texts), self._output.shape[1]), dtype=np.uint64)
+        if self._symbols and len(text_values):
+            rows = np.flatnonzero(valid)
+            lengths = lengths[valid].astype(np.int64)
+            order = np.argsort(lengths, kind='stable')
+            values = text_values.to_numpy()
+            start = 0
+            while start < len(order):
+                end = min(start + SCAN_BATCH_ROWS, len(order))
+                while end - start > 1 and (end - start) * lengths[order[end - 1]] > SCAN_BATCH_CHARS:
+                    end = start + (end - start) // 2
+                batch = order[start:end]
+                found[rows[batch]] = self._scan(values[batch].tolist())
+                start = end
+
+        bits = np.unpackbits(found.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+        hits = bits[:, :len(self.keywords)].astype(bool)
+        # 空关键词是任何字符串的子串
+        hits[:, [column for column, keyword in enumerate(self.keywords) if not keyword]] = valid[:, None]
+        return hits
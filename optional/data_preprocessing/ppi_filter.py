@@ -8,29 +8,368 @@ import pandas as pd
 import numpy as np
 import sqlite3
 import gzip
+import json
+import tempfile
 from pathlib import Path
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
 from tqdm import tqdm
-import networkx as nx
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    # 作为脚本直接运行（python ppi_filter.py）时没有父包
+    from keyword_matcher import KeywordMatcher
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# protein.links.detailed文件的列：7个证据通道和综合分数都是0-1000的整数，用int16读取
+EVIDENCE_COLUMNS = [
+    'neighborhood', 'fusion', 'cooccurence', 'coexpression', 'experimental', 'database', 'textmining'
+]
+SCORE_COLUMNS = EVIDENCE_COLUMNS + ['combined_score']
+PPI_COLUMNS = ['protein1', 'protein2'] + SCORE_COLUMNS
+PPI_DTYPES = {'protein1': object, 'protein2': object, **{column: np.int16 for column in SCORE_COLUMNS}}
+# PPI文件每块解析的行数
+PPI_CHUNK_ROWS = 500000
+# 过滤阶段之后的边数据块：蛋白质ID替换为int32编码
+CODED_DTYPES = {'protein1': np.int32, 'protein2': np.int32, **{column: np.int16 for column in SCORE_COLUMNS}}
+
+# 连通性分析模式：memory 在内存中保存边表并用稀疏矩阵求分量，streaming 逐块读取边做并查集合并
+CONNECTIVITY_MODES = ('auto', 'memory', 'streaming')
+
+# save_filtered_data 的输出格式：parquet/feather 为带类型的列式压缩文件（需要pyarrow），csv 为文本格式
+OUTPUT_FORMATS = ('parquet', 'feather', 'csv')
+
+def _require_pyarrow():
+    """按需导入pyarrow（parquet/feather输出需要）"""
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("parquet/feather输出需要安装pyarrow: pip install pyarrow，或使用 output_format='csv'") from e
+    return pyarrow
+
+def canonicalize_edges(ppi_df: pd.DataFrame) -> pd.DataFrame:
+    """将边规范化为 protein1 < protein2 并去掉镜像重复（向量化，其余列保留首次出现的行）"""
+    protein1 = ppi_df['protein1'].to_numpy()
+    protein2 = ppi_df['protein2'].to_numpy()
+    swap = protein1 > protein2
+    
+    canonical = ppi_df.copy()
+    canonical['protein1'] = np.where(swap, protein2, protein1)
+    canonical['protein2'] = np.where(swap, protein1, protein2)
+    return canonical.drop_duplicates(['protein1', 'protein2']).reset_index(drop=True)
+
+def symmetrize_edges(ppi_df: pd.DataFrame) -> pd.DataFrame:
+    """由规范化的边恢复双向边：每条边追加一条交换两端的副本（其余列原样复制）"""
+    mirrored = ppi_df.rename(columns={'protein1': 'protein2', 'protein2': 'protein1'})[ppi_df.columns]
+    mirrored = mirrored[mirrored['protein1'] != mirrored['protein2']]  # 自环不重复
+    return pd.concat([ppi_df, mirrored], ignore_index=True)
+
+def _endpoint_codes(ppi_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+    """
+    将边的两端编码为 0..n-1 的整数节点编号，返回 (protein1编号, protein2编号, 节点蛋白质ID)
+    
+    节点按在边表中首次出现的顺序（protein1、protein2交替）编号，与逐边加入networkx图的节点顺序一致；
+    类别相同的Categorical列直接对类别编码做因子化，不再对字符串做哈希。
+    """
+    protein1, protein2 = ppi_df['protein1'], ppi_df['protein2']
+    categorical = (isinstance(protein1.dtype, pd.CategoricalDtype) and
+                   isinstance(protein2.dtype, pd.CategoricalDtype) and
+                   protein1.cat.categories.equals(protein2.cat.categories))
+    if categorical:
+        values1, values2 = protein1.cat.codes.to_numpy(), protein2.cat.codes.to_numpy()
+    else:
+        values1, values2 = protein1.to_numpy(dtype=object), protein2.to_numpy(dtype=object)
+    
+    interleaved = np.empty(2 * len(ppi_df), dtype=values1.dtype)
+    interleaved[0::2] = values1
+    interleaved[1::2] = values2
+    codes, uniques = pd.factorize(interleaved)
+    nodes = protein1.cat.categories.take(uniques) if categorical else pd.Index(uniques)
+    return codes[0::2], codes[1::2], nodes
+
+def _shared_categories(ppi_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    两端蛋白质转为类别相同的Categorical（类别为边中出现的蛋白质，已排序），证据通道和分数转为int16
+    
+    已是共享类别的Categorical时只在整数编码上去掉未用到的类别。
+    """
+    protein1, protein2 = ppi_df['protein1'], ppi_df['protein2']
+    if (isinstance(protein1.dtype, pd.CategoricalDtype) and isinstance(protein2.dtype, pd.CategoricalDtype)
+            and protein1.cat.categories.equals(protein2.cat.categories)):
+        categories = protein1.cat.categories
+        codes1, codes2 = protein1.cat.codes.to_numpy(), protein2.cat.codes.to_numpy()
+        if categories.is_monotonic_increasing:
+            used = np.zeros(len(categories) + 1, dtype=bool)
+            used[codes1] = True
+            used[codes2] = True
+            used = np.flatnonzero(used[:-1])
+            remap = np.full(len(categories) + 1, -1, dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            categories = categories.take(used)
+            codes1, codes2 = remap[codes1], remap[codes2]
+        else:
+            categories = None
+    else:
+        categories = None
+    
+    if categories is None:
+        categories = pd.Index(pd.unique(np.concatenate([
+            protein1.to_numpy(dtype=object), protein2.to_numpy(dtype=object)
+        ]))).sort_values()
+        codes1, codes2 = categories.get_indexer(protein1), categories.get_indexer(protein2)
+    
+    compact = ppi_df.assign(
+        protein1=pd.Categorical.from_codes(codes1, categories=categories),
+        protein2=pd.Categorical.from_codes(codes2, categories=categories),
+    )
+    scores = [column for column in SCORE_COLUMNS if column in compact.columns]
+    return compact.astype({column: np.int16 for column in scores}).reset_index(drop=True)
+
+def _output_paths(output_dir: Path, confidence_threshold: float, output_format: str) -> Dict[str, Path]:
+    """save_filtered_data 各输出文件的路径"""
+    return {
+        'proteins': output_dir / f"filtered_proteins_conf{confidence_threshold}.{output_format}",
+        'ppi': output_dir / f"filtered_ppi_conf{confidence_threshold}.{output_format}",
+        'components': output_dir / f"components_conf{confidence_threshold}.{output_format}",
+        'stats': output_dir / f"filtering_stats_conf{confidence_threshold}.json",
+    }
+
+def _write_table(df: pd.DataFrame, path: Path, output_format: str):
+    if output_format == 'parquet':
+        df.to_parquet(path, index=False, compression='zstd')
+    elif output_format == 'feather':
+        df.reset_index(drop=True).to_feather(path, compression='zstd')
+    else:
+        df.to_csv(path, index=False)
+
+def _read_table(path: Path, output_format: str, dtype: Optional[Dict] = None) -> pd.DataFrame:
+    if output_format == 'parquet':
+        return pd.read_parquet(path)
+    if output_format == 'feather':
+        return pd.read_feather(path)
+    return pd.read_csv(path, dtype=dtype)
+
+def load_filtered_data(output_dir, confidence_threshold: float) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """
+    读取 PPIDataFilter.save_filtered_data 的输出，按存在的文件自动识别格式
+    
+    Returns:
+        (蛋白质表, PPI表, 过滤统计)。PPI表两端为类别相同的Categorical、分数为int16；
+        统计中的 largest_component_proteins（pd.Index）和 component_labels（pd.Series）由分量文件恢复
+    """
+    output_dir = Path(output_dir)
+    for output_format in OUTPUT_FORMATS:
+        paths = _output_paths(output_dir, confidence_threshold, output_format)
+        if paths['ppi'].exists():
+            break
+    else:
+        raise FileNotFoundError(f"{output_dir} 中没有置信度阈值 {confidence_threshold} 的过滤结果")
+    
+    protein_df = _read_table(paths['proteins'], output_format)
+    ppi_df = _shared_categories(_read_table(
+        paths['ppi'], output_format, dtype={'protein1': object, 'protein2': object}
+    ))
+    
+    with open(paths['stats']) as f:
+        stats = json.load(f)
+    connectivity = stats.get('connectivity')
+    if connectivity is not None:
+        if 'largest_component_label' in connectivity:
+            components = _read_table(paths['components'], output_format)
+            component_labels = pd.Series(
+                components['component'].to_numpy(dtype=np.int32),
+                index=pd.Index(components['protein_id']), name='component'
+            )
+            connectivity['component_labels'] = component_labels
+            connectivity['largest_component_proteins'] = component_labels.index[
+                component_labels.to_numpy() == connectivity['largest_component_label']
+            ]
+        elif 'largest_component_proteins' in connectivity:
+            connectivity['largest_component_proteins'] = pd.Index(connectivity['largest_component_proteins'])
+    
+    return protein_df, ppi_df, stats
+
+class UnionFind:
+    """
+    基于NumPy数组的并查集（按大小合并、路径压缩），节点为 0..n-1 的整数，按批次合并边
+    
+    每一轮把所有跨分量的边同时合并：按 (分量大小, 根编号) 的全序把较小的根挂到较大的根下，
+    同一轮内不会形成环；同一个根有多个目标时保留最后一次写入，其余的边在下一轮继续合并。
+    """
+    
+    def __init__(self, num_nodes: int):
+        self.parent = np.arange(num_nodes, dtype=np.int64)
+        # 只用于选择合并方向，同一轮中链式合并时不精确
+        self.size = np.ones(num_nodes, dtype=np.int64)
+    
+    def find(self, nodes: np.ndarray) -> np.ndarray:
+        """各节点的根（沿父指针跳跃，并把这些节点直接指向根）"""
+        roots = self.parent[nodes]
+        while True:
+            next_roots = self.parent[roots]
+            if np.array_equal(next_roots, roots):
+                break
+            roots = next_roots
+        self.parent[nodes] = roots
+        return roots
+    
+    def union(self, a: np.ndarray, b: np.ndarray):
+        """合并一批边 (a[i], b[i])"""
+        while len(a):
+            root_a, root_b = self.find(a), self.find(b)
+            pending = root_a != root_b
+            a, b, root_a, root_b = a[pending], b[pending], root_a[pending], root_b[pending]
+            if not len(a):
+                break
+            size_a, size_b = self.size[root_a], self.size[root_b]
+            a_smaller = (size_a < size_b) | ((size_a == size_b) & (root_a < root_b))
+            child = np.where(a_smaller, root_a, root_b)
+            self.parent[child] = np.where(a_smaller, root_b, root_a)
+            child = np.unique(child)
+            np.add.at(self.size, self.parent[child], self.size[child])
+    
+    def roots(self) -> np.ndarray:
+        """所有节点的根（完全压缩父指针）"""
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        self.parent = parent
+        return parent
+
+class ConnectivityAccumulator:
+    """增量连通性统计：按块合并边（并查集），同时记录节点首次出现的位置和无向边数"""
+    
+    # 未出现在边中的节点的首次出现位置
+    UNSEEN = np.iinfo(np.int64).max
+    
+    def __init__(self, num_nodes: int):
+        self.union_find = UnionFind(num_nodes)
+        # 每个节点在边中首次出现的位置（protein1、protein2交替计数）
+        self.first_seen = np.full(num_nodes, self.UNSEEN, dtype=np.int64)
+        self.num_rows = 0
+        # 按STRING每条相互作用双向各列一次，只统计 protein1 <= protein2 的行
+        self.total_edges = 0
+    
+    def add(self, codes1: np.ndarray, codes2: np.ndarray):
+        """加入一块边"""
+        positions = 2 * (self.num_rows + np.arange(len(codes1), dtype=np.int64))
+        np.minimum.at(self.first_seen, codes1, positions)
+        np.minimum.at(self.first_seen, codes2, positions + 1)
+        self.union_find.union(codes1.astype(np.int64), codes2.astype(np.int64))
+        self.num_rows += len(codes1)
+        self.total_edges += int(np.count_nonzero(codes1 <= codes2))
+    
+    def components(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回 (出现在边中的节点, 分量标签)
+        
+        节点按首次出现顺序排列，分量按其首个节点的出现顺序编号，与逐边加入networkx图
+        或对边端点因子化后用csgraph得到的编号一致。
+        """
+        nodes = np.flatnonzero(self.first_seen < self.UNSEEN)
+        nodes = nodes[np.argsort(self.first_seen[nodes], kind='stable')]
+        roots = self.union_find.roots()[nodes]
+        _, first_index, labels = np.unique(roots, return_index=True, return_inverse=True)
+        order = np.argsort(first_index, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return nodes, rank[labels]
+
+class EdgeSpill:
+    """
+    过滤后的边的紧凑中间文件
+    
+    每列按块追加写入一个二进制文件（蛋白质编码int32、证据通道和分数int16，每条边24字节），
+    第二遍按原来的块读回；关闭时删除临时目录。
+    """
+    
+    def __init__(self, tmp_dir: Optional[str] = None):
+        self._tmp = tempfile.TemporaryDirectory(prefix='ppi_spill_', dir=tmp_dir)
+        self._paths = {column: Path(self._tmp.name) / f"{column}.bin" for column in PPI_COLUMNS}
+        self._files = {column: open(path, 'wb') for column, path in self._paths.items()}
+        self.chunk_rows: List[int] = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @property
+    def num_rows(self) -> int:
+        return sum(self.chunk_rows)
+    
+    def append(self, chunk: pd.DataFrame):
+        """追加一块已编码的边"""
+        for column, f in self._files.items():
+            chunk[column].to_numpy(dtype=CODED_DTYPES[column]).tofile(f)
+        self.chunk_rows.append(len(chunk))
+    
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """按写入时的块读回"""
+        for f in self._files.values():
+            f.close()
+        readers = {column: open(path, 'rb') for column, path in self._paths.items()}
+        try:
+            for rows in self.chunk_rows:
+                yield pd.DataFrame({
+                    column: np.fromfile(readers[column], dtype=CODED_DTYPES[column], count=rows)
+                    for column in PPI_COLUMNS
+                })
+        finally:
+            for f in readers.values():
+                f.close()
+    
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._tmp.cleanup()
+
 class PPIDataFilter:
     """PPI网络数据过滤器"""
     
-    def __init__(self, data_dir: str = "data", confidence_threshold: float = 0.7):
+    def __init__(self, data_dir: str = "data", confidence_threshold: float = 0.7,
+                 canonical_edges: bool = False, connectivity_mode: str = 'auto',
+                 max_in_memory_edges: int = 50_000_000, output_format: str = 'parquet'):
         """
         初始化PPI数据过滤器
         
         Args:
             data_dir: 数据目录路径
             confidence_threshold: 置信度阈值 (0-1)
+            canonical_edges: 每条无向相互作用只保留 protein1 < protein2 的一行（STRING中A-B与B-A
+                各列一次），需要双向边时用 symmetrize_edges 恢复
+            connectivity_mode: run_complete_filtering 的连通性分析模式，"memory"（边表读入内存）、
+                "streaming"（逐块读取边做并查集合并，只在内存中保存最大连通分量的边）或
+                "auto"（估计的边数超过 max_in_memory_edges 时使用 streaming）
+            max_in_memory_edges: auto 模式下内存模式允许的最大边数
+            output_format: save_filtered_data 的输出格式，"parquet"、"feather"（列式压缩，
+                蛋白质ID为Categorical、分数为int16，需要pyarrow）或 "csv"
         """
+        if connectivity_mode not in CONNECTIVITY_MODES:
+            raise ValueError(f"不支持的连通性分析模式: {connectivity_mode}")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        if output_format != 'csv':
+            # 在过滤开始前检查，避免整个流程跑完后才在写出时失败
+            _require_pyarrow()
+        
         self.data_dir = Path(data_dir)
         self.confidence_threshold = confidence_threshold
+        self.canonical_edges = canonical_edges
+        self.connectivity_mode = connectivity_mode
+        self.max_in_memory_edges = max_in_memory_edges
+        self.output_format = output_format
+        self.ppi_chunk_rows = PPI_CHUNK_ROWS    # PPI文件每块解析的行数
         self.db_path = self.data_dir / "string_data.db"
         
         # 文件路径
@@ -106,9 +445,12 @@ class PPIDataFilter:
         # 创建质量评分
         length_filtered['quality_score'] = 1.0
         
-        for keyword in quality_keywords:
-            mask = length_filtered['annotation'].str.contains(keyword, case=False, na=False)
-            length_filtered.loc[mask, 'quality_score'] -= 0.2
+        # 所有关键词对每条注释只扫描一次（不区分大小写），每命中一个关键词扣0.2
+        hits = KeywordMatcher({'low_quality': quality_keywords}).match(length_filtered['annotation'])
+        scores = length_filtered['quality_score'].to_numpy()
+        for column in hits.T:
+            scores = scores - 0.2 * column
+        length_filtered['quality_score'] = scores
         
         # 保留质量评分 >= 0.4 的蛋白质
         final_filtered = length_filtered[length_filtered['quality_score'] >= 0.4].copy()
@@ -129,107 +471,159 @@ class PPIDataFilter:
         
         return final_filtered
     
-    def load_and_filter_ppi_data(self, valid_proteins: set) -> pd.DataFrame:
-        """加载并过滤PPI数据"""
-        logger.info(f"加载PPI数据，置信度阈值: {self.confidence_threshold}")
+    def _intern_proteins(self, valid_proteins) -> Tuple[pd.Index, np.ndarray]:
+        """
+        有效蛋白质按ID排序后编号，返回 (蛋白质索引, 成员掩码)
         
-        ppi_data = []
-        chunk_size = 50000
+        整数编码的大小顺序与ID字符串顺序一致；get_indexer对不在表中的ID返回-1，
+        成员掩码末尾多一个False，-1正好索引到它。
+        """
+        protein_index = pd.Index(sorted(valid_proteins))
+        valid_mask = np.ones(len(protein_index) + 1, dtype=bool)
+        valid_mask[-1] = False
+        return protein_index, valid_mask
+    
+    def _edge_stages(self, protein_index: pd.Index,
+                     valid_mask: np.ndarray) -> List[Callable[[pd.DataFrame], pd.DataFrame]]:
+        """
+        边过滤阶段链，每个阶段接收一个数据块并返回过滤或转换后的数据块：
+        置信度过滤 → 蛋白质ID编码为整数 → 蛋白质质量过滤（整数成员掩码，规范化模式同时去掉镜像副本）
+        """
         threshold_score = int(self.confidence_threshold * 1000)  # STRING分数是0-1000
+        canonical = self.canonical_edges
         
-        with gzip.open(self.ppi_detailed_file, 'rt') as f:
-            # 读取头部
-            header = f.readline().strip().split()
-            logger.info(f"PPI数据列: {header}")
-            
-            chunk = []
-            total_lines = 0
-            filtered_lines = 0
-            
-            for line in tqdm(f, desc="处理PPI数据"):
-                parts = line.strip().split()
-                if len(parts) >= 10:
-                    total_lines += 1
-                    
-                    protein1 = parts[0]
-                    protein2 = parts[1]
-                    combined_score = int(parts[9])
-                    
-                    # 置信度过滤
-                    if combined_score >= threshold_score:
-                        # 蛋白质质量过滤
-                        if protein1 in valid_proteins and protein2 in valid_proteins:
-                            filtered_lines += 1
-                            
-                            chunk.append({
-                                'protein1': protein1,
-                                'protein2': protein2,
-                                'neighborhood': int(parts[2]),
-                                'fusion': int(parts[3]),
-                                'cooccurence': int(parts[4]),
-                                'coexpression': int(parts[5]),
-                                'experimental': int(parts[6]),
-                                'database': int(parts[7]),
-                                'textmining': int(parts[8]),
-                                'combined_score': combined_score
-                            })
-                            
-                            if len(chunk) >= chunk_size:
-                                ppi_data.extend(chunk)
-                                chunk = []
-            
-            # 处理剩余数据
-            if chunk:
-                ppi_data.extend(chunk)
+        def confidence_filter(chunk: pd.DataFrame) -> pd.DataFrame:
+            return chunk[chunk['combined_score'].to_numpy() >= threshold_score]
         
-        df = pd.DataFrame(ppi_data)
+        def encode_proteins(chunk: pd.DataFrame) -> pd.DataFrame:
+            return chunk.assign(
+                protein1=protein_index.get_indexer(chunk['protein1']).astype(np.int32),
+                protein2=protein_index.get_indexer(chunk['protein2']).astype(np.int32),
+            )
         
-        # 统计信息
+        def protein_filter(chunk: pd.DataFrame) -> pd.DataFrame:
+            codes1, codes2 = chunk['protein1'].to_numpy(), chunk['protein2'].to_numpy()
+            keep = valid_mask[codes1] & valid_mask[codes2]
+            if canonical:
+                keep &= codes1 <= codes2  # 去掉镜像副本
+            return chunk[keep]
+        
+        return [confidence_filter, encode_proteins, protein_filter]
+    
+    def _iter_ppi_chunks(self, protein_index: pd.Index,
+                         valid_mask: np.ndarray) -> Iterator[Tuple[int, pd.DataFrame]]:
+        """
+        按块向量化解析PPI数据（证据通道和分数为int16）并依次经过过滤阶段链，
+        产出 (该块原始行数, 过滤后的数据块)，数据块中的蛋白质ID为int32编码
+        """
+        stages = self._edge_stages(protein_index, valid_mask)
+        reader = pd.read_csv(self.ppi_detailed_file, sep=' ', usecols=PPI_COLUMNS,
+                             dtype=PPI_DTYPES, chunksize=self.ppi_chunk_rows)
+        
+        for chunk in tqdm(reader, desc="处理PPI数据", unit="块"):
+            raw_lines = len(chunk)
+            for stage in stages:
+                chunk = stage(chunk)
+            yield raw_lines, chunk
+    
+    def _edges_from_chunks(self, chunks: Iterable[pd.DataFrame], protein_index: pd.Index) -> pd.DataFrame:
+        """合并已编码的数据块，蛋白质编码转为以蛋白质索引为类别的Categorical"""
+        chunks = list(chunks)
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in CODED_DTYPES.items()})
+        for column in ('protein1', 'protein2'):
+            df[column] = pd.Categorical.from_codes(df[column].to_numpy(), categories=protein_index)
+        return df
+    
+    def _record_ppi_stats(self, total_lines: int, filtered_lines: int):
+        """记录PPI过滤统计"""
         self.stats['ppi_filtering'] = {
+            'edge_mode': 'canonical' if self.canonical_edges else 'symmetric',
             'total_interactions_raw': total_lines,
             'after_confidence_filter': filtered_lines,
-            'after_protein_filter': len(df),
+            'after_protein_filter': filtered_lines,
             'confidence_retention_rate': filtered_lines / total_lines if total_lines > 0 else 0,
-            'final_retention_rate': len(df) / total_lines if total_lines > 0 else 0
+            'final_retention_rate': filtered_lines / total_lines if total_lines > 0 else 0
         }
         
         logger.info(f"PPI数据过滤结果:")
         logger.info(f"  原始相互作用: {total_lines:,}")
         logger.info(f"  置信度过滤后: {filtered_lines:,}")
-        logger.info(f"  最终保留: {len(df):,}")
-        logger.info(f"  最终保留率: {len(df)/total_lines:.1%}")
+        logger.info(f"  最终保留: {filtered_lines:,}")
+        logger.info(f"  最终保留率: {filtered_lines/total_lines:.1%}")
+    
+    def load_and_filter_ppi_data(self, valid_proteins: set) -> pd.DataFrame:
+        """
+        加载并过滤PPI数据
+        
+        蛋白质ID列为以有效蛋白质为类别的Categorical，两列类别相同，可以直接比较和合并。
+        """
+        logger.info(f"加载PPI数据，置信度阈值: {self.confidence_threshold}")
+        
+        with gzip.open(self.ppi_detailed_file, 'rt') as f:
+            header = f.readline().strip().split()
+        logger.info(f"PPI数据列: {header}")
+        
+        protein_index, valid_mask = self._intern_proteins(valid_proteins)
+        chunks = []
+        total_lines = 0
+        for raw_lines, chunk in self._iter_ppi_chunks(protein_index, valid_mask):
+            total_lines += raw_lines
+            chunks.append(chunk)
+        df = self._edges_from_chunks(chunks, protein_index)
+        self._record_ppi_stats(total_lines, len(df))
         
         return df
     
     def analyze_graph_connectivity(self, ppi_df: pd.DataFrame) -> Dict:
-        """分析图的连通性"""
+        """
+        分析图的连通性
+        
+        端点编码为整数后构建稀疏邻接矩阵，由scipy.sparse.csgraph一次求出所有节点的连通分量标签；
+        最大连通分量以蛋白质ID索引（pd.Index）返回，component_labels为每个蛋白质的分量标签。
+        """
         logger.info("分析图连通性...")
         
-        # 构建图
-        G = nx.Graph()
+        codes1, codes2, nodes = _endpoint_codes(ppi_df)
+        num_nodes = len(nodes)
         
-        # 添加边
-        edges = [(row['protein1'], row['protein2']) for _, row in ppi_df.iterrows()]
-        G.add_edges_from(edges)
+        # 构建稀疏邻接矩阵（有向存储，按弱连通求分量即为无向图的连通分量）
+        adjacency = coo_matrix(
+            (np.ones(len(codes1), dtype=np.int8), (codes1, codes2)), shape=(num_nodes, num_nodes)
+        )
+        _, labels = connected_components(adjacency, directed=True, connection='weak')
         
-        # 分析连通分量
-        connected_components = list(nx.connected_components(G))
-        component_sizes = [len(comp) for comp in connected_components]
+        # 无向边数：A-B与B-A、重复行只计一次（与networkx简单图一致）
+        low, high = np.minimum(codes1, codes2), np.maximum(codes1, codes2)
+        edge_keys = np.sort(low.astype(np.int64) * num_nodes + high)
+        total_edges = int(len(edge_keys) > 0) + int(np.count_nonzero(edge_keys[1:] != edge_keys[:-1]))
         
-        # 获取最大连通分量
-        largest_component = max(connected_components, key=len)
+        return self._connectivity_stats(nodes, labels, total_edges)
+    
+    def _connectivity_stats(self, nodes: pd.Index, labels: np.ndarray, total_edges: int) -> Dict:
+        """
+        由节点的分量标签汇总连通性统计
+        
+        分量标签按首个节点的出现顺序编号，argmax取到的是首次出现的最大分量（与networkx一致）。
+        """
+        component_sizes = np.bincount(labels)
+        largest_label = int(component_sizes.argmax())
+        largest_component = nodes[labels == largest_label]
         
         connectivity_stats = {
-            'total_nodes': G.number_of_nodes(),
-            'total_edges': G.number_of_edges(),
-            'num_components': len(connected_components),
+            'total_nodes': len(nodes),
+            'total_edges': total_edges,
+            'num_components': len(component_sizes),
             'largest_component_size': len(largest_component),
             'largest_component_proteins': largest_component,
+            'component_labels': pd.Series(labels.astype(np.int32), index=nodes, name='component'),
             'component_size_distribution': {
                 'mean': np.mean(component_sizes),
                 'std': np.std(component_sizes),
-                'min': min(component_sizes),
-                'max': max(component_sizes),
+                'min': int(component_sizes.min()),
+                'max': int(component_sizes.max()),
                 'percentiles': np.percentile(component_sizes, [25, 50, 75, 90, 95, 99])
             }
         }
@@ -244,14 +638,26 @@ class PPIDataFilter:
         self.stats['connectivity'] = connectivity_stats
         return connectivity_stats
     
-    def filter_to_largest_component(self, ppi_df: pd.DataFrame, largest_component: set) -> pd.DataFrame:
-        """过滤到最大连通分量"""
+    def filter_to_largest_component(self, ppi_df: pd.DataFrame, largest_component) -> pd.DataFrame:
+        """
+        过滤到最大连通分量
+        
+        largest_component为蛋白质ID集合（set或pd.Index）；蛋白质ID列为Categorical时，
+        先对类别求成员掩码，再按类别编码索引得到每条边的布尔掩码。
+        """
         logger.info("过滤到最大连通分量...")
         
-        filtered_df = ppi_df[
-            ppi_df['protein1'].isin(largest_component) & 
-            ppi_df['protein2'].isin(largest_component)
-        ].copy()
+        members = pd.Index(largest_component).unique()
+        mask = np.ones(len(ppi_df), dtype=bool)
+        for column in ('protein1', 'protein2'):
+            values = ppi_df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # 编码-1（缺失值）索引到末尾的False
+                category_mask = np.append(members.get_indexer(values.cat.categories) >= 0, False)
+                mask &= category_mask[values.cat.codes.to_numpy()]
+            else:
+                mask &= values.isin(members).to_numpy()
+        filtered_df = ppi_df[mask].copy()
         
         logger.info(f"连通分量过滤结果:")
         logger.info(f"  过滤前相互作用: {len(ppi_df):,}")
@@ -260,41 +666,154 @@ class PPIDataFilter:
         
         return filtered_df
     
+    def estimate_edge_count(self, sample_bytes: int = 8 * 1024 * 1024) -> int:
+        """
+        估计通过置信度阈值的边数（不考虑蛋白质过滤，偏大）
+        
+        读取文件开头的一段解压数据，按样本行数与对应的压缩字节数外推总行数，乘以样本中
+        达到阈值的比例；规范化模式只保留一半。
+        """
+        threshold_score = int(self.confidence_threshold * 1000)
+        file_size = self.ppi_detailed_file.stat().st_size
+        
+        with open(self.ppi_detailed_file, 'rb') as raw:
+            with gzip.GzipFile(fileobj=raw) as f:
+                f.readline()  # 表头
+                sample = f.read(sample_bytes)
+                compressed_read = raw.tell()
+        
+        lines = sample.split(b'\n')
+        if len(lines) > 1:
+            lines = lines[:-1]  # 最后一行可能不完整（样本恰好读完整个文件时末尾为空行）
+        scores = np.array([int(line.rsplit(None, 1)[-1]) for line in lines if line.strip()])
+        if len(scores) == 0:
+            return 0
+        
+        estimated_lines = len(scores) * max(file_size / max(compressed_read, 1), 1.0)
+        estimated_edges = estimated_lines * np.mean(scores >= threshold_score)
+        if self.canonical_edges:
+            estimated_edges /= 2
+        return int(estimated_edges)
+    
+    def select_connectivity_mode(self) -> str:
+        """确定连通性分析模式（auto 模式按估计的边数选择）"""
+        if self.connectivity_mode != 'auto':
+            return self.connectivity_mode
+        estimated_edges = self.estimate_edge_count()
+        mode = 'streaming' if estimated_edges > self.max_in_memory_edges else 'memory'
+        logger.info(f"估计边数 {estimated_edges:,}，使用 {mode} 连通性分析模式")
+        return mode
+    
+    def analyze_graph_connectivity_streaming(self, valid_proteins: set,
+                                             spill: Optional[EdgeSpill] = None) -> Dict:
+        """
+        流式分析图的连通性
+        
+        逐块读取过滤后的边，用并查集合并，不在内存中保存边表；同时记录PPI过滤统计。
+        分量标签与 analyze_graph_connectivity 的结果一致。传入spill时，通过过滤的边同时写入
+        紧凑中间文件，第二遍不必重新解析原始文件。
+        """
+        logger.info(f"流式分析图连通性，置信度阈值: {self.confidence_threshold}")
+        
+        protein_index, valid_mask = self._intern_proteins(valid_proteins)
+        accumulator = ConnectivityAccumulator(len(protein_index))
+        
+        total_lines = 0
+        for raw_lines, chunk in self._iter_ppi_chunks(protein_index, valid_mask):
+            total_lines += raw_lines
+            accumulator.add(chunk['protein1'].to_numpy(), chunk['protein2'].to_numpy())
+            if spill is not None:
+                spill.append(chunk)
+        self._record_ppi_stats(total_lines, accumulator.num_rows)
+        
+        nodes, labels = accumulator.components()
+        return self._connectivity_stats(protein_index.take(nodes), labels, accumulator.total_edges)
+    
+    def load_largest_component_edges(self, valid_proteins: set, largest_component,
+                                     spill: Optional[EdgeSpill] = None) -> pd.DataFrame:
+        """
+        第二遍读取PPI数据，只保留两端都在最大连通分量中的边（用于流式模式）
+        
+        传入spill时读取第一遍写出的紧凑中间文件，否则重新解析原始文件。
+        """
+        logger.info("读取最大连通分量的边...")
+        
+        protein_index, _ = self._intern_proteins(valid_proteins)
+        component_mask = np.append(pd.Index(largest_component).unique().get_indexer(protein_index) >= 0, False)
+        
+        if spill is not None:
+            chunks = (
+                chunk[component_mask[chunk['protein1'].to_numpy()] & component_mask[chunk['protein2'].to_numpy()]]
+                for chunk in spill.iter_chunks()
+            )
+        else:
+            chunks = (chunk for _, chunk in self._iter_ppi_chunks(protein_index, component_mask))
+        filtered_df = self._edges_from_chunks(chunks, protein_index)
+        
+        logger.info(f"连通分量过滤结果:")
+        logger.info(f"  过滤前相互作用: {self.stats['ppi_filtering']['after_protein_filter']:,}")
+        logger.info(f"  过滤后相互作用: {len(filtered_df):,}")
+        
+        return filtered_df
+    
+    def _output_dir(self, output_dir: Optional[str]) -> Path:
+        if output_dir is None:
+            return self.data_dir / "filtered"
+        return Path(output_dir)
+    
     def save_filtered_data(self, protein_df: pd.DataFrame, ppi_df: pd.DataFrame, 
                           output_dir: Optional[str] = None) -> Dict[str, Path]:
-        """保存过滤后的数据"""
-        if output_dir is None:
-            output_dir = self.data_dir / "filtered"
-        else:
-            output_dir = Path(output_dir)
+        """
+        保存过滤后的数据
         
+        parquet/feather格式下PPI表两端保存为字典编码的蛋白质ID、分数为int16（zstd压缩），
+        连通分量保存为 (protein_id, component) 分量文件，统计JSON只记录最大分量的标签；
+        csv格式与此前的输出相同，最大分量的蛋白质列表写在统计JSON中。用 load_filtered_data 读回。
+        """
+        output_dir = self._output_dir(output_dir)
         output_dir.mkdir(exist_ok=True)
         
+        output_format = self.output_format
+        columnar = output_format != 'csv'
+        if columnar:
+            _require_pyarrow()
+        paths = _output_paths(output_dir, self.confidence_threshold, output_format)
+        
         # 保存文件路径
         output_files = {}
         
         # 保存蛋白质信息
-        protein_file = output_dir / f"filtered_proteins_conf{self.confidence_threshold}.csv"
-        protein_df.to_csv(protein_file, index=False)
-        output_files['proteins'] = protein_file
+        _write_table(protein_df, paths['proteins'], output_format)
+        output_files['proteins'] = paths['proteins']
         
         # 保存PPI数据
-        ppi_file = output_dir / f"filtered_ppi_conf{self.confidence_threshold}.csv"
-        ppi_df.to_csv(ppi_file, index=False)
-        output_files['ppi'] = ppi_file
+        _write_table(_shared_categories(ppi_df) if columnar else ppi_df, paths['ppi'], output_format)
+        output_files['ppi'] = paths['ppi']
+        
+        # 转换连通性统计用于JSON序列化（不修改self.stats）
+        stats_copy = self.stats.copy()
+        if 'connectivity' in stats_copy:
+            connectivity = dict(stats_copy['connectivity'])
+            component_labels = connectivity.pop('component_labels', None)
+            largest_component = connectivity.pop('largest_component_proteins', None)
+            if columnar and component_labels is not None:
+                # 每个蛋白质的分量标签写入分量文件，代替JSON中的蛋白质列表
+                components = pd.DataFrame({
+                    'protein_id': component_labels.index.to_numpy(dtype=object),
+                    'component': component_labels.to_numpy(dtype=np.int32),
+                })
+                _write_table(components, paths['components'], output_format)
+                output_files['components'] = paths['components']
+                if len(largest_component):
+                    connectivity['largest_component_label'] = int(component_labels[largest_component[0]])
+            elif largest_component is not None:
+                connectivity['largest_component_proteins'] = list(largest_component)
+            stats_copy['connectivity'] = connectivity
         
         # 保存统计信息
-        stats_file = output_dir / f"filtering_stats_conf{self.confidence_threshold}.json"
-        import json
-        with open(stats_file, 'w') as f:
-            # 转换set为list用于JSON序列化
-            stats_copy = self.stats.copy()
-            if 'connectivity' in stats_copy and 'largest_component_proteins' in stats_copy['connectivity']:
-                stats_copy['connectivity']['largest_component_proteins'] = list(
-                    stats_copy['connectivity']['largest_component_proteins']
-                )
+        with open(paths['stats'], 'w') as f:
             json.dump(stats_copy, f, indent=2, default=str)
-        output_files['stats'] = stats_file
+        output_files['stats'] = paths['stats']
         
         logger.info(f"过滤后的数据已保存到:")
         for name, path in output_files.items():
@@ -302,6 +821,10 @@ class PPIDataFilter:
         
         return output_files
     
+    def load_filtered_data(self, output_dir: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+        """读取 save_filtered_data 保存的当前置信度阈值的结果（见模块函数 load_filtered_data）"""
+        return load_filtered_data(self._output_dir(output_dir), self.confidence_threshold)
+    
     def run_complete_filtering(self) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
         """运行完整的数据过滤流程"""
         logger.info(f"开始完整的数据过滤流程，置信度阈值: {self.confidence_threshold}")
@@ -313,17 +836,29 @@ class PPIDataFilter:
         filtered_proteins = self.filter_proteins_by_quality(protein_df)
         valid_protein_set = set(filtered_proteins['protein_id'])
         
-        # 3. 加载并过滤PPI数据
-        filtered_ppi = self.load_and_filter_ppi_data(valid_protein_set)
-        
-        # 4. 分析图连通性
-        connectivity_stats = self.analyze_graph_connectivity(filtered_ppi)
-        
-        # 5. 过滤到最大连通分量
-        final_ppi = self.filter_to_largest_component(
-            filtered_ppi, 
-            connectivity_stats['largest_component_proteins']
-        )
+        if self.select_connectivity_mode() == 'streaming':
+            with EdgeSpill(tmp_dir=self.data_dir) as spill:
+                # 3-4. 单遍读取原始文件：过滤、增量合并连通分量，保留的边写入紧凑中间文件
+                connectivity_stats = self.analyze_graph_connectivity_streaming(valid_protein_set, spill)
+                
+                # 5. 从中间文件读取最大连通分量的边
+                final_ppi = self.load_largest_component_edges(
+                    valid_protein_set,
+                    connectivity_stats['largest_component_proteins'],
+                    spill
+                )
+        else:
+            # 3. 加载并过滤PPI数据
+            filtered_ppi = self.load_and_filter_ppi_data(valid_protein_set)
+            
+            # 4. 分析图连通性
+            connectivity_stats = self.analyze_graph_connectivity(filtered_ppi)
+            
+            # 5. 过滤到最大连通分量
+            final_ppi = self.filter_to_largest_component(
+                filtered_ppi, 
+                connectivity_stats['largest_component_proteins']
+            )
         
         # 6. 更新蛋白质列表(只保留在最大连通分量中的)
         proteins_in_graph = set(final_ppi['protein1']).union(set(final_ppi['protein2']))
@@ -353,13 +888,25 @@ def main():
     parser.add_argument('--data-dir', default='data', help='数据目录路径')
     parser.add_argument('--confidence', type=float, default=0.7, help='置信度阈值(0-1)')
     parser.add_argument('--output-dir', help='输出目录路径')
+    parser.add_argument('--canonical-edges', action='store_true',
+                        help='每条无向相互作用只保留一行（protein1 < protein2）')
+    parser.add_argument('--connectivity-mode', choices=CONNECTIVITY_MODES, default='auto',
+                        help='连通性分析模式（streaming 逐块读取边做并查集合并，适合内存放不下的图）')
+    parser.add_argument('--max-in-memory-edges', type=int, default=50_000_000,
+                        help='auto 模式下内存模式允许的最大边数')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='parquet',
+                        help='输出格式（parquet/feather需要pyarrow）')
     
     args = parser.parse_args()
     
     # 创建过滤器并运行
     filter_obj = PPIDataFilter(
         data_dir=args.data_dir,
-        confidence_threshold=args.confidence
+        confidence_threshold=args.confidence,
+        canonical_edges=args.canonical_edges,
+        connectivity_mode=args.connectivity_mode,
+        max_in_memory_edges=args.max_in_memory_edges,
+        output_format=args.output_format
     )
     
     proteins, ppi, output_files = filter_obj.run_complete_filtering()
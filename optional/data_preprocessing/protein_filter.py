@@ -7,18 +7,310 @@
 import pandas as pd
 import numpy as np
 import gzip
+import hashlib
+import heapq
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
 import logging
-from typing import Dict, List, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import re
 
+try:
+    from .keyword_matcher import KeywordMatcher
+except ImportError:
+    # 作为脚本直接运行或从本目录导入时没有父包
+    from keyword_matcher import KeywordMatcher
+
 logger = logging.getLogger(__name__)
 
+# 模式生物的物种分数，其他物种为 DEFAULT_SPECIES_SCORE
+MODEL_ORGANISM_SCORES = {
+    9606: 1.0,    # Homo sapiens
+    10090: 1.0,   # Mus musculus  
+    7227: 0.9,    # Drosophila melanogaster
+    6239: 0.9,    # Caenorhabditis elegans
+    3702: 0.9,    # Arabidopsis thaliana
+    4932: 0.9,    # Saccharomyces cerevisiae
+    511145: 0.8,  # Escherichia coli
+    83333: 0.8,   # Escherichia coli K-12
+}
+DEFAULT_SPECIES_SCORE = 0.6
+
+# 综合质量分数中各项分数的权重
+QUALITY_WEIGHTS = {
+    'length': 0.3,
+    'annotation': 0.4,
+    'name': 0.2,
+    'species': 0.1
+}
+
+# 蛋白质名称的模式（匹配小写后的名称）
+GENE_NAME_PATTERN = r'^[a-z]{2,5}\d*[a-z]*$'    # 有意义的基因名，如: acsA, hsp70, etc.
+GENERIC_ID_PATTERN = r'^[a-z]+\d+\.\d+$'        # 通用ID格式，如: ABC123.1
+
+# 质量分数列（calculate_quality_scores 的输出）
+SCORE_COLUMNS = ['species_id', 'length_score', 'annotation_score', 'name_score', 'species_score', 'quality_score']
+# 分片模式通过共享内存传给工作进程的字符串列
+STRING_COLUMNS = ['protein_id', 'protein_name', 'annotation']
+# 分片模式下每个工作进程分到的分片数（按物种贪心均衡各分片的蛋白质数）
+SHARDS_PER_WORKER = 4
+# 质量分数直方图的分箱数，分片合并后的分位数误差不超过 1/QUALITY_SKETCH_BINS
+QUALITY_SKETCH_BINS = 10000
+QUALITY_PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9, 0.95]
+# 注释/名称分数缓存每列最多保留的不同文本数（超出时保留累计出现次数最多的）
+SCORE_CACHE_MAX_ENTRIES = 1_000_000
+# 注释/名称打分规则的版本，修改 calculate_annotation_scores / calculate_name_scores 时递增，使旧缓存失效
+SCORE_CACHE_VERSION = 1
+
+def _as_text(values: pd.Series) -> pd.Series:
+    """转为object类型的字符串列，向量化字符串操作与逐个调用Python str方法的结果一致"""
+    return values.astype(object)
+
+def _blank(text: pd.Series) -> np.ndarray:
+    """缺失或只含空白字符"""
+    return (text.isna() | (text.str.strip() == '')).to_numpy(dtype=bool)
+
+class ScoreCache:
+    """
+    按文本缓存的注释/名称分数（有界，可持久化到文件）
+    
+    每列保存 文本 -> (分数, 累计出现次数)；超过 max_entries 时只保留累计出现次数最多的文本。
+    缓存绑定打分配置的指纹（关键词、名称模式和规则版本），指纹变化时清空。
+    """
+    
+    def __init__(self, path: Optional[str] = None, max_entries: int = SCORE_CACHE_MAX_ENTRIES):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.fingerprint = None
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.dirty = False
+        if self.path and self.path.exists():
+            with open(self.path, 'rb') as f:
+                saved = pickle.load(f)
+            self.fingerprint = saved['fingerprint']
+            self.tables = saved['tables']
+            logger.info(f"加载分数缓存: {self.path} "
+                        f"({', '.join(f'{name} {len(table):,}' for name, table in self.tables.items())})")
+    
+    def lookup(self, column: str, fingerprint: str, values: np.ndarray, counts: np.ndarray,
+               score_fn: Callable[[pd.Series], np.ndarray]) -> np.ndarray:
+        """
+        返回各个不同文本的分数：命中缓存的直接取值，其余用 score_fn 计算后加入缓存
+        
+        Args:
+            values: 不同的文本（object数组）
+            counts: 每个文本在本次数据中的出现次数
+        """
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.tables = {}
+        table = self.tables.get(column)
+        if table is None:
+            table = pd.DataFrame({'score': np.zeros(0), 'count': np.zeros(0, dtype=np.int64)},
+                                 index=pd.Index([], dtype=object))
+        
+        positions = table.index.get_indexer(pd.Index(values, dtype=object))
+        hit = positions >= 0
+        scores = np.empty(len(values))
+        scores[hit] = table['score'].to_numpy()[positions[hit]]
+        scores[~hit] = score_fn(pd.Series(values[~hit], dtype=object))
+        
+        table_counts = table['count'].to_numpy().copy()
+        np.add.at(table_counts, positions[hit], counts[hit])
+        table = pd.concat([
+            table.assign(count=table_counts),
+            pd.DataFrame({'score': scores[~hit], 'count': counts[~hit].astype(np.int64)},
+                         index=pd.Index(values[~hit], dtype=object)),
+        ])
+        if len(table) > self.max_entries:
+            keep = np.argpartition(-table['count'].to_numpy(), self.max_entries - 1)[:self.max_entries]
+            table = table.iloc[np.sort(keep)]
+        self.tables[column] = table
+        self.dirty = True
+        return scores
+    
+    def save(self):
+        """写入缓存文件（先写临时文件再替换）"""
+        if not self.path or not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'fingerprint': self.fingerprint, 'tables': self.tables}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+class QualitySketch:
+    """
+    可合并的质量分数分布摘要
+    
+    计数、均值和二阶中心矩（按Chan等的并行公式合并）、最小/最大值，以及[0, 1]上的定宽直方图
+    （用于分位数）；各分片分别计算后合并，不需要拼接所有分数。
+    """
+    
+    def __init__(self, bins: int = QUALITY_SKETCH_BINS):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.histogram = np.zeros(bins, dtype=np.int64)
+    
+    @classmethod
+    def from_values(cls, values: np.ndarray, bins: int = QUALITY_SKETCH_BINS) -> 'QualitySketch':
+        """由一组分数构建（忽略NaN）"""
+        sketch = cls(bins)
+        values = values[~np.isnan(values)]
+        if len(values):
+            sketch.count = len(values)
+            sketch.mean = float(values.mean())
+            sketch.m2 = float(((values - sketch.mean) ** 2).sum())
+            sketch.min = float(values.min())
+            sketch.max = float(values.max())
+            positions = np.clip((values * bins).astype(np.int64), 0, bins - 1)
+            sketch.histogram = np.bincount(positions, minlength=bins)
+        return sketch
+    
+    def merge(self, other: 'QualitySketch') -> 'QualitySketch':
+        """合并另一个摘要（原地修改并返回自身）"""
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.histogram += other.histogram
+        return self
+    
+    def quantile(self, q: float) -> float:
+        """近似分位数（与pandas相同的秩定义，在所在分箱内线性插值）"""
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        cumulative = np.cumsum(self.histogram)
+        position = int(np.searchsorted(cumulative, rank, side='right'))
+        in_bin = self.histogram[position]
+        fraction = (rank - (cumulative[position] - in_bin) + 0.5) / in_bin
+        value = (position + fraction) / len(self.histogram)
+        return float(min(max(value, self.min), self.max))
+    
+    def summary(self, percentiles: List[float] = None) -> Dict:
+        """与 filter_proteins 统计信息相同格式的分布摘要（std为样本标准差）"""
+        empty = self.count == 0
+        summary = {
+            'mean': np.nan if empty else self.mean,
+            'std': np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan,
+            'min': np.nan if empty else self.min,
+            'max': np.nan if empty else self.max,
+        }
+        if percentiles is not None:
+            summary['percentiles'] = {q: self.quantile(q) for q in percentiles}
+        return summary
+
+def _share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[List[SharedMemory], Dict]:
+    """把数组复制到共享内存，返回 (共享内存块, 供工作进程attach的描述)"""
+    blocks, spec = [], {}
+    try:
+        for name, array in arrays.items():
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            spec[name] = (block.name, array.dtype.str, array.shape)
+    except BaseException:
+        _release_blocks(blocks, unlink=True)
+        raise
+    return blocks, spec
+
+def _attach_arrays(spec: Dict) -> Tuple[List[SharedMemory], Dict[str, np.ndarray]]:
+    blocks, arrays = [], {}
+    for name, (block_name, dtype, shape) in spec.items():
+        block = SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+def _release_blocks(blocks: List[SharedMemory], unlink: bool = False):
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()
+
+def _encode_strings(values: pd.Series) -> Dict[str, np.ndarray]:
+    """字符串列编码为UTF-8字节、偏移量和缺失标记三个数组"""
+    text = _as_text(values)
+    encoded = text.str.encode('utf-8')
+    missing = encoded.isna().to_numpy(dtype=bool)
+    encoded = encoded.where(~missing, b'')
+    offsets = np.zeros(len(text) + 1, dtype=np.int64)
+    np.cumsum(encoded.str.len().to_numpy(dtype=np.int64), out=offsets[1:])
+    return {
+        'data': np.frombuffer(b''.join(encoded.tolist()), dtype=np.uint8),
+        'offsets': offsets,
+        'missing': missing,
+    }
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray, missing: np.ndarray,
+                    start: int, end: int) -> pd.Series:
+    """解码第 start..end 行的字符串（缺失值为None）"""
+    raw = data[offsets[start]:offsets[end]].tobytes()
+    bounds = offsets[start:end + 1] - offsets[start]
+    values = [raw[a:b].decode('utf-8') for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist())]
+    return pd.Series(values, dtype=object).where(~missing[start:end], None)
+
+def _score_shard(filter_obj: 'ProteinQualityFilter', column_spec: Dict, score_spec: Dict,
+                 start: int, end: int, quality_threshold: float) -> Tuple[QualitySketch, QualitySketch]:
+    """
+    工作进程：从共享内存读取第 start..end 行，计算质量分数写回共享内存的输出列
+    
+    Returns:
+        (全部分数的摘要, 通过阈值的分数的摘要)
+    """
+    column_blocks, columns = _attach_arrays(column_spec)
+    score_blocks, scores = _attach_arrays(score_spec)
+    try:
+        protein_df = pd.DataFrame({
+            name: _decode_strings(columns[f'{name}.data'], columns[f'{name}.offsets'],
+                                  columns[f'{name}.missing'], start, end)
+            for name in STRING_COLUMNS
+        })
+        protein_df['protein_size'] = columns['protein_size'][start:end]
+        
+        shard_scores = filter_obj.calculate_quality_scores(protein_df)
+        for column in SCORE_COLUMNS:
+            scores[column][start:end] = shard_scores[column].to_numpy()
+        
+        quality = shard_scores['quality_score'].to_numpy()
+        return QualitySketch.from_values(quality), QualitySketch.from_values(quality[quality >= quality_threshold])
+    finally:
+        _release_blocks(column_blocks)
+        _release_blocks(score_blocks)
+
 class ProteinQualityFilter:
     """蛋白质质量过滤器"""
     
-    def __init__(self):
-        """初始化过滤器"""
+    def __init__(self, dedup_scores: bool = True, score_cache_path: Optional[str] = None,
+                 score_cache_size: int = SCORE_CACHE_MAX_ENTRIES):
+        """
+        初始化过滤器
+        
+        Args:
+            dedup_scores: 注释和名称按不同文本只计算一次分数，再按编码广播回每个蛋白质
+            score_cache_path: 不同文本的分数缓存文件，在多次运行之间复用（None为只在本进程内缓存）
+            score_cache_size: 缓存每列最多保留的不同文本数
+        """
+        
+        self.dedup_scores = dedup_scores
+        self.score_cache = ScoreCache(score_cache_path, score_cache_size) if dedup_scores else None
+        # 注释关键词匹配器及其对应的关键词（关键词变化时重建）
+        self._keyword_matcher = None
+        self._keyword_matcher_key = None
         
         # 质量控制参数
         self.length_limits = {
@@ -88,25 +380,26 @@ class ProteinQualityFilter:
         if pd.isna(annotation) or annotation.strip() == '':
             return 0.1  # 无注释给最低分
         
+        # 注释和关键词都转为小写后匹配（关键词列表可以包含大写，如 'DUF'）
         annotation_lower = annotation.lower()
         score = 0.5  # 基础分数
         
         # 检查低质量关键词
         for keyword in self.low_quality_keywords:
-            if keyword in annotation_lower:
+            if keyword.lower() in annotation_lower:
                 score -= 0.15
         
         # 检查高质量关键词
         for keyword in self.high_quality_keywords:
-            if keyword in annotation_lower:
+            if keyword.lower() in annotation_lower:
                 score += 0.2
         
         # 检查预测方法关键词
         for keyword in self.prediction_keywords:
-            if keyword in annotation_lower:
+            if keyword.lower() in annotation_lower:
                 score -= 0.05
         
-        # 注释长度奖励(详细的注释通常质量更高)
+        # 注释长度奖励(详细的注释通常质量更高；超过200时先满足 > 100，只加0.1)
         if len(annotation) > 100:
             score += 0.1
         elif len(annotation) > 200:
@@ -124,11 +417,11 @@ class ProteinQualityFilter:
         score = 0.5
         
         # 有意义的基因名通常质量更高
-        if re.match(r'^[a-z]{2,5}\d*[a-z]*$', name_lower):  # 如: acsA, hsp70, etc.
+        if re.match(GENE_NAME_PATTERN, name_lower):
             score += 0.2
         
         # 通用ID格式通常质量较低
-        if re.match(r'^[a-z]+\d+\.\d+$', name_lower):  # 如: ABC123.1
+        if re.match(GENERIC_ID_PATTERN, name_lower):
             score -= 0.1
         
         return max(0.0, min(1.0, score))
@@ -143,29 +436,13 @@ class ProteinQualityFilter:
     def calculate_species_score(self, species_id: int) -> float:
         """基于物种计算质量分数"""
         # 模式生物给予更高分数
-        model_organisms = {
-            9606: 1.0,    # Homo sapiens
-            10090: 1.0,   # Mus musculus  
-            7227: 0.9,    # Drosophila melanogaster
-            6239: 0.9,    # Caenorhabditis elegans
-            3702: 0.9,    # Arabidopsis thaliana
-            4932: 0.9,    # Saccharomyces cerevisiae
-            511145: 0.8,  # Escherichia coli
-            83333: 0.8,   # Escherichia coli K-12
-        }
-        
-        return model_organisms.get(species_id, 0.6)  # 其他物种默认0.6分
+        return MODEL_ORGANISM_SCORES.get(species_id, DEFAULT_SPECIES_SCORE)
     
     def calculate_overall_quality_score(self, protein_data: Dict) -> float:
         """计算综合质量分数"""
         
         # 各项分数权重
-        weights = {
-            'length': 0.3,
-            'annotation': 0.4,
-            'name': 0.2,
-            'species': 0.1
-        }
+        weights = QUALITY_WEIGHTS
         
         # 计算各项分数
         length_score = self.calculate_length_score(protein_data['protein_size'])
@@ -183,48 +460,279 @@ class ProteinQualityFilter:
         
         return overall_score
     
-    def filter_proteins(self, protein_df: pd.DataFrame, 
-                       quality_threshold: float = 0.5) -> pd.DataFrame:
-        """过滤蛋白质并添加质量分数"""
+    def calculate_length_scores(self, lengths: pd.Series) -> np.ndarray:
+        """calculate_length_score 的向量化版本"""
+        limits = self.length_limits
+        lengths = lengths.to_numpy(dtype=np.float64)
+        short_ratio = (lengths - limits['min_length']) / (limits['optimal_min'] - limits['min_length'])
+        long_ratio = (limits['max_length'] - lengths) / (limits['max_length'] - limits['optimal_max'])
+        return np.select(
+            [
+                (lengths < limits['min_length']) | (lengths > limits['max_length']),
+                (limits['optimal_min'] <= lengths) & (lengths <= limits['optimal_max']),
+                lengths < limits['optimal_min'],
+            ],
+            [0.0, 1.0, 0.5 + 0.5 * short_ratio],
+            default=0.5 + 0.5 * long_ratio
+        )
+    
+    def calculate_annotation_scores(self, annotations: pd.Series) -> np.ndarray:
+        """
+        calculate_annotation_score 的向量化版本
+        
+        三类关键词由一个多关键词匹配器（keyword_matcher，关键词不变时复用）对每条注释只扫描一次，
+        得到命中矩阵后按与逐个计算相同的顺序累加，浮点结果完全一致。
+        """
+        text = _as_text(annotations)
+        matcher = self.keyword_matcher()
+        hits = matcher.match(text)
+        
+        scores = np.full(len(text), 0.5)
+        for name, delta in (('low_quality', -0.15), ('high_quality', 0.2), ('prediction', -0.05)):
+            for column in hits[:, matcher.columns(name)].T:
+                scores += delta * column
+        
+        # 注释长度奖励（与逐个计算一致：超过100只加0.1）
+        scores += 0.1 * (text.str.len() > 100).to_numpy(dtype=bool)
+        
+        return np.where(_blank(text), 0.1, np.clip(scores, 0.0, 1.0))
+    
+    def calculate_name_scores(self, protein_names: pd.Series) -> np.ndarray:
+        """calculate_name_score 的向量化版本（按Python re语义匹配）"""
+        text = _as_text(protein_names)
+        lowered = text.str.lower()
         
-        logger.info(f"开始蛋白质质量过滤，质量阈值: {quality_threshold}")
+        scores = np.full(len(text), 0.5)
+        scores += 0.2 * lowered.str.match(GENE_NAME_PATTERN, na=False).to_numpy(dtype=bool)
+        scores -= 0.1 * lowered.str.match(GENERIC_ID_PATTERN, na=False).to_numpy(dtype=bool)
         
-        # 添加物种ID列
-        protein_df['species_id'] = protein_df['protein_id'].apply(self.extract_species_id)
+        return np.where(_blank(text), 0.1, np.clip(scores, 0.0, 1.0))
+    
+    def extract_species_ids(self, protein_ids: pd.Series) -> np.ndarray:
+        """extract_species_id 的向量化版本：只对不同的ID前缀做一次整数转换"""
+        prefixes = _as_text(protein_ids).str.extract(r'^([^.]*)', expand=False)
+        codes, uniques = pd.factorize(prefixes)
+        species_ids = np.array([self.extract_species_id(prefix) for prefix in uniques] + [-1], dtype=np.int64)
+        return species_ids[codes]
+    
+    def calculate_species_scores(self, species_ids: pd.Series) -> np.ndarray:
+        """calculate_species_score 的向量化版本（查表）"""
+        return species_ids.map(MODEL_ORGANISM_SCORES).fillna(DEFAULT_SPECIES_SCORE).to_numpy(dtype=np.float64)
+    
+    def __getstate__(self):
+        # 传给分片工作进程时不携带分数缓存（工作进程只在分片内去重）
+        state = self.__dict__.copy()
+        state['score_cache'] = None
+        return state
+    
+    def annotation_keywords(self) -> Dict[str, Tuple[str, ...]]:
+        """注释打分用到的三类关键词（关键词匹配器和分数缓存指纹共用）"""
+        return {
+            'low_quality': tuple(self.low_quality_keywords),
+            'high_quality': tuple(self.high_quality_keywords),
+            'prediction': tuple(self.prediction_keywords),
+        }
+    
+    def keyword_matcher(self) -> KeywordMatcher:
+        """注释关键词匹配器，只在关键词变化时重新构建自动机"""
+        keywords = self.annotation_keywords()
+        if self._keyword_matcher is None or keywords != self._keyword_matcher_key:
+            self._keyword_matcher = KeywordMatcher(keywords)
+            self._keyword_matcher_key = keywords
+        return self._keyword_matcher
+    
+    def score_fingerprint(self) -> str:
+        """注释/名称打分配置的指纹（分数缓存的键）"""
+        keywords = self.annotation_keywords()
+        config = {
+            'version': SCORE_CACHE_VERSION,
+            'low_quality_keywords': keywords['low_quality'],
+            'high_quality_keywords': keywords['high_quality'],
+            'prediction_keywords': keywords['prediction'],
+            'gene_name_pattern': GENE_NAME_PATTERN,
+            'generic_id_pattern': GENERIC_ID_PATTERN,
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    
+    def calculate_scores_by_value(self, values: pd.Series, column: str,
+                                  score_fn: Callable[[pd.Series], np.ndarray]) -> np.ndarray:
+        """
+        去重计算：factorize后只对不同的文本调用 score_fn（优先取分数缓存），再按编码广播回每一行
+        
+        缺失值的编码为-1，分数与逐个计算相同为0.1。
+        """
+        codes, uniques = pd.factorize(_as_text(values))
+        uniques = np.asarray(uniques, dtype=object)
+        present = codes >= 0
+        
+        if self.score_cache is not None:
+            counts = np.bincount(codes[present], minlength=len(uniques))
+            unique_scores = self.score_cache.lookup(column, self.score_fingerprint(), uniques, counts, score_fn)
+        else:
+            unique_scores = score_fn(pd.Series(uniques, dtype=object))
+        
+        scores = np.full(len(codes), 0.1)
+        scores[present] = unique_scores[codes[present]]
+        return scores
+    
+    def calculate_quality_scores(self, protein_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        向量化计算所有蛋白质的各项质量分数和综合质量分数
+        
+        Returns:
+            与protein_df同索引的DataFrame：species_id、length_score、annotation_score、name_score、
+            species_score、quality_score，与逐个调用各 calculate_*_score 的结果一致
+        """
+        scores = pd.DataFrame(index=protein_df.index)
+        scores['species_id'] = self.extract_species_ids(protein_df['protein_id'])
+        scores['length_score'] = self.calculate_length_scores(protein_df['protein_size'])
+        if self.dedup_scores:
+            scores['annotation_score'] = self.calculate_scores_by_value(
+                protein_df['annotation'], 'annotation', self.calculate_annotation_scores
+            )
+            scores['name_score'] = self.calculate_scores_by_value(
+                protein_df['protein_name'], 'protein_name', self.calculate_name_scores
+            )
+        else:
+            scores['annotation_score'] = self.calculate_annotation_scores(protein_df['annotation'])
+            scores['name_score'] = self.calculate_name_scores(protein_df['protein_name'])
+        scores['species_score'] = self.calculate_species_scores(scores['species_id'])
+        
+        # 加权平均（与 calculate_overall_quality_score 相同的运算顺序）
+        weights = QUALITY_WEIGHTS
+        scores['quality_score'] = (
+            weights['length'] * scores['length_score'] +
+            weights['annotation'] * scores['annotation_score'] +
+            weights['name'] * scores['name_score'] +
+            weights['species'] * scores['species_score']
+        )
+        return scores
+    
+    def shard_by_species(self, species_ids: np.ndarray, num_shards: int) -> List[np.ndarray]:
+        """
+        按物种把蛋白质划分为至多 num_shards 个分片（同一物种在同一分片中）
+        
+        物种按蛋白质数从多到少依次放入当前最小的分片，返回每个分片的行号。
+        """
+        species, codes, counts = np.unique(species_ids, return_inverse=True, return_counts=True)
+        shard_of_species = np.zeros(len(species), dtype=np.int64)
+        loads = [(0, shard) for shard in range(min(num_shards, len(species)))]
+        for index in np.argsort(-counts, kind='stable'):
+            load, shard = heapq.heappop(loads)
+            shard_of_species[index] = shard
+            heapq.heappush(loads, (load + int(counts[index]), shard))
+        
+        row_shards = shard_of_species[codes]
+        order = np.argsort(row_shards, kind='stable')
+        return np.split(order, np.cumsum(np.bincount(row_shards, minlength=len(loads)))[:-1])
+    
+    def calculate_quality_scores_sharded(self, protein_df: pd.DataFrame, quality_threshold: float,
+                                         num_workers: int) -> Tuple[pd.DataFrame, QualitySketch, QualitySketch]:
+        """
+        按物种分片、在进程池中并行计算质量分数
+        
+        输入列按分片顺序重排后放入共享内存（字符串列为UTF-8字节+偏移量），每个工作进程处理一段连续的行，
+        分数写回共享内存的输出列；分布统计由各分片的 QualitySketch 合并得到。
+        
+        Returns:
+            (与 calculate_quality_scores 相同的分数表, 全部分数的摘要, 通过阈值的分数的摘要)
+        """
+        species_ids = self.extract_species_ids(protein_df['protein_id'])
+        shards = self.shard_by_species(species_ids, num_workers * SHARDS_PER_WORKER)
+        order = np.concatenate(shards) if shards else np.zeros(0, dtype=np.int64)
+        bounds = np.cumsum([0] + [len(shard) for shard in shards])
+        
+        columns = {'protein_size': protein_df['protein_size'].astype(np.float64).to_numpy()[order]}
+        for name in STRING_COLUMNS:
+            for part, array in _encode_strings(protein_df[name].iloc[order]).items():
+                columns[f'{name}.{part}'] = array
+        outputs = {
+            column: np.zeros(len(order), dtype=np.int64 if column == 'species_id' else np.float64)
+            for column in SCORE_COLUMNS
+        }
         
-        # 计算各项质量分数
-        protein_df['length_score'] = protein_df['protein_size'].apply(self.calculate_length_score)
-        protein_df['annotation_score'] = protein_df['annotation'].apply(self.calculate_annotation_score)
-        protein_df['name_score'] = protein_df['protein_name'].apply(self.calculate_name_score)
-        protein_df['species_score'] = protein_df['species_id'].apply(self.calculate_species_score)
+        column_blocks, column_spec = _share_arrays(columns)
+        score_blocks, score_spec = [], {}
+        try:
+            score_blocks, score_spec = _share_arrays(outputs)
+            del columns
+            
+            overall, passed = QualitySketch(), QualitySketch()
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                futures = [
+                    executor.submit(_score_shard, self, column_spec, score_spec,
+                                    int(start), int(end), quality_threshold)
+                    for start, end in zip(bounds[:-1], bounds[1:])
+                ]
+                for future in futures:
+                    shard_overall, shard_passed = future.result()
+                    overall.merge(shard_overall)
+                    passed.merge(shard_passed)
+            
+            _, shared_scores = _attach_arrays(score_spec)
+            scores = pd.DataFrame(index=protein_df.index)
+            for column in SCORE_COLUMNS:
+                values = np.empty(len(order), dtype=shared_scores[column].dtype)
+                values[order] = shared_scores[column]
+                scores[column] = values
+            del shared_scores
+        finally:
+            _release_blocks(column_blocks, unlink=True)
+            _release_blocks(score_blocks, unlink=True)
+        
+        return scores, overall, passed
+    
+    def filter_proteins(self, protein_df: pd.DataFrame, 
+                       quality_threshold: float = 0.5, num_workers: int = 1) -> pd.DataFrame:
+        """
+        过滤蛋白质并添加质量分数
         
-        # 计算综合质量分数
-        protein_df['quality_score'] = protein_df.apply(
-            lambda row: self.calculate_overall_quality_score(row.to_dict()), 
-            axis=1
-        )
+        num_workers > 1 时按物种分片并行计算（calculate_quality_scores_sharded），分数与单进程相同；
+        分布统计由分片摘要合并，分位数为近似值（误差不超过 1/QUALITY_SKETCH_BINS）。
+        """
+        
+        logger.info(f"开始蛋白质质量过滤，质量阈值: {quality_threshold}")
+        
+        # 添加物种ID列和各项质量分数（向量化计算）
+        if num_workers > 1:
+            logger.info(f"按物种分片并行计算质量分数，工作进程数: {num_workers}")
+            scores, overall, passed = self.calculate_quality_scores_sharded(
+                protein_df, quality_threshold, num_workers
+            )
+        else:
+            scores = self.calculate_quality_scores(protein_df)
+        for column in scores.columns:
+            protein_df[column] = scores[column]
+        if self.score_cache is not None:
+            self.score_cache.save()
         
         # 应用质量阈值过滤
         filtered_df = protein_df[protein_df['quality_score'] >= quality_threshold].copy()
         
         # 统计信息
-        stats = {
-            'initial_count': len(protein_df),
-            'filtered_count': len(filtered_df),
-            'retention_rate': len(filtered_df) / len(protein_df),
-            'quality_distribution': {
+        if num_workers > 1:
+            quality_distribution = overall.summary(QUALITY_PERCENTILES)
+            filtered_quality_distribution = passed.summary()
+        else:
+            quality_distribution = {
                 'mean': protein_df['quality_score'].mean(),
                 'std': protein_df['quality_score'].std(),
                 'min': protein_df['quality_score'].min(),
                 'max': protein_df['quality_score'].max(),
-                'percentiles': protein_df['quality_score'].quantile([0.1, 0.25, 0.5, 0.75, 0.9, 0.95]).to_dict()
-            },
-            'filtered_quality_distribution': {
+                'percentiles': protein_df['quality_score'].quantile(QUALITY_PERCENTILES).to_dict()
+            }
+            filtered_quality_distribution = {
                 'mean': filtered_df['quality_score'].mean(),
                 'std': filtered_df['quality_score'].std(), 
                 'min': filtered_df['quality_score'].min(),
                 'max': filtered_df['quality_score'].max()
             }
+        stats = {
+            'initial_count': len(protein_df),
+            'filtered_count': len(filtered_df),
+            'retention_rate': len(filtered_df) / len(protein_df),
+            'quality_distribution': quality_distribution,
+            'filtered_quality_distribution': filtered_quality_distribution
         }
         
         logger.info(f"蛋白质质量过滤结果:")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试STRING数据提取模块
+
+在小规模合成数据上验证图导出和外部排序去重
+"""
+
+import sys
+sys.path.append('optional/data_extraction')
+
+import json
+import logging
+import random
+import tempfile
+from pathlib import Path
+
+from synthetic_string import SyntheticConfig, SyntheticStringGenerator
+from string_data_extractor import StringDataExtractor
+from graph_export import GraphExporter, load_csr, csr_to_edge_index
+from external_sort import ExternalSortDeduplicator
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def csr_edges(graph_dir: Path) -> dict:
+    """读取导出的CSR图，返回 (源蛋白质ID, 目标蛋白质ID) -> 七通道证据"""
+    graph = load_csr(str(graph_dir))
+    edge_index = csr_to_edge_index(graph['indptr'], graph['indices'])
+    node_ids = graph['node_ids']
+    return {
+        (node_ids[src], node_ids[dst]): tuple(graph['edge_attr'][k])
+        for k, (src, dst) in enumerate(edge_index.T)
+    }
+
+
+def test_canonical_parquet_graph_export():
+    """测试规范化边的Parquet数据集导出的CSR与双向存储的SQLite导出一致"""
+    logger.info("="*60)
+    logger.info("测试1: 规范化Parquet数据集的图导出")
+    logger.info("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        config = SyntheticConfig(num_species=2, proteins_per_species=300, mean_degree=8, compresslevel=1)
+        SyntheticStringGenerator(config).generate(str(tmp_dir / 'source'))
+
+        graphs = {}
+        for name, options in [('sqlite', {}),
+                              ('parquet', {'storage_backend': 'parquet', 'canonicalize_edges': True})]:
+            data_dir = tmp_dir / name
+            data_dir.mkdir()
+            for path in (tmp_dir / 'source').iterdir():
+                (data_dir / path.name).symlink_to(path)
+            extractor = StringDataExtractor(data_dir=str(data_dir), confidence_threshold=0.4,
+                                            incremental=False, **options)
+            extractor.extract_all_data()
+
+            if name == 'sqlite':
+                exporter = GraphExporter(db_path=str(data_dir / 'string_data.db'))
+            else:
+                exporter = GraphExporter(parquet_dir=str(extractor.parquet_dir))
+                assert exporter.canonical, "Parquet数据集未记录规范化边模式"
+            exporter.export(str(data_dir / 'graph'))
+            graphs[name] = csr_edges(data_dir / 'graph')
+            with open(data_dir / 'graph' / 'meta.json') as f:
+                meta = json.load(f)
+            assert meta['symmetric'] and meta['num_edges'] == len(graphs[name])
+
+        assert len(graphs['sqlite']) > 0
+        assert graphs['parquet'] == graphs['sqlite'], \
+            f"边数 {len(graphs['parquet'])} != {len(graphs['sqlite'])}"
+        assert all((dst, src) in graphs['parquet'] for src, dst in graphs['parquet'])
+
+    logger.info(f"✅ 规范化Parquet数据集导出 {len(graphs['parquet']):,} 条有向边，与SQLite导出一致")
+
+
+def test_external_sort_keep_last():
+    """测试外部排序去重：相同主键出现在多个有序段中时保留最后写入的一行"""
+    logger.info("\n" + "="*60)
+    logger.info("测试2: 外部排序去重（跨有序段的重复主键）")
+    logger.info("="*60)
+
+    rng = random.Random(0)
+    rows = [(f'{rng.randrange(9)}.P{rng.randrange(40):03d}', f'Q{rng.randrange(5)}', i) for i in range(6000)]
+    expected = {}
+    for row in rows:
+        expected[row[:2]] = row
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 极小的内存预算：每个有序段为最少的采样行数，同一主键分散在多个段中
+        dedup = ExternalSortDeduplicator(key_positions=[0, 1], memory_mb=0.001, tmp_dir=tmp_dir)
+        dedup.add_all(rows)
+        output = list(dedup.iter_sorted())
+
+    assert dedup.num_runs > 1, "没有产生多个有序段"
+    assert output == [expected[key] for key in sorted(expected)], "去重结果不是按主键有序的最后一行"
+    assert dedup.rows_out == len(expected)
+    logger.info(f"✅ {dedup.num_runs} 个有序段中的 {len(rows):,} 行去重为 {len(output):,} 行，均保留最后写入的一行")
+
+
+def main():
+    """主测试函数"""
+    logger.info("🚀 开始测试数据提取模块\n")
+
+    try:
+        # 测试规范化Parquet数据集的图导出
+        test_canonical_parquet_graph_export()
+
+        # 测试外部排序去重
+        test_external_sort_keep_last()
+
+        logger.info("\n" + "="*60)
+        logger.info("🎉 所有测试通过！")
+        logger.info("="*60)
+
+        return True
+
+    except Exception as e:
+        logger.error(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
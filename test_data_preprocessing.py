@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+测试STRING数据预处理模块
+
+验证向量化实现与逐个计算的参考实现结果一致
+"""
+
+import sys
+sys.path.append('optional')
+sys.path.append('optional/data_extraction')
+
+import time
+import random
+import logging
+import gzip
+import sqlite3
+import subprocess
+import tempfile
+from pathlib import Path
+
+import networkx as nx
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import ClusterAnalyzer, PPIDataFilter, ProteinQualityFilter
+from data_preprocessing.keyword_matcher import KeywordMatcher
+from cluster_closure import compute_cluster_closure, create_closure_table
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+SCORE_COLUMNS = ['species_id', 'length_score', 'annotation_score', 'name_score', 'species_score', 'quality_score']
+
+
+def make_protein_sample(num_random: int = 20000, seed: int = 0) -> pd.DataFrame:
+    """构造蛋白质样本：边界情况（缺失值、空白、长度边界、关键词大小写、长注释）加随机组合"""
+    rng = random.Random(seed)
+    filter_obj = ProteinQualityFilter()
+    keywords = (filter_obj.low_quality_keywords + filter_obj.high_quality_keywords +
+                filter_obj.prediction_keywords)
+
+    edge_cases = [
+        ('9606.ENSP00000000001', 'TP53', 393, 'Cellular tumor antigen p53; Kinase activity'),
+        ('10090.ENSMUSP0001', 'hsp70', 49, 'Putative FRAGMENT, Hypothetical Protein'),
+        ('7227.FBpp0001', 'ABC123.1', 50, '   '),
+        ('511145.b0001', 'acsA', 99, ''),
+        ('83333.b0002', 'gene_1', 100, None),
+        ('4932.YAL001C', None, 1000, 'x' * 101),
+        ('3702.AT1G01010.1', '', 1001, 'Crystal structure of enzyme; ' + 'y' * 250),
+        ('6239.C01.1', ' ', 5000, 'derived by automated computational analysis using gene prediction method'),
+        ('no_dot_id', 'AB12CD', 5001, 'Similarity to kinase; similarity to ligase'),
+        ('abc.123', 'ab1234567.12', 0, 'KINASE kinase Kinase'),
+        (None, 'abc1.2', 2500, 'Uncharacterized protein\n'),
+        ('.9606', 'abc\n', 75, 'Ligase, reductase, transferase, hydrolase and kinase; characterized'),
+        ('9606.ENSP00000000002', 'DUF1', 300, 'DUF1234 domain protein'),
+        ('4932.YAL002W', 'abcB', 600, 'ATP-binding cassette transporter; duf'),
+    ]
+
+    species = [9606, 10090, 7227, 6239, 3702, 4932, 511145, 83333, 559292, 1234]
+    rows = list(edge_cases)
+    for i in range(num_random):
+        words = rng.sample(keywords, rng.randint(0, 4)) + ['protein'] * rng.randint(0, 3)
+        rng.shuffle(words)
+        annotation = '; '.join(word.upper() if rng.random() < 0.2 else word for word in words)
+        annotation += ' ' * rng.randint(0, 1) + 'z' * rng.choice([0, 0, 50, 120])
+        name = rng.choice(['acsA', 'hsp70', f'gn{i}', f'ABC{i}.1', f'Q{i:05d}', '', None])
+        rows.append((f'{rng.choice(species)}.P{i:06d}', name, rng.randint(1, 6000), annotation))
+
+    return pd.DataFrame(rows, columns=['protein_id', 'protein_name', 'protein_size', 'annotation'])
+
+
+def reference_scores(filter_obj: ProteinQualityFilter, protein_df: pd.DataFrame) -> pd.DataFrame:
+    """逐个调用各 calculate_*_score 的参考实现"""
+    reference = protein_df.copy()
+    reference['species_id'] = reference['protein_id'].apply(filter_obj.extract_species_id)
+    reference['length_score'] = reference['protein_size'].apply(filter_obj.calculate_length_score)
+    reference['annotation_score'] = reference['annotation'].apply(filter_obj.calculate_annotation_score)
+    reference['name_score'] = reference['protein_name'].apply(filter_obj.calculate_name_score)
+    reference['species_score'] = reference['species_id'].apply(filter_obj.calculate_species_score)
+    reference['quality_score'] = reference.apply(
+        lambda row: filter_obj.calculate_overall_quality_score(row.to_dict()),
+        axis=1
+    )
+    return reference
+
+
+def test_quality_score_parity():
+    """测试向量化质量分数与逐个计算完全一致"""
+    logger.info("="*60)
+    logger.info("测试1: ProteinQualityFilter 向量化质量分数")
+    logger.info("="*60)
+
+    filter_obj = ProteinQualityFilter()
+    # 含大写字母的自定义关键词：两种实现都按小写匹配
+    filter_obj.low_quality_keywords.append('DUF')
+    filter_obj.high_quality_keywords.append('ATP-Binding')
+    protein_df = make_protein_sample()
+
+    start = time.perf_counter()
+    reference = reference_scores(filter_obj, protein_df)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = filter_obj.calculate_quality_scores(protein_df)
+    vectorized_seconds = time.perf_counter() - start
+
+    for column in SCORE_COLUMNS:
+        expected = reference[column].to_numpy()
+        actual = scores[column].to_numpy()
+        assert expected.dtype == actual.dtype, f"{column} 类型不一致: {expected.dtype} != {actual.dtype}"
+        mismatch = np.flatnonzero(expected != actual)
+        assert len(mismatch) == 0, \
+            f"{column} 有 {len(mismatch)} 个分数不一致，例如第{mismatch[0]}行: {expected[mismatch[0]]} != {actual[mismatch[0]]}"
+    duf = protein_df.index[protein_df['annotation'] == 'DUF1234 domain protein'][0]
+    assert reference.loc[duf, 'annotation_score'] == filter_obj.calculate_annotation_score('DUF1234 domain protein')
+    assert np.isclose(scores.loc[duf, 'annotation_score'], 0.35), "自定义大写关键词没有命中"
+    logger.info(f"✅ {len(protein_df):,} 个蛋白质的各项分数完全一致")
+    logger.info(f"  逐个计算: {reference_seconds:.2f} 秒，向量化: {vectorized_seconds:.2f} 秒")
+
+    # filter_proteins 的过滤结果和统计
+    filtered_df, stats = filter_obj.filter_proteins(protein_df.copy(), quality_threshold=0.5)
+    expected_filtered = reference[reference['quality_score'] >= 0.5]
+    assert filtered_df.index.equals(expected_filtered.index), "过滤结果不一致"
+    assert stats['filtered_count'] == len(expected_filtered)
+    assert stats['quality_distribution']['mean'] == reference['quality_score'].mean()
+    logger.info(f"✅ filter_proteins 过滤结果一致（保留 {stats['filtered_count']:,} 个）")
+
+
+def test_keyword_matcher():
+    """测试多关键词匹配器与逐个关键词做子串判断一致（包括相互重叠、互为前缀的关键词）"""
+    logger.info("\n" + "="*60)
+    logger.info("测试2: KeywordMatcher")
+    logger.info("="*60)
+
+    rng = random.Random(1)
+    alphabet = 'abc '
+    for _ in range(200):
+        keyword_classes = {
+            f'class{i}': [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+                          for _ in range(rng.randint(0, 5))]
+            for i in range(3)
+        }
+        keyword_classes['class0'].append('AbC')
+        texts = [''.join(rng.choice(alphabet + 'AB') for _ in range(rng.randint(0, 30))) for _ in range(100)]
+        texts += [None, float('nan'), '']
+
+        matcher = KeywordMatcher(keyword_classes)
+        hits = matcher.match(pd.Series(texts, dtype=object))
+        keywords = [keyword.lower() for keywords in keyword_classes.values() for keyword in keywords]
+        expected = np.array([
+            [isinstance(text, str) and keyword in text.lower() for keyword in keywords] for text in texts
+        ], dtype=bool)
+        assert hits.shape == (len(texts), len(keywords))
+        assert (hits == expected).all(), f"关键词 {keyword_classes} 的命中结果不一致"
+        assert (hits[:, matcher.columns('class0')] == expected[:, :len(keyword_classes['class0'])]).all()
+
+    logger.info("✅ 随机关键词集合上的命中矩阵与逐个子串判断一致")
+
+
+def test_sharded_quality_scores():
+    """测试按物种分片并行计算的分数与单进程一致，合并的分布统计与精确值接近"""
+    logger.info("\n" + "="*60)
+    logger.info("测试3: 按物种分片并行计算质量分数")
+    logger.info("="*60)
+
+    filter_obj = ProteinQualityFilter()
+    protein_df = make_protein_sample(num_random=5000)
+    protein_df.index = protein_df.index * 2 + 1
+
+    filtered_df, stats = filter_obj.filter_proteins(protein_df.copy(), quality_threshold=0.5)
+    sharded_df, sharded_stats = filter_obj.filter_proteins(protein_df.copy(), quality_threshold=0.5, num_workers=2)
+
+    assert sharded_df.index.equals(filtered_df.index), "分片模式过滤结果不一致"
+    for column in SCORE_COLUMNS:
+        assert (sharded_df[column].to_numpy() == filtered_df[column].to_numpy()).all(), f"{column} 不一致"
+
+    for key in ['quality_distribution', 'filtered_quality_distribution']:
+        for name in ['mean', 'std', 'min', 'max']:
+            assert np.isclose(sharded_stats[key][name], stats[key][name]), f"{key}.{name} 不一致"
+    for q, value in stats['quality_distribution']['percentiles'].items():
+        assert abs(sharded_stats['quality_distribution']['percentiles'][q] - value) <= 1e-4, f"{q} 分位数误差过大"
+    logger.info("✅ 分片模式分数完全一致，分布统计误差在直方图精度内")
+
+
+def test_score_cache():
+    """测试去重打分和持久化的分数缓存与逐行向量化计算一致，缓存有界且随关键词变化失效"""
+    logger.info("\n" + "="*60)
+    logger.info("测试4: 注释/名称去重打分与分数缓存")
+    logger.info("="*60)
+
+    sample = make_protein_sample(num_random=2000)
+    protein_df = sample.sample(n=50000, replace=True, random_state=0).reset_index(drop=True)
+    expected = ProteinQualityFilter(dedup_scores=False).calculate_quality_scores(protein_df)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = Path(tmp_dir) / 'score_cache.pkl'
+        filter_obj = ProteinQualityFilter(score_cache_path=cache_path, score_cache_size=500)
+        filter_obj.filter_proteins(protein_df.copy())
+        assert cache_path.exists(), "分数缓存未写出"
+
+        # 新的过滤器从文件加载缓存
+        filter_obj = ProteinQualityFilter(score_cache_path=cache_path, score_cache_size=500)
+        assert all(0 < len(table) <= 500 for table in filter_obj.score_cache.tables.values())
+        scores = filter_obj.calculate_quality_scores(protein_df)
+        for column in SCORE_COLUMNS:
+            assert (scores[column].to_numpy() == expected[column].to_numpy()).all(), f"{column} 不一致"
+        matcher = filter_obj.keyword_matcher()
+        filter_obj.calculate_quality_scores(protein_df.iloc[::-1])
+        assert filter_obj.keyword_matcher() is matcher, "关键词未变时不应重建匹配器"
+
+        # 修改关键词后缓存失效，匹配器重建
+        filter_obj.low_quality_keywords = filter_obj.low_quality_keywords[:-1]
+        assert filter_obj.keyword_matcher() is not matcher
+        reference = ProteinQualityFilter(dedup_scores=False)
+        reference.low_quality_keywords = filter_obj.low_quality_keywords
+        assert (filter_obj.calculate_quality_scores(protein_df)['annotation_score'].to_numpy() ==
+                reference.calculate_quality_scores(protein_df)['annotation_score'].to_numpy()).all()
+
+    logger.info("✅ 去重打分与缓存结果一致，缓存大小受限，配置变化时重新计算")
+
+
+def test_cluster_is_ancestor():
+    """测试闭包索引的祖先判断与networkx祖先关系一致，未知聚类返回False"""
+    logger.info("\n" + "="*60)
+    logger.info("测试5: ClusterAnalyzer.is_ancestor")
+    logger.info("="*60)
+
+    rng = random.Random(2)
+    clusters = [f'CL:{i:05d}' for i in range(300)]
+    # 每个聚类的父节点编号更小，得到若干棵树组成的森林
+    edges = [(clusters[i], clusters[rng.randrange(i)]) for i in range(1, len(clusters)) if rng.random() < 0.95]
+    tree = nx.DiGraph([(parent, child) for child, parent in edges])
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = sqlite3.connect(Path(tmp_dir) / 'string_data.db')
+        cursor = conn.cursor()
+        create_closure_table(cursor)
+        cursor.executemany('INSERT INTO cluster_closure VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                           compute_cluster_closure(edges))
+        conn.commit()
+        conn.close()
+
+        analyzer = ClusterAnalyzer(data_dir=tmp_dir)
+        for cluster in tree.nodes:
+            ancestors = nx.ancestors(tree, cluster) | {cluster}
+            for candidate in tree.nodes:
+                assert analyzer.is_ancestor(candidate, cluster) == (candidate in ancestors), \
+                    f"{candidate} -> {cluster} 的祖先判断不一致"
+
+        assert not analyzer.is_ancestor('CL:missing', clusters[0])
+        assert not analyzer.is_ancestor(clusters[0], 'CL:missing')
+
+    logger.info(f"✅ {tree.number_of_nodes()} 个聚类两两之间的祖先判断与networkx一致")
+
+
+def write_string_files(data_dir: Path, num_proteins: int = 600, num_edges: int = 1500, seed: int = 3):
+    """写出小规模的 protein.info 和 protein.links.detailed 文件（每条相互作用双向各列一次，多个连通分量）"""
+    rng = random.Random(seed)
+    proteins = [f'{rng.choice([9606, 4932])}.P{i:05d}' for i in range(num_proteins)]
+
+    with gzip.open(data_dir / 'protein.info.v12.0.txt.gz', 'wt') as f:
+        f.write('#string_protein_id\tpreferred_name\tprotein_size\tannotation\n')
+        for i, protein in enumerate(proteins):
+            # 约十分之一的蛋白质长度过短，不能通过质量过滤
+            size = 30 if i % 10 == 0 else rng.randint(120, 900)
+            f.write(f'{protein}\tgn{i}\t{size}\tCharacterized kinase enzyme\n')
+
+    # 蛋白质分为大小不同的若干组，边只连接同组蛋白质，得到多个连通分量
+    groups = [proteins[start:start + size] for start, size in ((0, 250), (250, 150), (400, 120), (520, 80))]
+    edges = set()
+    while len(edges) < num_edges:
+        group = rng.choice(groups)
+        protein1, protein2 = rng.sample(group, 2)
+        edges.add((min(protein1, protein2), max(protein1, protein2)))
+    rows = []
+    for protein1, protein2 in sorted(edges):
+        evidence = [rng.choice([0, 0, rng.randint(50, 999)]) for _ in range(7)]
+        score = rng.randint(150, 999)
+        rows.append((protein1, protein2, evidence, score))
+        rows.append((protein2, protein1, evidence, score))
+    rng.shuffle(rows)
+
+    with gzip.open(data_dir / 'protein.links.detailed.v12.0.txt.gz', 'wt') as f:
+        f.write('protein1 protein2 neighborhood fusion cooccurence coexpression experimental database '
+                'textmining combined_score\n')
+        for protein1, protein2, evidence, score in rows:
+            f.write(f"{protein1} {protein2} {' '.join(map(str, evidence))} {score}\n")
+
+
+def test_streaming_connectivity():
+    """测试流式连通性分析（并查集 + 中间文件）与内存模式的分量标签、最大连通分量和最终边一致"""
+    logger.info("\n" + "="*60)
+    logger.info("测试6: PPIDataFilter 流式与内存连通性分析")
+    logger.info("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = Path(tmp_dir)
+        write_string_files(data_dir)
+
+        for confidence in [0.4, 0.7, 0.9]:
+            for canonical in [False, True]:
+                results = {}
+                for mode in ['memory', 'streaming']:
+                    filter_obj = PPIDataFilter(data_dir=str(data_dir), confidence_threshold=confidence,
+                                               canonical_edges=canonical, connectivity_mode=mode)
+                    # 小块读取，使并查集跨多个数据块合并
+                    filter_obj.ppi_chunk_rows = 97
+                    proteins, ppi, _ = filter_obj.run_complete_filtering()
+                    edges = ppi.astype({'protein1': str, 'protein2': str})
+                    results[mode] = (filter_obj.stats['connectivity'], proteins,
+                                     edges.sort_values(['protein1', 'protein2']).reset_index(drop=True))
+
+                memory_stats, memory_proteins, memory_edges = results['memory']
+                streaming_stats, streaming_proteins, streaming_edges = results['streaming']
+                case = f"置信度{confidence}，{'规范化' if canonical else '双向'}边"
+                assert memory_stats['num_components'] > 1, f"{case}: 测试数据只有一个连通分量"
+                assert streaming_stats['component_labels'].equals(memory_stats['component_labels']), \
+                    f"{case}: 分量标签不一致"
+                assert streaming_stats['largest_component_proteins'].equals(
+                    memory_stats['largest_component_proteins']), f"{case}: 最大连通分量不一致"
+                assert streaming_proteins['protein_id'].tolist() == memory_proteins['protein_id'].tolist()
+                assert streaming_edges.equals(memory_edges), f"{case}: 最终边不一致"
+                logger.info(f"✅ {case}: {memory_stats['num_components']} 个连通分量，"
+                            f"最终 {len(memory_edges):,} 条边一致")
+
+
+def test_ppi_filter_script():
+    """测试以脚本方式运行 ppi_filter.py（python optional/data_preprocessing/ppi_filter.py ...）"""
+    logger.info("\n" + "="*60)
+    logger.info("测试7: ppi_filter.py 命令行入口")
+    logger.info("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = Path(tmp_dir)
+        write_string_files(data_dir)
+        output_dir = data_dir / 'filtered'
+        script = Path(__file__).parent / 'optional' / 'data_preprocessing' / 'ppi_filter.py'
+        result = subprocess.run(
+            [sys.executable, str(script), '--data-dir', str(data_dir),
+             '--output-dir', str(output_dir), '--confidence', '0.7', '--canonical-edges',
+             '--connectivity-mode', 'streaming', '--output-format', 'csv'],
+            capture_output=True, text=True
+        )
+        assert result.returncode == 0, f"ppi_filter.py 运行失败:\n{result.stderr[-2000:]}"
+        assert (output_dir / 'filtered_ppi_conf0.7.csv').exists(), "没有写出过滤后的PPI文件"
+
+    logger.info("✅ ppi_filter.py 以脚本方式运行成功")
+
+
+def main():
+    """主测试函数"""
+    logger.info("🚀 开始测试数据预处理模块\n")
+
+    try:
+        # 测试向量化质量分数
+        test_quality_score_parity()
+
+        # 测试多关键词匹配器
+        test_keyword_matcher()
+
+        # 测试分片并行计算
+        test_sharded_quality_scores()
+
+        # 测试去重打分与分数缓存
+        test_score_cache()
+
+        # 测试聚类祖先判断
+        test_cluster_is_ancestor()
+
+        # 测试流式连通性分析
+        test_streaming_connectivity()
+
+        # 测试命令行入口
+        test_ppi_filter_script()
+
+        logger.info("\n" + "="*60)
+        logger.info("🎉 所有测试通过！")
+        logger.info("="*60)
+
+        return True
+
+    except Exception as e:
+        logger.error(f"\n❌ 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)